@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_profile_latitude_profile_longitude'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['user_type', 'latitude', 'longitude'], name='profile_type_location_idx'),
+        ),
+    ]
@@ -15,5 +15,10 @@ class Profile(Model):
     longitude = models.FloatField(null=True, blank=True)
     is_active = models.BooleanField(default=True, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_type', 'latitude', 'longitude'], name='profile_type_location_idx'),
+        ]
+
     def __str__(self):
         return self.full_name
\ No newline at end of file
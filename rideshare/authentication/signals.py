@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from authentication.models import Profile
+from utils.spatial import driver_index
+
+
+@receiver(post_save, sender=Profile)
+def sync_driver_index(sender, instance, **kwargs):
+    driver_index.sync(instance)
+
+
+@receiver(post_delete, sender=Profile)
+def remove_from_driver_index(sender, instance, **kwargs):
+    driver_index.remove(instance.id)
@@ -0,0 +1,247 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from authentication.models import Profile
+from utils.constants import CANCELLED, COMPLETED, DRIVER, REQUESTED
+from utils.helpers import (
+    error_response,
+    success_response,
+    aupdate_location,
+    apickup_coordinates,
+    nearest_drivers_to,
+)
+from .events import CLOSED, TRACKED_FIELDS, get_broker, ride_event
+from .models import Rides
+from .serializers import RideSerializer
+
+# Async views, served without tying up a worker thread when the project runs
+# under ASGI (rideshare.asgi). Under WSGI Django runs them in a thread.
+
+SUBSCRIBE_TIMEOUT_SECONDS = 5
+
+
+async def authenticate(request):
+    """Returns the user of the request's JWT, or None.
+
+    The token is read from the ``Authorization: Bearer`` header, or from the
+    ``token`` query parameter for clients such as ``EventSource`` that cannot
+    set headers.
+    """
+    header = request.headers.get('Authorization', '')
+    raw_token = header[len('Bearer '):] if header.startswith('Bearer ') else request.GET.get('token')
+    if not raw_token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        token = authentication.get_validated_token(raw_token)
+        return await sync_to_async(authentication.get_user)(token)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+
+
+def _request_data(request):
+    """Returns the request's form fields or JSON object.
+
+    Raises:
+        ValueError: If a JSON body is malformed or not an object.
+    """
+    if request.content_type != 'application/json':
+        return request.POST
+    data = json.loads(request.body or b'{}')
+    if not isinstance(data, dict):
+        raise ValueError("The request body must be a JSON object.")
+    return data
+
+
+def _invalid_body():
+    return error_response(error_message="The request body must be a JSON object.", status=status.HTTP_400_BAD_REQUEST)
+
+
+def _method_not_allowed():
+    return error_response(error_message="Method not allowed.", status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+def _not_authenticated():
+    return error_response(
+        error_message="Authentication credentials were not provided or are invalid.",
+        status=status.HTTP_401_UNAUTHORIZED
+    )
+
+
+@csrf_exempt
+async def update_location(request): # async version of RideLocationUpdateView, for the ride's rider or driver
+    if request.method != 'POST':
+        return _method_not_allowed()
+    user = await authenticate(request)
+    if user is None:
+        return _not_authenticated()
+    try:
+        data = _request_data(request)
+    except ValueError:
+        return _invalid_body()
+    try:
+        ride_id = int(data.get('ride_id'))
+        lat, lon = float(data.get('latitude')), float(data.get('longitude'))
+    except (TypeError, ValueError):
+        return error_response(
+            error_message="ride_id, latitude and longitude are required numbers.",
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not await Rides.objects.filter(Q(rider__user=user) | Q(driver__user=user), id=ride_id).aexists():
+        return error_response(error_message="Ride not found.", status=status.HTTP_404_NOT_FOUND)
+    await aupdate_location(ride_id, lat, lon)
+    return success_response(success_message='Location updated')
+
+
+@csrf_exempt
+async def find_driver(request): # async version of FindNearestDriverView
+    if request.method != 'POST':
+        return _method_not_allowed()
+    if await authenticate(request) is None:
+        return _not_authenticated()
+    try:
+        data = _request_data(request)
+    except ValueError:
+        return _invalid_body()
+    try:
+        ride = await Rides.objects.active().aget(id=data.get("ride_id"))
+
+        if ride.status != REQUESTED:
+            return error_response(
+                error_message="Ride must be in 'Requested' status to assign.",
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # the geocoder is awaited, the driver search is CPU bound and runs in a thread
+        lat, lon = await apickup_coordinates(ride)
+        nearest = []
+        if lat is not None:
+            nearest = await sync_to_async(nearest_drivers_to)(lat, lon, k=1, radius_km=5, max_radius_km=5)
+        if not nearest:
+            return error_response(
+                error_message="No available drivers within radius.",
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        ride.driver = nearest[0][1]
+        await ride.asave()
+
+        return success_response(
+            RideSerializer(ride).data,
+            status=status.HTTP_200_OK
+        )
+    except Exception as e:
+        return error_response("Something went wrong.")
+
+
+@csrf_exempt
+async def accept_ride(request, pk): # async version of AcceptRideViewSet.accept
+    if request.method != 'POST':
+        return _method_not_allowed()
+    user = await authenticate(request)
+    if user is None:
+        return _not_authenticated()
+    try:
+        driver_profile = await Profile.objects.aget(user=user)
+        try:
+            ride = await Rides.objects.aget(pk=pk)
+        except Rides.DoesNotExist:
+            return error_response(error_message="Ride not found.", status=status.HTTP_404_NOT_FOUND)
+
+        # Only drivers can accept rides
+        if driver_profile.user_type != DRIVER:
+            return error_response(
+                error_message='Only drivers may accept rides.',
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if ride.status != REQUESTED:
+            return error_response(
+                error_message='Ride must be requested to be accepted.',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ride.driver = driver_profile
+        ride.status = 'Accepted'
+        await ride.asave()
+
+        return success_response(
+            RideSerializer(ride).data,
+            status=status.HTTP_200_OK
+        )
+    except Exception as e:
+        return error_response("Something went wrong.")
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _ride_event_stream(subscription, snapshot):
+    heartbeat = getattr(settings, 'RIDE_EVENTS_HEARTBEAT_SECONDS', 15)
+    try:
+        yield _sse("ride.snapshot", ride_event(snapshot)["data"])
+        if snapshot['status'] in (COMPLETED, CANCELLED):
+            return
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            if event is None:
+                # Comment lines keep proxies from closing an idle stream.
+                yield ": keepalive\n\n"
+                continue
+            if event is CLOSED:
+                # The broker lost its feed; the client reconnects.
+                return
+            yield _sse(event["type"], event["data"])
+            if event["data"].get('status') in (COMPLETED, CANCELLED):
+                return
+    finally:
+        subscription.close()
+
+
+async def ride_events(request, pk):
+    """Streams a ride's status and location changes as Server-Sent Events.
+
+    The first event is a ``ride.snapshot`` of the tracked fields, followed by
+    a ``ride.updated`` event with the changed fields for every write. The
+    stream ends once the ride is completed or cancelled. Only the ride's
+    rider and driver may subscribe.
+    """
+    if request.method != 'GET':
+        return _method_not_allowed()
+
+    user = await authenticate(request)
+    if user is None:
+        return _not_authenticated()
+
+    # subscribe before reading the snapshot so no write falls in between
+    subscription = get_broker().subscribe(pk)
+    if not await subscription.wait_ready(SUBSCRIBE_TIMEOUT_SECONDS):
+        subscription.close()
+        return error_response(
+            error_message="Live updates are unavailable.", status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    snapshot = await (
+        Rides.objects.active()
+        .filter(Q(rider__user=user) | Q(driver__user=user), id=pk)
+        .values(*TRACKED_FIELDS)
+        .afirst()
+    )
+    if snapshot is None:
+        subscription.close()
+        return error_response(error_message="Ride not found.", status=status.HTTP_404_NOT_FOUND)
+
+    return StreamingHttpResponse(
+        _ride_event_stream(subscription, snapshot),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
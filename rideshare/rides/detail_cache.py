@@ -0,0 +1,142 @@
+"""Cache of ride-detail payloads, with versions for conditional GETs.
+
+Every ride has a version in the shared cache: an opaque token plus the time
+of the change it stands for. Writers replace it whenever they change a ride
+(``bump_versions``, called through ``rides.events.publish_ride_events`` once
+the transaction commits), so a poll whose ``If-None-Match`` still names the
+current version is answered with a 304 from the cache alone. Payloads are
+cached under the version they were built for and are never invalidated
+individually: once the version moves on they are simply no longer looked up
+and expire after ``RIDE_DETAIL_CACHE_TTL`` seconds.
+
+Payloads are also cached per viewer. An entry only exists for a user the
+detail endpoint has already let read the ride, so finding one stands in for
+the permission check.
+
+Writes that bypass that path call ``bump_versions`` themselves (the
+coordinate backfill), and changes to data a payload embeds rather than
+stores, such as a rider's or driver's profile, ``forget`` the versions of
+the rides concerned.
+
+Readers that find no version mint a fresh token with ``cache.add``, so they
+never overwrite a version set by a writer that committed in the meantime,
+and a token is never reused for different contents.
+
+Pings held by ``rides.location_buffer`` reach cached details when the buffer
+is flushed.
+"""
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def detail_cache_enabled():
+    return getattr(settings, 'RIDE_DETAIL_CACHE_ENABLED', True)
+
+
+def _cache():
+    return caches[getattr(settings, 'RIDE_DETAIL_CACHE_ALIAS', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'RIDE_DETAIL_CACHE_TTL', 300)
+
+
+def _version_key(ride_id):
+    return f"ride-detail-version:{ride_id}"
+
+
+def _payload_key(ride_id, token, fields, user_id):
+    return f"ride-detail:{ride_id}:{token}:{fields_key(fields)}:{user_id}"
+
+
+def fields_key(fields):
+    """A short key for a sparse fieldset, ``"all"`` for the full payload."""
+    if not fields:
+        return "all"
+    return hashlib.sha1(",".join(fields).encode()).hexdigest()[:12]
+
+
+def _new_version(modified_at):
+    return (uuid.uuid4().hex[:16], modified_at.timestamp())
+
+
+def get_version(ride_id):
+    """Returns the current ``(token, modified_timestamp)`` of a ride, or None."""
+    try:
+        return _cache().get(_version_key(ride_id))
+    except Exception:
+        logger.warning("Ride detail cache lookup failed", exc_info=True)
+        return None
+
+
+def add_version(ride_id, modified_at):
+    """Mints a version for a ride that had none when it was read.
+
+    Returns:
+        tuple: The new version, or None when a writer stored one since; the
+        data read may then predate it and must not be cached under it.
+    """
+    version = _new_version(modified_at)
+    try:
+        if _cache().add(_version_key(ride_id), version, timeout=_ttl()):
+            return version
+    except Exception:
+        logger.warning("Ride detail cache write failed", exc_info=True)
+    return None
+
+
+def bump_versions(changes):
+    """Gives every changed ride a new version.
+
+    Args:
+        changes (list): ``(ride_id, modified_at)`` pairs; ``modified_at`` may
+            be None when the writer did not touch ``updated_at``.
+    """
+    if not changes or not detail_cache_enabled():
+        return
+    now = timezone.now()
+    try:
+        _cache().set_many(
+            {_version_key(ride_id): _new_version(modified_at or now) for ride_id, modified_at in changes},
+            timeout=_ttl(),
+        )
+    except Exception:
+        logger.warning("Could not bump ride detail versions", exc_info=True)
+
+
+def forget(ride_ids):
+    """Drops ride versions, so the next read mints a new one.
+
+    Used for deleted rides and for rides whose embedded data changed without
+    the rides themselves being written.
+    """
+    try:
+        _cache().delete_many([_version_key(ride_id) for ride_id in ride_ids])
+    except Exception:
+        logger.warning("Could not drop ride detail versions", exc_info=True)
+
+
+def get_payload(ride_id, version, fields, user_id):
+    try:
+        return _cache().get(_payload_key(ride_id, version[0], fields, user_id))
+    except Exception:
+        logger.warning("Ride detail cache lookup failed", exc_info=True)
+        return None
+
+
+def set_payload(ride_id, version, fields, user_id, data):
+    try:
+        _cache().set(_payload_key(ride_id, version[0], fields, user_id), data, timeout=_ttl())
+    except Exception:
+        logger.warning("Ride detail cache write failed", exc_info=True)
+
+
+def etag(version, fields):
+    return f'"{version[0]}-{fields_key(fields)}"'
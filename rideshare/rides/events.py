@@ -0,0 +1,327 @@
+"""Fan-out of ride updates to live subscribers.
+
+Writers call ``publish_ride_events`` with the fields that changed; the event
+reaches every open tracking stream of that ride (see
+``rides.async_views.ride_events``). ``LocalBroker`` delivers within one
+process and is what tests use. ``RedisBroker`` publishes through Redis
+pub/sub so that a stream served by any process sees writes made by any
+other, including Celery workers.
+
+A subscription only receives events published after it is ready
+(``Subscription.wait_ready``). If the broker loses its feed, every open
+subscription receives ``CLOSED`` and the streams end, so clients reconnect
+and start again from a fresh snapshot instead of silently missing events.
+
+Each subscriber has a bounded queue. A subscriber that falls behind loses
+its oldest undelivered events rather than slowing down writers or growing
+without bound; since events carry the latest values of the fields they
+mention, the newer events supersede the ones dropped.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .detail_cache import bump_versions, detail_cache_enabled
+
+logger = logging.getLogger(__name__)
+
+# Fields of Rides that are pushed to subscribers when they change.
+TRACKED_FIELDS = (
+    'status', 'driver_id', 'current_latitude', 'current_longitude', 'current_location_address', 'updated_at',
+)
+
+
+# Last event of a subscription whose broker stopped delivering.
+CLOSED = {"type": "stream.closed", "data": {}}
+
+
+class Subscription:
+    """A bounded queue of events for one stream, read from its event loop."""
+
+    def __init__(self, broker, ride_id, max_queue):
+        self.broker = broker
+        self.ride_id = ride_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def mark_ready(self):
+        # Runs on the subscriber's loop.
+        self._ready.set()
+
+    def end(self):
+        # Runs on the subscriber's loop.
+        self._ready.set()
+        self.deliver(CLOSED)
+
+    def notify(self, callback, *args):
+        """Schedules ``callback`` on the subscriber's loop from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The stream's loop has closed; it will unsubscribe itself.
+            pass
+
+    async def wait_ready(self, timeout=None):
+        """Waits until events published from now on reach this subscription.
+
+        Returns:
+            bool: False if it was not ready after ``timeout`` seconds.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def deliver(self, event):
+        # Runs on the subscriber's loop.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Returns the next event, or None after ``timeout`` seconds."""
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process broker: publishing hands events straight to the queues of
+    this process's subscribers, from any thread."""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, ride_id):
+        subscription = Subscription(self, ride_id, self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(ride_id, set()).add(subscription)
+            self._subscribed(subscription)
+        return subscription
+
+    def _subscribed(self, subscription):
+        """Called with the lock held after a subscription is added."""
+        subscription.mark_ready()
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.ride_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.ride_id]
+
+    def wants(self, ride_id):
+        """Whether events for the ride can reach any subscriber."""
+        return ride_id in self._subscribers
+
+    def subscriber_count(self, ride_id=None):
+        with self._lock:
+            if ride_id is not None:
+                return len(self._subscribers.get(ride_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def deliver(self, ride_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(ride_id, ()))
+        for subscription in subscribers:
+            subscription.notify(subscription.deliver, event)
+
+    def publish_many(self, events):
+        for ride_id, event in events:
+            self.published += 1
+            self.deliver(ride_id, event)
+
+
+class RedisBroker(LocalBroker):
+    """Publishes events to Redis and delivers what Redis sends back to this
+    process's subscribers.
+
+    One listener thread per process subscribes to the channels of the rides
+    this process has open streams for, and only while it has any. It is
+    started and retired under the lock that guards the subscribers, so a
+    stream opened while the last one closes always has a listener. A new
+    subscription is ready once Redis confirms its channel, which takes up to
+    ``poll_interval`` seconds plus a round trip.
+
+    If the connection fails, the listener ends every open subscription with
+    ``CLOSED`` and exits; the next subscription starts a new one.
+    """
+
+    poll_interval = 0.1
+
+    def __init__(self, url=None, channel_prefix="ride-events:", max_queue=100):
+        import redis
+
+        super().__init__(max_queue)
+        url = url or f"redis://{settings.REDIS_URL}:{settings.REDIS_PORT}/0"
+        self.channel_prefix = channel_prefix
+        self.client = redis.Redis.from_url(url)
+        self._listener = None
+        # Rides whose channel Redis has confirmed, and subscriptions waiting
+        # for their ride's confirmation.
+        self._confirmed = set()
+        self._waiting = {}
+
+    def _channel(self, ride_id):
+        return f"{self.channel_prefix}{ride_id}"
+
+    def _subscribed(self, subscription):
+        if subscription.ride_id in self._confirmed:
+            subscription.mark_ready()
+        else:
+            self._waiting.setdefault(subscription.ride_id, []).append(subscription)
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, daemon=True)
+            self._listener.start()
+
+    def wants(self, ride_id):
+        # Subscribers may be listening in other processes.
+        return True
+
+    def _listen(self):
+        pubsub = self.client.pubsub()
+        try:
+            subscribed = set()
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._listener = None
+                        self._confirmed.clear()
+                        self._waiting.clear()
+                        return
+                    wanted = set(self._subscribers)
+                    # A channel about to be dropped no longer counts as
+                    # confirmed; a new stream for it waits for a resubscribe.
+                    self._confirmed &= wanted
+                    self._waiting = {ride_id: subs for ride_id, subs in self._waiting.items() if ride_id in wanted}
+                if subscribed - wanted:
+                    pubsub.unsubscribe(*[self._channel(ride_id) for ride_id in subscribed - wanted])
+                if wanted - subscribed:
+                    pubsub.subscribe(*[self._channel(ride_id) for ride_id in wanted - subscribed])
+                subscribed = wanted
+
+                message = pubsub.get_message(timeout=self.poll_interval)
+                if message is None:
+                    continue
+                ride_id = int(message["channel"].decode()[len(self.channel_prefix):])
+                if message["type"] == "message":
+                    self.deliver(ride_id, json.loads(message["data"]))
+                elif message["type"] == "subscribe":
+                    self._confirm(ride_id)
+        except Exception:
+            logger.exception("Ride event listener failed, closing its streams")
+            self._close_all()
+        finally:
+            pubsub.close()
+
+    def _confirm(self, ride_id):
+        with self._lock:
+            if ride_id not in self._subscribers:
+                return
+            self._confirmed.add(ride_id)
+            waiting = self._waiting.pop(ride_id, [])
+        for subscription in waiting:
+            subscription.notify(subscription.mark_ready)
+
+    def _close_all(self):
+        with self._lock:
+            subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+            self._subscribers = {}
+            self._confirmed.clear()
+            self._waiting.clear()
+            self._listener = None
+        for subscription in subscriptions:
+            subscription.notify(subscription.end)
+
+    def publish_many(self, events):
+        pipeline = self.client.pipeline(transaction=False)
+        for ride_id, event in events:
+            pipeline.publish(f"{self.channel_prefix}{ride_id}", json.dumps(event, cls=DjangoJSONEncoder))
+        pipeline.execute()
+        self.published += len(events)
+
+
+_broker = None
+
+
+def get_broker():
+    """Returns the broker configured by the ``RIDE_EVENTS`` setting."""
+    global _broker
+    if _broker is None:
+        config = getattr(settings, "RIDE_EVENTS", {})
+        backend = import_string(config.get("BACKEND", "rides.events.LocalBroker"))
+        _broker = backend(**config.get("OPTIONS", {}))
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == "RIDE_EVENTS":
+        _broker = None
+
+
+def ride_event(values):
+    """Builds the event for a ride from the tracked fields present in ``values``."""
+    return {
+        "type": "ride.updated",
+        "data": json.loads(json.dumps(
+            {field: values[field] for field in TRACKED_FIELDS if field in values}, cls=DjangoJSONEncoder
+        )),
+    }
+
+
+def publish_ride_events(events):
+    """Publishes ``(ride_id, values)`` pairs once the current transaction commits.
+
+    Failures are logged and dropped: live tracking must never fail a write.
+    The rides also get new ride-detail cache versions (``rides.detail_cache``).
+    """
+    events = list(events)
+    if detail_cache_enabled() and events:
+        changes = [(ride_id, values.get('updated_at')) for ride_id, values in events]
+        transaction.on_commit(lambda: bump_versions(changes))
+
+    broker = get_broker()
+    events = [(ride_id, ride_event(values)) for ride_id, values in events if broker.wants(ride_id)]
+    if not events:
+        return
+
+    def publish():
+        try:
+            broker.publish_many(events)
+        except Exception:
+            logger.exception("Could not publish ride events")
+
+    transaction.on_commit(publish)
+
+
+def publish_rides(rides, fields):
+    """Publishes ``fields`` of ride instances written in bulk."""
+    from .models import Rides
+
+    attnames = [Rides._meta.get_field(field).attname for field in fields]
+    attnames = [attname for attname in attnames if attname in TRACKED_FIELDS]
+    publish_ride_events([(ride.id, {attname: getattr(ride, attname) for attname in attnames}) for ride in rides])
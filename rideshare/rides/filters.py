@@ -0,0 +1,68 @@
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def _parse_moment(value, end_of_day=False):
+    # Well formed but impossible values such as 2024-02-30 raise ValueError.
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class RideFilterBackend(BaseFilterBackend):
+    """Filters rides from query parameters.
+
+    Rides are limited to those the requesting profile rides in or drives
+    (none for a user without a profile), unless a staff user passes
+    ``scope=all``. On top of that:
+
+    - ``rider`` / ``driver``: profile id
+    - ``status``: one status or several, comma separated
+    - ``created_after`` / ``created_before``: ISO date or datetime, inclusive
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if not (params.get('scope') == 'all' and request.user.is_staff):
+            profile = getattr(request.user, 'profile', None)
+            if profile is None:
+                # a user without a profile has no rides
+                return queryset.none()
+            queryset = queryset.filter(Q(rider=profile) | Q(driver=profile))
+
+        errors = {}
+        for field in ('rider', 'driver'):
+            if params.get(field):
+                try:
+                    queryset = queryset.filter(**{f'{field}_id': int(params[field])})
+                except ValueError:
+                    errors[field] = "Must be a profile id."
+
+        if params.get('status'):
+            queryset = queryset.filter(status__in=[s.strip() for s in params['status'].split(',') if s.strip()])
+
+        for param, lookup, end_of_day in (('created_after', 'gte', False), ('created_before', 'lte', True)):
+            if params.get(param):
+                moment = _parse_moment(params[param], end_of_day)
+                if moment is None:
+                    errors[param] = "Must be an ISO 8601 date or datetime."
+                else:
+                    queryset = queryset.filter(**{f'created_at__{lookup}': moment})
+
+        if errors:
+            raise ValidationError(errors)
+        return queryset
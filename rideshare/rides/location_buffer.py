@@ -0,0 +1,158 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Rides
+
+logger = logging.getLogger(__name__)
+
+
+class LocationBuffer:
+    """Write-behind buffer for ride positions.
+
+    Pings overwrite the latest position per ride in memory and are written to
+    the database in one ``bulk_update`` per flush. A flush runs
+    ``flush_interval`` seconds after the first buffered ping, as soon as
+    ``max_pending`` rides are waiting, and when the process exits.
+
+    Every ping is also kept as a trail point and appended to the ride's trail
+    (see ``rides.trail``) when the batch is flushed.
+
+    A crash loses at most the positions buffered since the last flush: no more
+    than ``flush_interval`` seconds of pings, covering at most ``max_pending``
+    rides. Reads through ``position``/``overlay`` see buffered positions only
+    in the process that received the ping.
+    """
+
+    def __init__(self, flush_interval=5, max_pending=1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._trails = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self.flushes = 0
+        self.rows_written = 0
+        atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, ride_id, lat, lon, trail=None, recorded_at=None):
+        """Buffers a ride's latest position.
+
+        Args:
+            ride_id (int): The ride the ping belongs to.
+            lat (float): Latitude of the ping, or None to only add ``trail``.
+            lon (float): Longitude of the ping.
+            trail (list, optional): ``(lat, lon, recorded_at)`` points to add
+                to the trail. Defaults to the ping itself.
+            recorded_at (datetime, optional): When the position was taken.
+                Defaults to now. A position older than the one already
+                buffered for the ride does not replace it.
+        """
+        recorded_at = recorded_at or timezone.now()
+        with self._lock:
+            current = self._pending.get(ride_id)
+            if lat is not None and (current is None or recorded_at >= current[2]):
+                self._pending[ride_id] = (lat, lon, recorded_at)
+            if trail is None and lat is not None:
+                trail = [(lat, lon, recorded_at)]
+            self._trails.setdefault(ride_id, []).extend(trail or [])
+            full = len(self._pending) >= self.max_pending
+            if not full:
+                self._start_timer()
+        if full:
+            # The ping is already buffered, so a failed flush must not fail
+            # the request that sent it; the timer retries it.
+            self._flush_or_retry()
+
+    def position(self, ride_id):
+        """Returns the buffered ``(lat, lon)`` of a ride, or None."""
+        entry = self._pending.get(ride_id)
+        return entry[:2] if entry else None
+
+    def overlay(self, rides):
+        """Replaces stored positions on ride instances with buffered ones."""
+        for ride in rides:
+            entry = self._pending.get(ride.id)
+            if entry:
+                ride.current_latitude, ride.current_longitude, ride.updated_at = entry
+        return rides
+
+    def flush(self):
+        """Writes every buffered position and returns the flushed ride ids."""
+        from .events import publish_rides
+        from .tasks import schedule_address_refresh
+        from .trail import append_trails, trail_enabled
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                trails, self._trails = self._trails, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batch and not trails:
+                return []
+
+            rides = [
+                Rides(id=ride_id, current_latitude=lat, current_longitude=lon, updated_at=updated_at)
+                for ride_id, (lat, lon, updated_at) in batch.items()
+            ]
+            try:
+                with transaction.atomic():
+                    Rides.objects.bulk_update(rides, ['current_latitude', 'current_longitude', 'updated_at'])
+                    publish_rides(rides, ['current_latitude', 'current_longitude', 'updated_at'])
+                    if trail_enabled():
+                        append_trails(trails)
+            except Exception:
+                # Put the batch back without clobbering newer pings.
+                with self._lock:
+                    for ride_id, entry in batch.items():
+                        self._pending.setdefault(ride_id, entry)
+                        self._trails[ride_id] = trails.get(ride_id, []) + self._trails.get(ride_id, [])
+                raise
+            self.flushes += 1
+            self.rows_written += len(rides)
+
+        for ride_id in batch:
+            schedule_address_refresh(ride_id)
+        return list(batch)
+
+    def _start_timer(self):
+        # Called with self._lock held.
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_or_retry(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Location buffer flush failed")
+            with self._lock:
+                if self._pending:
+                    self._start_timer()
+
+    def _timed_flush(self):
+        try:
+            self._flush_or_retry()
+        finally:
+            connection.close()
+
+
+location_buffer = LocationBuffer(
+    flush_interval=getattr(settings, 'LOCATION_BUFFER_FLUSH_SECONDS', 5),
+    max_pending=getattr(settings, 'LOCATION_BUFFER_MAX_PENDING', 1000),
+)
+
+
+def buffering_enabled():
+    return getattr(settings, 'LOCATION_BUFFER_ENABLED', False)
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from rides.detail_cache import bump_versions
+from rides.models import Rides
+from utils.helpers import RIDE_POINTS, geocode_cache, geocode_ride_points
+
+
+class Command(BaseCommand):
+    help = "Geocodes pickup and dropoff addresses of existing rides that have no stored coordinates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Rides fetched and written per batch.")
+        parser.add_argument('--delay', type=float, default=1.0,
+                            help="Seconds to wait after each call to the geocoder (Nominatim allows 1/s).")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Stop after this many rides.")
+
+    def handle(self, *args, **options):
+        missing = Q()
+        for point in RIDE_POINTS:
+            missing |= Q(**{f'{point}_latitude__isnull': True, f'{point}_location__isnull': False})
+
+        fields = [f'{point}_{axis}' for point in RIDE_POINTS for axis in ('latitude', 'longitude')]
+        locations = [f'{point}_location' for point in RIDE_POINTS]
+        last_id = 0
+        processed = updated = 0
+        while options['limit'] is None or processed < options['limit']:
+            size = options['batch_size']
+            if options['limit'] is not None:
+                size = min(size, options['limit'] - processed)
+            batch = list(
+                Rides.objects.filter(missing, id__gt=last_id)
+                .order_by('id')
+                .only('id', *locations, *fields)[:size]
+            )
+            if not batch:
+                break
+
+            now = timezone.now()
+            changed = []
+            for ride in batch:
+                misses_before = geocode_cache.stats()["misses"]
+                coordinates = geocode_ride_points({f: getattr(ride, f) for f in locations + fields})
+                # Cached addresses cost nothing upstream, so only throttle
+                # when the geocoder was actually called.
+                if geocode_cache.stats()["misses"] != misses_before:
+                    time.sleep(options['delay'])
+                if coordinates:
+                    for field, value in coordinates.items():
+                        setattr(ride, field, value)
+                    ride.updated_at = now
+                    changed.append(ride)
+
+            Rides.objects.bulk_update(changed, fields + ['updated_at'])
+            bump_versions([(ride.id, now) for ride in changed])
+            processed += len(batch)
+            updated += len(changed)
+            last_id = batch[-1].id
+            self.stdout.write(f"Processed {processed} rides, updated {updated}.")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled coordinates for {updated} of {processed} rides."))
@@ -0,0 +1,111 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.models import Profile
+from rides.models import Rides
+from utils.constants import ACCEPTED, DRIVER, REQUESTED, RIDER
+from utils.helpers import geocode_cache
+
+ENDPOINTS = ('update-location', 'find-driver', 'accept-ride')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of the sync (WSGI) and async (ASGI) versions of the update-location, "
+        "find-driver and accept-ride endpoints, with a stub geocoder of fixed latency. Creates its own "
+        "users and rides in the configured database and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint and mode.")
+        parser.add_argument('--threads', type=int, default=4,
+                            help="Worker threads serving the sync views, as in a threaded WSGI worker.")
+        parser.add_argument('--concurrency', type=int, default=100,
+                            help="Requests kept in flight against the async views.")
+        parser.add_argument('--latency', type=float, default=0.1, help="Stub geocoder latency in seconds.")
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        geocoder = {
+            "BACKEND": "utils.geocoders.StubGeocoder",
+            "OPTIONS": {"latency": options['latency']},
+        }
+        rider = self.make_user(f"bench-rider-{run}", RIDER)
+        driver = self.make_user(f"bench-driver-{run}", DRIVER, latitude=12.9716, longitude=77.5946)
+        try:
+            # The test clients send Host: testserver.
+            with override_settings(GEOCODER=geocoder, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                self.stdout.write(f"{'endpoint':>16} {'mode':>6} {'seconds':>9} {'req/s':>9} {'errors':>7}")
+                for endpoint in options['endpoints']:
+                    for mode in ('wsgi', 'asgi'):
+                        requests = self.build_requests(endpoint, mode, run, rider, driver, options['requests'])
+                        geocode_cache.local.clear()
+                        started = time.perf_counter()
+                        if mode == 'wsgi':
+                            codes = self.run_sync(requests, options['threads'])
+                        else:
+                            codes = asyncio.run(self.run_async(requests, options['concurrency']))
+                        elapsed = time.perf_counter() - started
+                        errors = sum(code >= 400 for code in codes)
+                        self.stdout.write(
+                            f"{endpoint:>16} {mode:>6} {elapsed:>9.2f} {len(codes) / elapsed:>9.1f} {errors:>7}"
+                        )
+        finally:
+            Rides.objects.filter(pickup_location__startswith=f"bench-{run}").delete()
+            User.objects.filter(username__endswith=run).delete()
+
+    def make_user(self, username, user_type, **location):
+        user = User.objects.create_user(username=username)
+        Profile.objects.create(user=user, user_type=user_type, full_name=username, **location)
+        return user
+
+    def build_requests(self, endpoint, mode, run, rider, driver, count):
+        """Returns ``(method, url, data, token)`` for ``count`` requests, each on its own ride."""
+        prefix = '' if mode == 'wsgi' else 'async-'
+        status = ACCEPTED if endpoint == 'update-location' else REQUESTED
+        rides = Rides.objects.bulk_create([
+            # Unique pickups so every find-driver request reaches the geocoder.
+            Rides(rider=rider.profile, status=status, pickup_location=f"bench-{run} {mode} {n}")
+            for n in range(count)
+        ])
+        if endpoint == 'update-location':
+            token = str(AccessToken.for_user(rider))
+            return [('post', reverse(f'{prefix}update-location'),
+                     {"ride_id": ride.id, "latitude": 12.97, "longitude": 77.59}, token) for ride in rides]
+        if endpoint == 'find-driver':
+            token = str(AccessToken.for_user(rider))
+            return [('post', reverse(f'{prefix}find-driver'), {"ride_id": ride.id}, token) for ride in rides]
+        token = str(AccessToken.for_user(driver))
+        return [('post', reverse(f'{prefix}accept-ride', kwargs={'pk': ride.id}), {}, token) for ride in rides]
+
+    def run_sync(self, requests, threads):
+        def send(request):
+            method, url, data, token = request
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            return getattr(Client(), method)(url, data, content_type='application/json', headers=headers).status_code
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(send, requests))
+
+    async def run_async(self, requests, concurrency):
+        slots = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def send(request):
+            method, url, data, token = request
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            async with slots:
+                response = await getattr(client, method)(url, data, content_type='application/json', headers=headers)
+                return response.status_code
+
+        return await asyncio.gather(*(send(request) for request in requests))
@@ -0,0 +1,54 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from rides.models import Rides
+from rides.serializers import RideSerializer
+from utils import renderers
+
+
+class Command(BaseCommand):
+    help = "Compares the JSON encoders on ride list payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rides', type=int, default=200, help="Rides per payload (one list page).")
+        parser.add_argument('--repeat', type=int, default=200, help="Encodings per encoder.")
+
+    def payload(self, count):
+        now = timezone.now()
+        rides = [
+            Rides(
+                id=i, rider_id=i, driver_id=i + 1, status="Started",
+                pickup_location=f"{i} Main St", dropoff_location=f"{i} Elm St",
+                pickup_latitude=12.97 + i * 1e-4, pickup_longitude=77.59 + i * 1e-4,
+                dropoff_latitude=12.99, dropoff_longitude=77.61,
+                current_latitude=12.98, current_longitude=77.60,
+                current_location_address="Some street, City", is_active=True,
+                created_at=now - timedelta(minutes=i), updated_at=now,
+            )
+            for i in range(1, count + 1)
+        ]
+        return {"message": "Success", "results": {"data": RideSerializer(rides, many=True).data}}
+
+    def handle(self, *args, **options):
+        data = self.payload(options['rides'])
+        encoders = {
+            'JsonResponse': lambda value: json.dumps(value, cls=DjangoJSONEncoder).encode(),
+            'stdlib': renderers._stdlib_dumps,
+        }
+        if renderers.orjson is not None:
+            encoders['orjson'] = renderers._orjson_dumps
+
+        self.stdout.write(f"{options['rides']} rides per payload, {options['repeat']} encodings")
+        self.stdout.write(f"{'encoder':>14} {'bytes':>9} {'ms/payload':>11} {'MB/s':>8}")
+        for name, encode in encoders.items():
+            size = len(encode(data))
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                encode(data)
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            self.stdout.write(f"{name:>14} {size:>9} {elapsed * 1000:>11.3f} {size / elapsed / 1e6:>8.1f}")
@@ -0,0 +1,44 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from rides.matching import UNREACHABLE, greedy_assignment, hungarian
+from utils.helpers import haversine_matrix
+
+
+class Command(BaseCommand):
+    help = "Reports batch matching solve time against batch size on synthetic riders and drivers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 50, 100, 200, 500, 1000])
+        parser.add_argument('--radius', type=float, default=5.0, help="Matching radius in km.")
+        parser.add_argument('--spread', type=float, default=0.2, help="Half-width of the city in degrees.")
+        parser.add_argument('--optimal-max-size', type=int, default=500,
+                            help="Largest batch to also solve with the Hungarian algorithm.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        radius = options['radius']
+        spread = options['spread']
+
+        self.stdout.write(f"{'size':>6} {'solver':>10} {'seconds':>10} {'matched':>8} {'total km':>10}")
+        for size in options['sizes']:
+            center = (12.9716, 77.5946)
+            riders = rng.uniform(-spread, spread, size=(size, 2)) + center
+            drivers = rng.uniform(-spread, spread, size=(size, 2)) + center
+            distances = haversine_matrix(riders[:, 0], riders[:, 1], drivers[:, 0], drivers[:, 1])
+            cost = np.where(distances <= radius, distances, UNREACHABLE)
+
+            solvers = [('greedy', greedy_assignment)]
+            if size <= options['optimal_max_size']:
+                solvers.insert(0, ('hungarian', hungarian))
+
+            for name, solve in solvers:
+                started = time.perf_counter()
+                pairs = solve(cost)
+                elapsed = time.perf_counter() - started
+                matched = [(r, c) for r, c in pairs if cost[r, c] < UNREACHABLE]
+                total = sum(distances[r, c] for r, c in matched)
+                self.stdout.write(f"{size:>6} {name:>10} {elapsed:>10.4f} {len(matched):>8} {total:>10.1f}")
@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from utils import polyline
+from utils.simplify import simplify
+
+
+class Command(BaseCommand):
+    help = "Reports compression ratio, payload size and throughput of trail simplification on synthetic trails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trails', type=int, default=200, help="Synthetic trails per run.")
+        parser.add_argument('--points', type=int, default=1800,
+                            help="Points per trail (1800 is a 30 minute ride pinged every second).")
+        parser.add_argument('--tolerances', nargs='+', type=float, default=[1.0, 5.0, 10.0, 25.0],
+                            help="Tolerances in metres to try.")
+        parser.add_argument('--noise', type=float, default=3.0, help="GPS noise in metres.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def synthetic_trail(self, rng, points, noise_m):
+        # A drive along straight legs with turns every minute or so, at
+        # 5-15 m/s, plus gaussian GPS noise.
+        headings = np.repeat(rng.uniform(0, 2 * np.pi, size=points // 60 + 1), 60)[:points]
+        speeds = rng.uniform(5, 15, size=points)
+        north = np.cumsum(speeds * np.cos(headings)) + rng.normal(0, noise_m, size=points)
+        east = np.cumsum(speeds * np.sin(headings)) + rng.normal(0, noise_m, size=points)
+        lat = 12.9716 + north / 111195
+        lon = 77.5946 + east / (111195 * np.cos(np.radians(12.9716)))
+        return [(a, b, 1747476000 + i) for i, (a, b) in enumerate(zip(lat, lon))]
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        trails = [self.synthetic_trail(rng, options['points'], options['noise'])
+                  for _ in range(options['trails'])]
+        raw_points = sum(len(trail) for trail in trails)
+        raw_bytes = sum(len(polyline.encode(trail)[0]) for trail in trails)
+        self.stdout.write(f"{options['trails']} trails, {raw_points} points, {raw_bytes} encoded bytes")
+
+        self.stdout.write(
+            f"{'method':>16} {'tol m':>6} {'points':>9} {'ratio':>7} {'bytes':>10} {'ratio':>7} {'points/s':>12}"
+        )
+        for method in ('douglas_peucker', 'thin'):
+            for tolerance in options['tolerances']:
+                started = time.perf_counter()
+                simplified = [simplify(trail, method, tolerance) for trail in trails]
+                elapsed = time.perf_counter() - started
+                points = sum(len(trail) for trail in simplified)
+                size = sum(len(polyline.encode(trail)[0]) for trail in simplified)
+                self.stdout.write(
+                    f"{method:>16} {tolerance:>6.1f} {points:>9} {raw_points / points:>7.1f} "
+                    f"{size:>10} {raw_bytes / size:>7.1f} {raw_points / elapsed:>12.0f}"
+                )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from rides.tasks import simulation_dispatch_stats
+from utils.helpers import geocode_cache, reverse_geocode_cache
+
+
+class Command(BaseCommand):
+    help = "Shows the simulation dispatch and geocode cache counters summed over every process."
+
+    def handle(self, *args, **options):
+        dispatch = simulation_dispatch_stats.shared_stats()
+        self.stdout.write(
+            f"simulation dispatch: {dispatch['dispatched']} queued, {dispatch['deduplicated']} deduplicated "
+            f"({dispatch['dedup_rate']:.1%} dedup rate)"
+        )
+        for name, geo_cache in (("geocode", geocode_cache), ("reverse geocode", reverse_geocode_cache)):
+            stats = geo_cache.shared_stats()
+            self.stdout.write(
+                f"{name} cache: {stats['local_hits']} local hits, {stats['shared_hits']} shared hits, "
+                f"{stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)"
+            )
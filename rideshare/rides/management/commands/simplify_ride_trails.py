@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from rides.models import RideTrailChunk
+from rides.trail import simplify_trail
+from utils.constants import CANCELLED, COMPLETED
+
+
+class Command(BaseCommand):
+    help = "Simplifies the stored trails of finished rides that have not been simplified yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=['douglas_peucker', 'thin'], default=None,
+                            help="Defaults to RIDE_TRAIL_SIMPLIFY_METHOD.")
+        parser.add_argument('--tolerance', type=float, default=None,
+                            help="Allowed error in metres. Defaults to RIDE_TRAIL_SIMPLIFY_TOLERANCE_METERS.")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Rides fetched per batch.")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Stop after this many rides.")
+
+    def handle(self, *args, **options):
+        last_id = 0
+        processed = before = after = 0
+        while options['limit'] is None or processed < options['limit']:
+            size = options['batch_size']
+            if options['limit'] is not None:
+                size = min(size, options['limit'] - processed)
+            ride_ids = list(
+                RideTrailChunk.objects.filter(
+                    simplified=False,
+                    ride__status__in=[COMPLETED, CANCELLED],
+                    ride_id__gt=last_id,
+                )
+                .order_by('ride_id')
+                .values_list('ride_id', flat=True)
+                .distinct()[:size]
+            )
+            if not ride_ids:
+                break
+
+            for ride_id in ride_ids:
+                old, new = simplify_trail(ride_id, options['method'], options['tolerance'])
+                before += old
+                after += new
+            processed += len(ride_ids)
+            last_id = ride_ids[-1]
+            self.stdout.write(f"Simplified {processed} trails, {before} -> {after} points.")
+
+        self.stdout.write(self.style.SUCCESS(f"Simplified {processed} trails from {before} to {after} points."))
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rides.models import RideSimulation, Rides
+from rides.simulation import advance_simulations, start_simulation
+from utils.constants import STARTED
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts simulated movement for started rides and optionally drives the ticks in this "
+        "process, reporting throughput. Use --create to add synthetic rides for load tests and demos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--create', type=int, default=0,
+                            help="Synthetic started rides to create first.")
+        parser.add_argument('--steps', type=int, default=None)
+        parser.add_argument('--speed', type=float, default=None, help="Speed in metres per second.")
+        parser.add_argument('--step-seconds', type=float, default=None)
+        parser.add_argument('--spread', type=float, default=0.2, help="Half-width of the city in degrees.")
+        parser.add_argument('--run', action='store_true',
+                            help="Advance the simulations here instead of waiting for the beat task.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        center = np.array([12.9716, 77.5946])
+        spread = options['spread']
+
+        if options['create']:
+            starts = rng.uniform(-spread, spread, size=(options['create'], 2)) + center
+            ends = rng.uniform(-spread, spread, size=(options['create'], 2)) + center
+            Rides.objects.bulk_create([
+                Rides(
+                    pickup_location="Simulated", dropoff_location="Simulated", status=STARTED,
+                    current_latitude=start[0], current_longitude=start[1],
+                    dropoff_latitude=end[0], dropoff_longitude=end[1],
+                )
+                for start, end in zip(starts.tolist(), ends.tolist())
+            ], batch_size=1000)
+
+        started = 0
+        for ride in Rides.objects.active().filter(status=STARTED).iterator(chunk_size=1000):
+            if start_simulation(ride, speed_mps=options['speed'], steps=options['steps'],
+                                step_seconds=options['step_seconds']):
+                started += 1
+        self.stdout.write(f"Started {started} simulations.")
+        if not options['run']:
+            return
+
+        steps = 0
+        busy = 0.0
+        began = time.perf_counter()
+        while RideSimulation.objects.filter(finished_at__isnull=True).exists():
+            tick = time.perf_counter()
+            advanced = advance_simulations(timezone.now())
+            elapsed = time.perf_counter() - tick
+            if advanced:
+                steps += advanced
+                busy += elapsed
+                self.stdout.write(f"Advanced {advanced} rides in {elapsed:.3f}s.")
+            time.sleep(0.2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Took {steps} steps in {time.perf_counter() - began:.1f}s, "
+            f"{steps / busy if busy else 0:.0f} steps/s while writing."
+        ))
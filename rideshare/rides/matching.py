@@ -0,0 +1,190 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import Profile
+from rides.events import publish_rides
+from rides.models import Rides
+from utils.constants import ACCEPTED, DRIVER, REQUESTED, STARTED
+from utils.helpers import haversine_matrix, pickup_coordinates
+from utils.spatial import driver_index
+
+# Cost given to rider/driver pairs outside the matching radius. It dominates
+# any real distance, so the solver only uses such a pair when nothing else is
+# left, and those pairs are dropped afterwards.
+UNREACHABLE = 1e9
+
+
+def hungarian(cost):
+    """Solves the rectangular assignment problem minimising total cost.
+
+    Shortest augmenting path variant of the Hungarian algorithm, O(n^2 m) for
+    an ``n x m`` matrix.
+
+    Args:
+        cost (numpy.ndarray): Cost matrix of shape ``(n, m)``.
+
+    Returns:
+        list: ``(row, col)`` pairs, one per row when ``n <= m`` or one per
+        column otherwise.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return []
+    if cost.shape[0] > cost.shape[1]:
+        return sorted((row, col) for col, row in hungarian(cost.T))
+
+    n, m = cost.shape
+    # 1-indexed working arrays; index 0 is the virtual start column/row.
+    a = np.zeros((n + 1, m + 1))
+    a[1:, 1:] = cost
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            cur = a[i0] - u[i0] - v
+            improved = free & (cur < minv)
+            minv[improved] = cur[improved]
+            way[improved] = j0
+            j1 = int(np.argmin(np.where(free, minv, np.inf)))
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    return sorted((int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j])
+
+
+def greedy_assignment(cost):
+    """Assigns pairs in increasing cost order, skipping taken rows and columns.
+
+    Args:
+        cost (numpy.ndarray): Cost matrix of shape ``(n, m)``.
+
+    Returns:
+        list: ``(row, col)`` pairs.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return []
+    n, m = cost.shape
+    rows_taken = np.zeros(n, dtype=bool)
+    cols_taken = np.zeros(m, dtype=bool)
+    pairs = []
+    for flat in np.argsort(cost, axis=None, kind='stable'):
+        row, col = divmod(int(flat), m)
+        if rows_taken[row] or cols_taken[col]:
+            continue
+        rows_taken[row] = cols_taken[col] = True
+        pairs.append((row, col))
+        if len(pairs) == min(n, m):
+            break
+    return sorted(pairs)
+
+
+def solve_assignment(distances, radius_km, optimal_max_size=None):
+    """Matches rows to columns of a distance matrix within ``radius_km``.
+
+    Batches up to ``optimal_max_size`` on either side are solved optimally with
+    the Hungarian algorithm; larger ones fall back to greedy-by-distance.
+
+    Returns:
+        list: ``(row, col)`` pairs whose distance is within the radius.
+    """
+    if optimal_max_size is None:
+        optimal_max_size = getattr(settings, 'MATCHING_OPTIMAL_MAX_SIZE', 200)
+    cost = np.where(distances <= radius_km, distances, UNREACHABLE)
+    if max(cost.shape, default=0) <= optimal_max_size:
+        pairs = hungarian(cost)
+    else:
+        pairs = greedy_assignment(cost)
+    return [(row, col) for row, col in pairs if cost[row, col] < UNREACHABLE]
+
+
+def match_requested_rides(radius_km=None, batch_limit=None):
+    """Assigns drivers to every unassigned ``Requested`` ride in one batch.
+
+    Builds a rider x driver distance matrix over the outstanding rides and the
+    drivers not already busy with a ride, solves the assignment globally and
+    writes the result with a single ``bulk_update``.
+
+    Returns:
+        list: The rides that were assigned a driver.
+    """
+    if radius_km is None:
+        radius_km = getattr(settings, 'MATCHING_RADIUS_KM', 5)
+    if batch_limit is None:
+        batch_limit = getattr(settings, 'MATCHING_BATCH_LIMIT', 1000)
+
+    unassigned = Rides.objects.active().filter(status=REQUESTED, driver__isnull=True)
+
+    # Rides created before coordinates were stored are geocoded up front, so
+    # no network calls happen while the batch holds its row locks.
+    for ride in unassigned.filter(pickup_latitude__isnull=True).order_by('created_at')[:batch_limit]:
+        pickup_coordinates(ride)
+
+    with transaction.atomic():
+        rides = list(
+            unassigned
+            .select_for_update(skip_locked=True)
+            .filter(pickup_latitude__isnull=False, pickup_longitude__isnull=False)
+            .order_by('created_at')[:batch_limit]
+        )
+        pickups = [(ride, ride.pickup_latitude, ride.pickup_longitude) for ride in rides]
+        if not pickups:
+            return []
+
+        candidate_ids = set()
+        for _, lat, lon in pickups:
+            candidate_ids.update(
+                driver_id for driver_id, _, _ in driver_index.query(lat, lon, radius_km)
+            )
+        busy_ids = Rides.objects.active().filter(
+            driver__isnull=False,
+            status__in=[REQUESTED, ACCEPTED, STARTED]
+        ).values_list('driver_id', flat=True)
+        drivers = list(
+            Profile.objects.filter(
+                id__in=candidate_ids,
+                user_type=DRIVER,
+                latitude__isnull=False,
+                longitude__isnull=False
+            ).exclude(id__in=busy_ids)
+        )
+        if not drivers:
+            return []
+
+        distances = haversine_matrix(
+            [lat for _, lat, _ in pickups],
+            [lon for _, _, lon in pickups],
+            [d.latitude for d in drivers],
+            [d.longitude for d in drivers],
+        )
+        now = timezone.now()
+        assigned = []
+        for row, col in solve_assignment(distances, radius_km):
+            ride = pickups[row][0]
+            ride.driver = drivers[col]
+            ride.updated_at = now
+            assigned.append(ride)
+        Rides.objects.bulk_update(assigned, ['driver', 'updated_at'])
+        publish_rides(assigned, ['driver', 'updated_at'])
+    return assigned
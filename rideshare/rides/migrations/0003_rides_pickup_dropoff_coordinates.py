@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0002_rides_current_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rides',
+            name='dropoff_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rides',
+            name='dropoff_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rides',
+            name='pickup_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rides',
+            name='pickup_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0003_rides_pickup_dropoff_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideTrailChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date and time the service was created', verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Date and time the service was last updated', verbose_name='Updated At')),
+                ('deleted', models.BooleanField(default=False)),
+                ('sequence', models.PositiveIntegerField()),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('last_latitude', models.FloatField()),
+                ('last_longitude', models.FloatField()),
+                ('encoded', models.TextField(default='')),
+                ('ride', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trail_chunks', to='rides.rides')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ride', 'sequence'), name='unique_ride_trail_chunk')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0004_ridetrailchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ridetrailchunk',
+            name='simplified',
+            field=models.BooleanField(default=False),
+        ),
+    ]
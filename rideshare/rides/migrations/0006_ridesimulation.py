@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0005_ridetrailchunk_simplified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideSimulation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date and time the service was created', verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Date and time the service was last updated', verbose_name='Updated At')),
+                ('deleted', models.BooleanField(default=False)),
+                ('route', models.JSONField(default=list)),
+                ('speed_mps', models.FloatField()),
+                ('step_seconds', models.FloatField()),
+                ('steps_total', models.PositiveIntegerField()),
+                ('steps_done', models.PositiveIntegerField(default=0)),
+                ('distance_m', models.FloatField(default=0)),
+                ('next_step_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('ride', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='simulation', to='rides.rides')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['finished_at', 'next_step_at'], name='simulation_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_profile_profile_type_location_idx'),
+        ('rides', '0006_ridesimulation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rides',
+            index=models.Index(fields=['rider', 'created_at', 'id'], name='rides_rider_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rides',
+            index=models.Index(fields=['driver', 'created_at', 'id'], name='rides_driver_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rides',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='rides_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rides',
+            index=models.Index(fields=['created_at', 'id'], name='rides_created_idx'),
+        ),
+    ]
@@ -11,8 +11,58 @@ class Rides(Model):
     driver = models.ForeignKey(Profile, on_delete=models.CASCADE, null=True, blank=True, related_name='driver')
     pickup_location = models.CharField(max_length=255, blank=True, null=True)
     dropoff_location = models.CharField(max_length=255, blank=True, null=True)
+    pickup_latitude = models.FloatField(null=True, blank=True)
+    pickup_longitude = models.FloatField(null=True, blank=True)
+    dropoff_latitude = models.FloatField(null=True, blank=True)
+    dropoff_longitude = models.FloatField(null=True, blank=True)
     status = models.CharField(max_length=255, choices=RIDE_STATUS, blank=True, null=True)
     current_latitude = models.FloatField(null=True, blank=True)
     current_longitude = models.FloatField(null=True, blank=True)
     current_location_address = models.TextField(null=True, blank=True)
-    is_active = models.BooleanField(default=True, blank=True, null=True)
\ No newline at end of file
+    is_active = models.BooleanField(default=True, blank=True, null=True)
+
+    class Meta:
+        # Ride listings filter on a participant or status and page through
+        # (created_at, id); see utils.pagination.KeysetPagination.
+        indexes = [
+            models.Index(fields=['rider', 'created_at', 'id'], name='rides_rider_created_idx'),
+            models.Index(fields=['driver', 'created_at', 'id'], name='rides_driver_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='rides_status_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='rides_created_idx'),
+        ]
+
+class RideTrailChunk(Model):
+    # Location history of a ride, packed into delta-encoded chunks (see
+    # utils.polyline) so a long trip costs a handful of rows.
+    ride = models.ForeignKey(Rides, on_delete=models.CASCADE, related_name='trail_chunks')
+    sequence = models.PositiveIntegerField()
+    point_count = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    last_latitude = models.FloatField()
+    last_longitude = models.FloatField()
+    encoded = models.TextField(default="")
+    simplified = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ride', 'sequence'], name='unique_ride_trail_chunk'),
+        ]
+
+class RideSimulation(Model):
+    # Scripted movement of a ride along a route, advanced in bulk by the
+    # advance_ride_simulations task (see rides.simulation).
+    ride = models.OneToOneField(Rides, on_delete=models.CASCADE, related_name='simulation')
+    route = models.JSONField(default=list)
+    speed_mps = models.FloatField()
+    step_seconds = models.FloatField()
+    steps_total = models.PositiveIntegerField()
+    steps_done = models.PositiveIntegerField(default=0)
+    distance_m = models.FloatField(default=0)
+    next_step_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['finished_at', 'next_step_at'], name='simulation_due_idx'),
+        ]
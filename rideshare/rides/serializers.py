@@ -1,9 +1,71 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Rides
+from authentication.models import Profile
+from utils.fieldsets import SparseFieldsMixin
 
 
 class RideSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Rides
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+    def validate(self, data):
+        """
+        Check that coordinates come in complete latitude/longitude pairs.
+        """
+        for point in ("pickup", "dropoff"):
+            lat = data.get(f"{point}_latitude")
+            lon = data.get(f"{point}_longitude")
+            if (lat is None) != (lon is None):
+                raise serializers.ValidationError(
+                    {f"{point}_latitude": "Latitude and longitude must be provided together."}
+                )
+            if lat is not None and not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise serializers.ValidationError(
+                    {f"{point}_latitude": "Coordinates are out of range."}
+                )
+        return data
+
+
+class ProfileSummarySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Profile
+        fields = ["id", "full_name", "phone_number", "user_type"]
+
+
+class ExpandedRideSerializer(SparseFieldsMixin, RideSerializer):
+    """A ride with compact summaries of its rider and driver next to their ids.
+
+    Querysets serialized with it should ``select_related('rider', 'driver')``
+    so the summaries cost no extra queries. Output can be limited to the
+    fields in ``context['fields']`` (see ``utils.fieldsets``).
+    """
+    rider_summary = ProfileSummarySerializer(source="rider", read_only=True)
+    driver_summary = ProfileSummarySerializer(source="driver", read_only=True)
+
+
+class NearbyDriverSerializer(serializers.ModelSerializer):
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Profile
+        fields = ["id", "full_name", "phone_number", "latitude", "longitude", "distance_km"]
+
+
+
+class LocationPointSerializer(serializers.Serializer):
+    ride_id = serializers.IntegerField()
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    timestamp = serializers.DateTimeField(required=False)
+
+
+class BulkLocationUpdateSerializer(serializers.Serializer):
+    points = LocationPointSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=getattr(settings, 'BULK_LOCATION_MAX_POINTS', 5000),
+    )
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from authentication.models import Profile
+from rides.detail_cache import forget
+from rides.events import TRACKED_FIELDS, publish_ride_events
+from rides.models import Rides
+from rides.serializers import ProfileSummarySerializer
+from rides.tasks import schedule_trail_simplification
+from utils.constants import COMPLETED
+
+
+@receiver(post_save, sender=Rides)
+def simplify_completed_trail(sender, instance, **kwargs):
+    if instance.status == COMPLETED and getattr(settings, 'RIDE_TRAIL_SIMPLIFY_ON_COMPLETE', True):
+        schedule_trail_simplification(instance.id)
+
+
+@receiver(post_save, sender=Rides)
+def publish_ride_update(sender, instance, created, update_fields=None, **kwargs):
+    # Only fields already loaded on the instance are sent, so publishing
+    # never triggers a query for deferred ones.
+    if update_fields is not None:
+        update_fields = {sender._meta.get_field(name).attname for name in update_fields}
+    values = {
+        field: instance.__dict__[field]
+        for field in TRACKED_FIELDS
+        if field in instance.__dict__ and (update_fields is None or field in update_fields)
+    }
+    publish_ride_events([(instance.id, values)])
+
+
+@receiver(post_delete, sender=Rides)
+def forget_deleted_ride(sender, instance, **kwargs):
+    ride_id = instance.id
+    transaction.on_commit(lambda: forget([ride_id]))
+
+
+@receiver(post_save, sender=Profile)
+def forget_rides_of_changed_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Ride details embed rider and driver summaries. Position-only saves,
+    # which drivers make all the time, do not touch them.
+    if created or (update_fields is not None and not set(update_fields) & set(ProfileSummarySerializer.Meta.fields)):
+        return
+    profile_id = instance.id
+
+    def forget_rides():
+        forget(Rides.objects.filter(Q(rider_id=profile_id) | Q(driver_id=profile_id)).values_list('id', flat=True))
+
+    transaction.on_commit(forget_rides)
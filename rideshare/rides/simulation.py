@@ -0,0 +1,159 @@
+"""Scheduler-driven ride movement simulator.
+
+Each simulated ride has a ``RideSimulation`` row holding its route, speed and
+progress. Nothing sleeps: the ``advance_ride_simulations`` task runs on a
+beat schedule, picks every simulation whose next step is due, moves all of
+them along their routes and writes the new positions with one
+``bulk_update`` per batch.
+"""
+from datetime import timedelta
+from math import cos, hypot, radians, sqrt
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from utils.db import bulk_update_rows
+from utils.spatial import KM_PER_DEGREE
+from .events import publish_rides
+from .models import RideSimulation, Rides
+from .tasks import release_simulation_leases
+from .trail import append_trails, trail_enabled
+
+METRES_PER_DEGREE = KM_PER_DEGREE * 1000
+
+
+def _leg_lengths(route):
+    lengths = []
+    for (lat1, lon1), (lat2, lon2) in zip(route, route[1:]):
+        scale = cos(radians((lat1 + lat2) / 2))
+        lengths.append(hypot(lat2 - lat1, (lon2 - lon1) * scale) * METRES_PER_DEGREE)
+    return lengths
+
+
+def position_along(route, distance_m):
+    """Returns the ``(lat, lon)`` reached after ``distance_m`` metres along a
+    route and whether it is the end of the route.
+    """
+    for (lat1, lon1), (lat2, lon2), length in zip(route, route[1:], _leg_lengths(route)):
+        if distance_m < length:
+            fraction = distance_m / length
+            return (lat1 + (lat2 - lat1) * fraction, lon1 + (lon2 - lon1) * fraction), False
+        distance_m -= length
+    return tuple(route[-1]), True
+
+
+def default_route(ride, length_m):
+    """Drives from the ride's position to its dropoff, or ``length_m`` metres
+    north-east when the dropoff has no coordinates.
+    """
+    lat, lon = ride.current_latitude, ride.current_longitude
+    if lat is None or lon is None:
+        lat, lon = ride.pickup_latitude, ride.pickup_longitude
+    if lat is None or lon is None:
+        return None
+    if ride.dropoff_latitude is not None and ride.dropoff_longitude is not None:
+        return [[lat, lon], [ride.dropoff_latitude, ride.dropoff_longitude]]
+    step = length_m / sqrt(2) / METRES_PER_DEGREE
+    return [[lat, lon], [lat + step, lon + step / cos(radians(lat))]]
+
+
+def start_simulation(ride, route=None, speed_mps=None, steps=None, step_seconds=None):
+    """Starts (or restarts) moving a ride along a route.
+
+    Arguments left as None come from the ``SIMULATION_*`` settings. The first
+    step happens ``step_seconds`` after the call.
+
+    Args:
+        ride (Rides): The ride to move.
+        route (list, optional): ``[lat, lon]`` waypoints. Defaults to
+            ``default_route``.
+        speed_mps (float, optional): Speed in metres per second.
+        steps (int, optional): Number of position updates before stopping.
+        step_seconds (float, optional): Seconds between updates.
+
+    Returns:
+        RideSimulation: The simulation, or None when the ride has no position
+        to start from.
+    """
+    speed_mps = speed_mps or getattr(settings, 'SIMULATION_SPEED_MPS', 3.0)
+    steps = steps or getattr(settings, 'SIMULATION_STEPS', 5)
+    step_seconds = step_seconds or getattr(settings, 'SIMULATION_STEP_SECONDS', 5.0)
+    route = route or default_route(ride, speed_mps * step_seconds * steps)
+    if not route:
+        return None
+    if len(route) == 1:
+        route = route * 2
+
+    simulation, _ = RideSimulation.objects.update_or_create(
+        ride=ride,
+        defaults={
+            'route': [list(point) for point in route],
+            'speed_mps': speed_mps,
+            'step_seconds': step_seconds,
+            'steps_total': steps,
+            'steps_done': 0,
+            'distance_m': 0,
+            'next_step_at': timezone.now() + timedelta(seconds=step_seconds),
+            'finished_at': None,
+        },
+    )
+    return simulation
+
+
+def advance_due_simulations(now=None, batch_size=None):
+    """Moves one batch of due simulations a step forward.
+
+    Rows being advanced by a concurrent tick are skipped rather than waited
+    for. Finished simulations leave the ride at its last position.
+
+    Returns:
+        int: The number of simulations advanced.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, 'SIMULATION_BATCH_SIZE', 2000)
+
+    with transaction.atomic():
+        simulations = list(
+            RideSimulation.objects.select_for_update(skip_locked=True)
+            .filter(finished_at__isnull=True, next_step_at__lte=now)
+            .order_by('next_step_at')[:batch_size]
+        )
+        if not simulations:
+            return 0
+
+        rides = []
+        trails = {}
+        finished = []
+        for simulation in simulations:
+            simulation.steps_done += 1
+            simulation.distance_m += simulation.speed_mps * simulation.step_seconds
+            (lat, lon), arrived = position_along(simulation.route, simulation.distance_m)
+            simulation.updated_at = now
+            if arrived or simulation.steps_done >= simulation.steps_total:
+                simulation.finished_at = now
+                finished.append(simulation.ride_id)
+            else:
+                simulation.next_step_at = now + timedelta(seconds=simulation.step_seconds)
+            rides.append(Rides(id=simulation.ride_id, current_latitude=lat, current_longitude=lon, updated_at=now))
+            trails[simulation.ride_id] = [(lat, lon, now)]
+
+        bulk_update_rows(rides, ['current_latitude', 'current_longitude', 'updated_at'])
+        publish_rides(rides, ['current_latitude', 'current_longitude', 'updated_at'])
+        bulk_update_rows(simulations, ['steps_done', 'distance_m', 'next_step_at', 'finished_at', 'updated_at'])
+        if trail_enabled():
+            append_trails(trails)
+    if finished:
+        release_simulation_leases(finished)
+    return len(simulations)
+
+
+def advance_simulations(now=None, batch_size=None):
+    """Advances every simulation that is due, one batch at a time."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        advanced = advance_due_simulations(now, batch_size)
+        total += advanced
+        if not advanced:
+            return total
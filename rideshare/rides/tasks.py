@@ -1,21 +1,204 @@
 # tasks.py
 from celery import shared_task
-import time
-from .models import Rides
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from utils.metrics import SharedCounters, rate
+from .events import publish_ride_events
+from .models import RideSimulation, Rides
+
+
+class DispatchStats:
+    """Counts simulation dispatches and how many were dropped as duplicates.
+
+    ``stats`` covers this process. The counts are also published to the
+    shared cache (see ``utils.metrics.SharedCounters``), where the
+    ``show_stats`` command sums them over every worker.
+    """
+
+    def __init__(self):
+        self.counters = SharedCounters("simulation-dispatch", ("dispatched", "deduplicated"))
+
+    def record(self, dispatched):
+        self.counters.incr("dispatched" if dispatched else "deduplicated")
+
+    @staticmethod
+    def summarize(counts):
+        return {**counts, "dedup_rate": rate(counts["deduplicated"], counts["dispatched"])}
+
+    def stats(self):
+        return self.summarize(dict(self.counters.local))
+
+    def shared_stats(self):
+        return self.summarize(self.counters.totals())
+
+
+simulation_dispatch_stats = DispatchStats()
+
+
+def _simulation_lease_key(ride_id):
+    return f"ride-simulation-lease:{ride_id}"
+
+
+def release_simulation_leases(ride_ids):
+    try:
+        cache.delete_many([_simulation_lease_key(ride_id) for ride_id in ride_ids])
+    except Exception:
+        pass
+
+
+def dispatch_ride_simulation(ride_id):
+    """Queues ``simulate_ride_movement`` unless the ride already holds a lease.
+
+    The lease is taken with an atomic ``cache.add`` before anything reaches
+    the broker, so repeated pings for a moving ride cost one cache round trip.
+    It is released when the simulation finishes and otherwise expires after
+    the simulation's expected run time plus ``SIMULATION_LEASE_MARGIN_SECONDS``.
+
+    Returns:
+        bool: Whether a task was queued.
+    """
+    timeout = (
+        getattr(settings, 'SIMULATION_STEPS', 5) * getattr(settings, 'SIMULATION_STEP_SECONDS', 5.0)
+        + getattr(settings, 'SIMULATION_LEASE_MARGIN_SECONDS', 30)
+    )
+    try:
+        leased = cache.add(_simulation_lease_key(ride_id), True, timeout=timeout)
+    except Exception:
+        leased = True
+    simulation_dispatch_stats.record(leased)
+    if leased:
+        simulate_ride_movement.delay(ride_id)
+    return leased
+
 
 @shared_task
-def simulate_ride_movement(ride_id):
+def simulate_ride_movement(ride_id, route=None, speed_mps=None, steps=None, step_seconds=None):
+    """Schedules simulated movement of a ride and returns immediately.
+
+    The steps themselves are taken by ``advance_ride_simulations``; see
+    ``rides.simulation.start_simulation`` for the arguments. A ride that is
+    already being simulated is left alone, so redelivered or duplicate tasks
+    do not restart it.
+    """
+    from .simulation import start_simulation
+
+    active = RideSimulation.objects.filter(ride_id=ride_id, finished_at__isnull=True).values_list('id', flat=True).first()
+    if active is not None:
+        return active
+
     ride = Rides.objects.get(id=ride_id)
-    steps = 5  # simulate 5 updates
-    lat, lon = ride.current_latitude, ride.current_longitude
+    simulation = start_simulation(ride, route, speed_mps, steps, step_seconds)
+    if simulation is None:
+        release_simulation_leases([ride_id])
+        return None
+    return simulation.id
+
+
+@shared_task
+def advance_ride_simulations():
+    from .simulation import advance_simulations
+
+    return advance_simulations()
 
-    for _ in range(steps):
-        # Simulate a slight move
-        lat += 0.0001
-        lon += 0.0001
-        ride.current_latitude = lat
-        ride.current_longitude = lon
 
-        ride.save()
+@shared_task
+def assign_requested_rides():
+    from .matching import match_requested_rides
+
+    return len(match_requested_rides())
+
+
+def _address_pending_key(ride_id):
+    return f"ride-address-pending:{ride_id}"
+
+
+def schedule_address_refresh(ride_id):
+    """Queues a reverse geocode of the ride's latest position.
+
+    Bursts of pings for the same ride are coalesced: while a refresh is
+    pending no new task is queued, and the task geocodes whatever position
+    the ride holds when it runs.
+    """
+    delay = getattr(settings, 'ADDRESS_REFRESH_DELAY_SECONDS', 2)
+    try:
+        queued = cache.add(_address_pending_key(ride_id), True, timeout=delay + 60)
+    except Exception:
+        queued = True
+    if queued:
+        transaction.on_commit(
+            lambda: refresh_ride_address.apply_async((ride_id,), countdown=delay)
+        )
+
+
+@shared_task
+def refresh_ride_address(ride_id):
+    from utils.helpers import reverse_geocode
+
+    # Clear the flag before reading the position so that pings arriving
+    # while we geocode queue another refresh.
+    cache.delete(_address_pending_key(ride_id))
+    position = Rides.objects.filter(id=ride_id).values_list(
+        'current_latitude', 'current_longitude'
+    ).first()
+    if position is None or None in position:
+        return None
+
+    address = reverse_geocode(*position)
+    if address is not None:
+        now = timezone.now()
+        Rides.objects.filter(id=ride_id).update(
+            current_location_address=address,
+            updated_at=now
+        )
+        publish_ride_events([(ride_id, {'current_location_address': address, 'updated_at': now})])
+    return address
+
+
+def _simplify_pending_key(ride_id):
+    return f"ride-trail-simplify-pending:{ride_id}"
+
+
+def schedule_trail_simplification(ride_id):
+    """Queues simplification of a finished ride's trail once the current
+    transaction commits. Repeated calls while a task is pending are dropped.
+    """
+    try:
+        queued = cache.add(_simplify_pending_key(ride_id), True, timeout=60 * 10)
+    except Exception:
+        queued = True
+    if queued:
+        transaction.on_commit(lambda: simplify_ride_trail.delay(ride_id))
+
+
+@shared_task
+def simplify_ride_trail(ride_id):
+    from .trail import simplify_trail
+
+    cache.delete(_simplify_pending_key(ride_id))
+    return simplify_trail(ride_id)
+
+
+def _compact_pending_key(ride_id):
+    return f"ride-trail-compact-pending:{ride_id}"
+
+
+def schedule_trail_compaction(ride_id):
+    """Queues compaction of a ride's trail once the current transaction
+    commits. Repeated calls while a task is pending are dropped.
+    """
+    try:
+        queued = cache.add(_compact_pending_key(ride_id), True, timeout=60 * 10)
+    except Exception:
+        queued = True
+    if queued:
+        transaction.on_commit(lambda: compact_ride_trail.delay(ride_id))
+
+
+@shared_task
+def compact_ride_trail(ride_id):
+    from .trail import compact_trail
 
-        time.sleep(5)  # Simulate time between location updates
+    cache.delete(_compact_pending_key(ride_id))
+    return compact_trail(ride_id)
@@ -4,8 +4,53 @@ from rides.models import Rides, Profile
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.urls import reverse
+from django.core.cache import cache
+from django.utils import timezone
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import IntegrityError, connection
+from django.core.management import call_command
+from io import StringIO
+import os
+import tempfile
+from utils.geocoders import OfflineGeocoder, get_geocoder
+from utils.http import CircuitBreaker, CircuitOpenError, ConcurrencyLimitError, OutboundClient
+import requests
+import httpx
+import threading
+import time
+import asyncio
 import json
-from unittest.mock import patch
+import queue
+from unittest.mock import MagicMock, patch
+from itertools import permutations
+import numpy as np
+from rides.matching import greedy_assignment, hungarian, match_requested_rides
+from rides.tasks import refresh_ride_address
+from rides.location_buffer import LocationBuffer
+from rides.models import RideSimulation, RideTrailChunk
+from rides.events import CLOSED, LocalBroker, RedisBroker
+from rest_framework_simplejwt.tokens import AccessToken
+from django.test import AsyncClient
+from asgiref.sync import sync_to_async
+from rides.simulation import advance_simulations, start_simulation
+from rides.tasks import DispatchStats, dispatch_ride_simulation, simulate_ride_movement
+from utils.db import bulk_update_rows
+from rides.trail import append_trail_points, append_trails, compact_trail, iter_trail, simplify_trail
+from utils.simplify import douglas_peucker, thin
+from utils import polyline
+from utils import renderers
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from uuid import UUID
+from utils.helpers import (
+    success_response, bulk_update_locations,
+    find_nearest_driver, find_nearest_drivers, geocode_cache, geocode_location,
+    reverse_geocode, reverse_geocode_cache, update_location,
+    haversine, haversine_many, haversine_matrix,
+)
+from utils.cache import TTLCache, TwoLevelCache
+from utils.spatial import GridIndex, bounding_box, driver_index
 
 
 class RidesModelTest(TestCase):
@@ -60,6 +105,7 @@ class RidesViewSetTest(APITestCase):
         
         self.client = APIClient()
         self.url = reverse('create-ride-request')
+        cache.clear()
 
     def test_rider_can_create_ride(self):
         self.client.force_authenticate(user=self.rider_user)
@@ -145,6 +191,131 @@ class RidesViewSetTest(APITestCase):
         self.assertEqual(response.data['status'], ride.status)
 
 
+class RidesListPaginationTest(APITestCase):
+
+    def setUp(self):
+        self.rider_user = User.objects.create_user(username="rider", password="Passw0rd!")
+        self.rider_profile = Profile.objects.create(user=self.rider_user, user_type="Rider", full_name="Rider")
+        self.other_user = User.objects.create_user(username="other", password="Passw0rd!")
+        self.other_profile = Profile.objects.create(user=self.other_user, user_type="Rider", full_name="Other")
+        self.url = reverse('list-rides')
+        self.client = APIClient()
+        self.client.force_authenticate(self.rider_user)
+        cache.clear()
+
+        start = timezone.now() - timedelta(days=10)
+        self.rides = []
+        for i in range(7):
+            ride = Rides.objects.create(rider=self.rider_profile, status="Requested" if i % 2 else "Cancelled")
+            # two rides share a timestamp so the cursor has to break ties on id
+            Rides.objects.filter(pk=ride.pk).update(created_at=start + timedelta(days=min(i, 5)))
+            self.rides.append(ride)
+        Rides.objects.create(rider=self.other_profile, status="Requested")
+
+    def test_pages_through_own_rides_newest_first(self):
+        seen = []
+        url = f"{self.url}?page_size=3"
+        pages = 0
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(resp.json()), 3)
+            seen.extend(ride['id'] for ride in resp.json())
+            pages += 1
+            url = resp.headers.get('Link', '')[1:].split('>')[0] or None
+            if url:
+                self.assertIn(resp.headers['X-Next-Cursor'], url)
+
+        self.assertEqual(pages, 3)
+        expected = sorted(self.rides, key=lambda ride: (Rides.objects.get(pk=ride.pk).created_at, ride.pk), reverse=True)
+        self.assertEqual(seen, [ride.pk for ride in expected])
+
+    def test_filters(self):
+        resp = self.client.get(self.url, {'status': 'Requested'})
+        self.assertEqual({ride['status'] for ride in resp.json()}, {"Requested"})
+        self.assertEqual(len(resp.json()), 3)
+
+        after = (timezone.now() - timedelta(days=6)).date().isoformat()
+        resp = self.client.get(self.url, {'created_after': after, 'status': 'Requested,Cancelled'})
+        self.assertEqual(len(resp.json()), 3)
+
+        resp = self.client.get(self.url, {'rider': self.other_profile.pk})
+        self.assertEqual(resp.json(), [])
+
+    def test_user_without_profile_has_no_rides(self):
+        self.client.force_authenticate(User.objects.create_user(username="noprofile", password="Passw0rd!"))
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json(), [])
+
+    def test_staff_can_list_all_rides(self):
+        self.rider_user.is_staff = True
+        self.rider_user.save()
+        self.assertEqual(len(self.client.get(self.url, {'scope': 'all'}).json()), 8)
+
+    def test_invalid_parameters(self):
+        for value in ('yesterday', '2024-13-01', '2024-02-30', '2024-01-01T25:00:00'):
+            resp = self.client.get(self.url, {'created_after': value})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('created_after', resp.json())
+        self.assertEqual(self.client.get(self.url, {'driver': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'bogus'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        Rides.objects.filter(rider=self.rider_profile).update(driver=self.other_profile)
+        for page_size in (1, 7):
+            self.client.force_authenticate(User.objects.get(pk=self.rider_user.pk))
+            with self.assertNumQueries(2):  # the profile, then the page with riders and drivers joined
+                resp = self.client.get(self.url, {'page_size': page_size})
+            self.assertEqual(len(resp.json()), page_size)
+
+    def test_rides_embed_rider_and_driver_summaries(self):
+        ride = self.rides[-1]
+        ride.driver = self.other_profile
+        ride.save()
+        data = self.client.get(self.url, {'page_size': 1}).json()[0]
+        self.assertEqual(data['rider'], self.rider_profile.pk)
+        self.assertEqual(data['rider_summary'], {
+            'id': self.rider_profile.pk, 'full_name': "Rider", 'phone_number': None, 'user_type': "Rider",
+        })
+        self.assertEqual(data['driver_summary']['full_name'], "Other")
+
+        self.assertIsNone(self.client.get(self.url, {'page_size': 7}).json()[-1]['driver_summary'])
+
+        with self.assertNumQueries(1):
+            detail = self.client.get(reverse('ride-details', kwargs={'pk': ride.pk})).json()
+        self.assertEqual(detail['driver_summary']['id'], self.other_profile.pk)
+
+    def test_sparse_fieldsets(self):
+        ride = self.rides[-1]
+        url = reverse('ride-details', kwargs={'pk': ride.pk})
+        with CaptureQueriesContext(connection) as queries:
+            detail = self.client.get(url, {'fields': 'status,current_latitude,current_longitude'}).json()
+        self.assertEqual(detail, {'status': "Cancelled", 'current_latitude': None, 'current_longitude': None})
+        sql = queries[-1]['sql']
+        self.assertNotIn('current_location_address', sql)
+        self.assertNotIn('pickup_location', sql)
+        self.assertNotIn('JOIN', sql)
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(self.url, {'fields': 'id,rider_summary', 'page_size': 4})
+        self.assertEqual(set(resp.json()[0]), {'id', 'rider_summary'})
+        self.assertEqual(resp.json()[0]['rider_summary']['full_name'], "Rider")
+        sql = queries[-1]['sql']
+        self.assertIn('"authentication_profile"."full_name"', sql)
+        self.assertNotIn('"authentication_profile"."latitude"', sql)
+        self.assertNotIn('status', sql.split(' FROM ')[0])
+
+        # the cursor still works on a projected page
+        next_page = self.client.get(self.url, {'fields': 'id', 'page_size': 4, 'cursor': resp.headers['X-Next-Cursor']})
+        self.assertEqual(len(resp.json()) + len(next_page.json()), 7)
+
+    def test_unknown_sparse_field(self):
+        resp = self.client.get(self.url, {'fields': 'status,fare'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fare', str(resp.json()))
+
+
 class UpdateRidesStatusViewSetTest(APITestCase):
 
     def setUp(self):
@@ -322,4 +493,1440 @@ class AcceptRideViewSetTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         body = json.loads(response.content.decode())
-        self.assertIn("Only drivers may accept rides.", body.get('message', ''))
\ No newline at end of file
+        self.assertIn("Only drivers may accept rides.", body.get('message', ''))
+
+class DriverGridIndexTest(TestCase):
+    def setUp(self):
+        self.index = GridIndex(cell_size_km=1.0)
+
+    def test_query_returns_points_in_nearby_cells_only(self):
+        self.index.update('near', 12.9716, 77.5946)
+        self.index.update('far', 13.9716, 77.5946)
+
+        keys = [key for key, _, _ in self.index.query(12.9716, 77.5946, 5)]
+
+        self.assertIn('near', keys)
+        self.assertNotIn('far', keys)
+
+    def test_update_moves_point_between_cells(self):
+        self.index.update('driver', 12.9716, 77.5946)
+        self.index.update('driver', 13.9716, 77.5946)
+
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.index.query(12.9716, 77.5946, 5), [])
+        self.assertEqual(len(self.index.query(13.9716, 77.5946, 5)), 1)
+
+    def test_rings_cover_every_point_within_radius(self):
+        origin = (60.0, 10.0)
+        for n in range(50):
+            self.index.update(n, origin[0] + 0.001 * n, origin[1] + 0.002 * n)
+
+        found = set()
+        for covered_km, points in self.index.rings(*origin, 10):
+            found.update(key for key, _, _ in points)
+            for n in range(50):
+                dist = haversine(*origin, origin[0] + 0.001 * n, origin[1] + 0.002 * n)
+                if dist <= covered_km:
+                    self.assertIn(n, found)
+
+    def test_bounding_box_encloses_radius(self):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(60.0, 10.0, 5)
+
+        for lat, lon in [(60.0449, 10.0), (59.9551, 10.0), (60.0, 10.0899), (60.0, 9.9101)]:
+            self.assertLessEqual(haversine(60.0, 10.0, lat, lon), 5)
+            self.assertTrue(min_lat <= lat <= max_lat)
+            self.assertTrue(min_lon <= lon <= max_lon)
+
+    def test_bounding_box_spans_all_longitudes_across_antimeridian(self):
+        _, _, min_lon, max_lon = bounding_box(0.0, 179.99, 5)
+
+        self.assertEqual((min_lon, max_lon), (-180.0, 180.0))
+
+
+class BatchHaversineTest(TestCase):
+    def setUp(self):
+        self.origin = (12.9716, 77.5946)
+        self.lats = [12.9716, 13.0827, 28.7041, -33.8688, 51.5074]
+        self.lons = [77.5946, 80.2707, 77.1025, 151.2093, -0.1278]
+
+    def test_many_matches_scalar_haversine(self):
+        distances = haversine_many(*self.origin, self.lats, self.lons)
+
+        for dist, lat, lon in zip(distances, self.lats, self.lons):
+            self.assertAlmostEqual(dist, haversine(*self.origin, lat, lon), places=6)
+
+    def test_matrix_matches_scalar_haversine(self):
+        matrix = haversine_matrix(self.lats[:2], self.lons[:2], self.lats, self.lons)
+
+        self.assertEqual(matrix.shape, (2, 5))
+        for i in range(2):
+            for j in range(5):
+                expected = haversine(self.lats[i], self.lons[i], self.lats[j], self.lons[j])
+                self.assertAlmostEqual(matrix[i, j], expected, places=6)
+
+
+class FindNearestDriverTest(TestCase):
+    def setUp(self):
+        driver_index.reset()
+        self.near = Profile.objects.create(full_name="Near", user_type="Driver", latitude=12.9720, longitude=77.5950)
+        self.far = Profile.objects.create(full_name="Far", user_type="Driver", latitude=12.9900, longitude=77.6100)
+        self.rider = Profile.objects.create(full_name="Rider", user_type="Rider", latitude=12.9716, longitude=77.5946)
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_returns_closest_driver(self, mock_geocode):
+        self.assertEqual(find_nearest_driver("Somewhere"), self.near)
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_index_follows_driver_updates(self, mock_geocode):
+        find_nearest_driver("Somewhere")
+        self.near.latitude = 14.0
+        self.near.save()
+
+        self.assertEqual(find_nearest_driver("Somewhere"), self.far)
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_returns_none_outside_radius(self, mock_geocode):
+        self.assertIsNone(find_nearest_driver("Somewhere", radius_km=0.01))
+
+
+class FindNearestDriversTest(TestCase):
+    def setUp(self):
+        driver_index.reset()
+        self.drivers = [
+            Profile.objects.create(full_name=f"D{n}", user_type="Driver", latitude=12.9716 + 0.01 * n, longitude=77.5946)
+            for n in range(1, 6)
+        ]
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_returns_k_drivers_ranked_by_distance(self, mock_geocode):
+        nearest = find_nearest_drivers("Somewhere", k=3)
+
+        self.assertEqual([driver for _, driver in nearest], self.drivers[:3])
+        distances = [dist for dist, _ in nearest]
+        self.assertEqual(distances, sorted(distances))
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_expands_radius_until_k_found(self, mock_geocode):
+        # Drivers sit roughly 1.1 km apart, so only one is within 1.5 km.
+        nearest = find_nearest_drivers("Somewhere", k=3, radius_km=1.5, step_km=1, max_radius_km=10)
+
+        self.assertEqual(len(nearest), 3)
+        self.assertLessEqual(nearest[-1][0], 3.5)
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_stops_at_max_radius(self, mock_geocode):
+        nearest = find_nearest_drivers("Somewhere", k=5, radius_km=1, max_radius_km=2.5)
+
+        self.assertEqual(len(nearest), 2)
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_rejects_non_finite_radius(self, mock_geocode):
+        for radius in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                find_nearest_drivers("Somewhere", k=5, radius_km=radius)
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_ignores_invalid_step(self, mock_geocode):
+        for step in (float('nan'), -1, 0):
+            nearest = find_nearest_drivers("Somewhere", k=5, radius_km=1, step_km=step, max_radius_km=2.5)
+            self.assertEqual(len(nearest), 2)
+
+
+class NearbyDriversViewTest(APITestCase):
+    def setUp(self):
+        driver_index.reset()
+        self.rider_user = User.objects.create_user("rider", password="pass")
+        self.rider_profile = Profile.objects.create(user=self.rider_user, user_type="Rider", full_name="Rider")
+        self.driver = Profile.objects.create(full_name="Driver", user_type="Driver", latitude=12.9720, longitude=77.5950)
+        self.ride = Rides.objects.create(rider=self.rider_profile, pickup_location="Somewhere", status="Requested")
+        self.url = reverse('nearby-drivers')
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_lists_nearby_drivers_with_distance(self, mock_geocode):
+        self.client.force_authenticate(self.rider_user)
+        response = self.client.get(self.url, {"ride_id": self.ride.id, "k": 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        drivers = json.loads(response.content)["results"]["data"]
+        self.assertEqual(len(drivers), 1)
+        self.assertEqual(drivers[0]["id"], self.driver.id)
+        self.assertLess(drivers[0]["distance_km"], 0.1)
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_is_limited_to_the_rider(self, mock_geocode):
+        other = User.objects.create_user("other", password="pass")
+        Profile.objects.create(user=other, user_type="Rider", full_name="Other")
+        self.client.force_authenticate(other)
+        response = self.client.get(self.url, {"ride_id": self.ride.id})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        other.is_staff = True
+        other.save()
+        response = self.client.get(self.url, {"ride_id": self.ride.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rejects_invalid_k(self):
+        self.client.force_authenticate(self.rider_user)
+        response = self.client.get(self.url, {"ride_id": self.ride.id, "k": "many"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_non_finite_radius(self):
+        self.client.force_authenticate(self.rider_user)
+        for radius in ("nan", "inf", "-inf"):
+            response = self.client.get(self.url, {"ride_id": self.ride.id, "radius_km": radius})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AssignmentSolverTest(TestCase):
+    def test_hungarian_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        for rows, cols in [(4, 4), (3, 5), (5, 3)]:
+            cost = rng.uniform(0, 10, size=(rows, cols))
+            pairs = hungarian(cost)
+            best = min(
+                sum(cost[r, c] for r, c in enumerate(perm)) if rows <= cols
+                else sum(cost[r, c] for c, r in enumerate(perm))
+                for perm in permutations(range(max(rows, cols)), min(rows, cols))
+            )
+            self.assertEqual(len(pairs), min(rows, cols))
+            self.assertAlmostEqual(sum(cost[r, c] for r, c in pairs), best)
+
+    def test_greedy_takes_cheapest_pairs_first(self):
+        cost = np.array([[1.0, 2.0], [1.5, 10.0]])
+
+        self.assertEqual(greedy_assignment(cost), [(0, 0), (1, 1)])
+        self.assertEqual(hungarian(cost), [(0, 1), (1, 0)])
+
+
+class MatchRequestedRidesTest(TestCase):
+    def setUp(self):
+        driver_index.reset()
+        self.rider = Profile.objects.create(full_name="Rider", user_type="Rider")
+        self.driver_a = Profile.objects.create(full_name="A", user_type="Driver", latitude=12.9716, longitude=77.5946)
+        self.driver_b = Profile.objects.create(full_name="B", user_type="Driver", latitude=12.9900, longitude=77.5946)
+        self.ride_a = Rides.objects.create(rider=self.rider, pickup_location="A", status="Requested")
+        self.ride_b = Rides.objects.create(rider=self.rider, pickup_location="B", status="Requested")
+
+    @patch('utils.helpers.geocode_location')
+    def test_assigns_each_ride_a_distinct_driver(self, mock_geocode):
+        # Both pickups are closest to driver A; a greedy per-ride match would
+        # hand A to whichever ride came first.
+        mock_geocode.side_effect = lambda address: {
+            "A": (12.9800, 77.5946),
+            "B": (12.9720, 77.5946),
+        }[address]
+
+        assigned = match_requested_rides(radius_km=5)
+
+        self.assertEqual(len(assigned), 2)
+        self.ride_a.refresh_from_db()
+        self.ride_b.refresh_from_db()
+        self.assertEqual(self.ride_a.driver, self.driver_b)
+        self.assertEqual(self.ride_b.driver, self.driver_a)
+
+    @patch('utils.helpers.geocode_location', return_value=(12.9716, 77.5946))
+    def test_skips_busy_drivers(self, mock_geocode):
+        Rides.objects.create(rider=self.rider, driver=self.driver_a, status="Started")
+
+        assigned = match_requested_rides(radius_km=5)
+
+        self.assertEqual([ride.driver for ride in assigned], [self.driver_b])
+
+
+class TTLCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = TTLCache(maxsize=2, ttl=60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        lru = TTLCache(maxsize=2, ttl=60)
+        lru.set("a", 1, ttl=0)
+
+        self.assertIsNone(lru.get("a"))
+        self.assertEqual(lru.stats()["misses"], 1)
+
+
+@override_settings(OUTBOUND_HTTP={"retries": 0})
+class GeocodeCacheTest(TestCase):
+    def setUp(self):
+        geocode_cache.local.clear()
+        cache.clear()
+
+    def _response(self, payload):
+        response = MagicMock(status_code=200)
+        response.json.return_value = payload
+        return response
+
+    @patch('utils.http.requests.Session.get')
+    def test_repeated_address_is_served_from_cache(self, mock_get):
+        mock_get.return_value = self._response([{"lat": "12.97", "lon": "77.59"}])
+
+        self.assertEqual(geocode_location("MG Road, Bangalore"), (12.97, 77.59))
+        self.assertEqual(geocode_location("  mg road,   BANGALORE "), (12.97, 77.59))
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('utils.http.requests.Session.get')
+    def test_shared_level_survives_local_eviction(self, mock_get):
+        mock_get.return_value = self._response([{"lat": "12.97", "lon": "77.59"}])
+        geocode_location("MG Road")
+        geocode_cache.local.clear()
+
+        self.assertEqual(geocode_location("MG Road"), (12.97, 77.59))
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertGreaterEqual(geocode_cache.stats()["shared_hits"], 1)
+
+    def test_hit_rate_is_published_for_every_process(self):
+        first, second = TwoLevelCache("test-geo"), TwoLevelCache("test-geo")
+        first.set("a", 1)
+        first.get("a")
+        second.get("a")
+        second.get("b")
+        first.counters.publish()
+        second.counters.publish()
+
+        stats = first.shared_stats()
+        self.assertEqual((stats["local_hits"], stats["shared_hits"], stats["misses"]), (1, 1, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+        out = StringIO()
+        call_command('show_stats', stdout=out)
+        self.assertIn("geocode cache:", out.getvalue())
+
+    @patch('utils.http.requests.Session.get')
+    def test_negative_results_are_cached(self, mock_get):
+        mock_get.return_value = self._response([])
+
+        self.assertEqual(geocode_location("Nowhere"), (None, None))
+        self.assertEqual(geocode_location("Nowhere"), (None, None))
+        self.assertEqual(mock_get.call_count, 1)
+
+
+@override_settings(OUTBOUND_HTTP={"retries": 0})
+class ReverseGeocodeCacheTest(TestCase):
+    def setUp(self):
+        reverse_geocode_cache.local.clear()
+        cache.clear()
+
+    @patch('utils.http.requests.Session.get')
+    def test_pings_in_same_cell_reuse_address(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=200)
+        mock_get.return_value.json.return_value = {"display_name": "MG Road"}
+        hits_before = reverse_geocode_cache.stats()["hits"]
+
+        self.assertEqual(reverse_geocode(12.97161, 77.59461), "MG Road")
+        self.assertEqual(reverse_geocode(12.97158, 77.59459), "MG Road")
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(reverse_geocode_cache.stats()["hits"] - hits_before, 1)
+
+    @patch('utils.http.requests.Session.get')
+    def test_pings_in_other_cells_are_resolved(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=200)
+        mock_get.return_value.json.return_value = {"display_name": "MG Road"}
+
+        reverse_geocode(12.9716, 77.5946)
+        reverse_geocode(12.9736, 77.5946)
+
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('utils.http.requests.Session.get')
+    def test_failed_lookups_are_not_cached(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=503)
+
+        self.assertIsNone(reverse_geocode(12.9716, 77.5946))
+        self.assertIsNone(reverse_geocode(12.9716, 77.5946))
+        self.assertEqual(mock_get.call_count, 2)
+
+
+class AddressRefreshTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ride = Rides.objects.create(pickup_location="A", status="Accepted")
+
+    @patch('utils.helpers.reverse_geocode')
+    def test_update_location_does_not_geocode_inline(self, mock_reverse):
+        update_location(self.ride.id, 12.9716, 77.5946)
+
+        mock_reverse.assert_not_called()
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.current_latitude, 12.9716)
+
+    @patch('rides.tasks.refresh_ride_address.apply_async')
+    def test_burst_of_pings_queues_one_refresh(self, mock_apply):
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(5):
+                update_location(self.ride.id, 12.9716 + n * 0.001, 77.5946)
+
+        self.assertEqual(mock_apply.call_count, 1)
+
+    @patch('utils.helpers.reverse_geocode', return_value="MG Road")
+    def test_refresh_geocodes_latest_position(self, mock_reverse):
+        Rides.objects.filter(id=self.ride.id).update(current_latitude=12.98, current_longitude=77.6)
+
+        refresh_ride_address(self.ride.id)
+
+        mock_reverse.assert_called_once_with(12.98, 77.6)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.current_location_address, "MG Road")
+
+
+class OfflineGeocoderTest(TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".tsv")
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            f.write("# lat\tlon\tname\n")
+            f.write("12.9716\t77.5946\tMG Road, Bangalore\n")
+            f.write("12.9352\t77.6245\tKoramangala, Bangalore\n")
+        self.addCleanup(os.remove, self.path)
+        geocode_cache.local.clear()
+        reverse_geocode_cache.local.clear()
+        cache.clear()
+
+    def test_forward_and_reverse_lookups(self):
+        geocoder = OfflineGeocoder(path=self.path)
+        self.addCleanup(geocoder.close)
+
+        self.assertEqual(len(geocoder), 2)
+        self.assertEqual(geocoder.geocode("  koramangala, BANGALORE"), (12.9352, 77.6245))
+        self.assertIsNone(geocoder.geocode("Atlantis"))
+        self.assertEqual(geocoder.reverse(12.9718, 77.5949), "MG Road, Bangalore")
+        self.assertIsNone(geocoder.reverse(13.5, 77.5946))
+
+    def test_helpers_use_configured_backend(self):
+        config = {"BACKEND": "utils.geocoders.OfflineGeocoder", "OPTIONS": {"path": self.path}}
+        with override_settings(GEOCODER=config):
+            self.addCleanup(get_geocoder().close)
+            self.assertEqual(geocode_location("MG Road, Bangalore"), (12.9716, 77.5946))
+            self.assertEqual(reverse_geocode(12.9353, 77.6244), "Koramangala, Bangalore")
+
+
+class RideCoordinatesTest(APITestCase):
+    def setUp(self):
+        geocode_cache.local.clear()
+        cache.clear()
+        self.rider_user = User.objects.create_user(username="rideruser", password="Passw0rd!")
+        self.rider_profile = Profile.objects.create(user=self.rider_user, user_type="Rider", full_name="Rider")
+        self.url = reverse('create-ride-request')
+
+    @patch('utils.helpers.geocode_location')
+    def test_create_ride_stores_geocoded_coordinates(self, mock_geocode):
+        mock_geocode.side_effect = lambda address: {"A": (12.97, 77.59), "B": (12.93, 77.62)}[address]
+        self.client.force_authenticate(user=self.rider_user)
+
+        response = self.client.post(self.url, {"pickup_location": "A", "dropoff_location": "B"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ride = Rides.objects.get()
+        self.assertEqual((ride.pickup_latitude, ride.pickup_longitude), (12.97, 77.59))
+        self.assertEqual((ride.dropoff_latitude, ride.dropoff_longitude), (12.93, 77.62))
+
+    @patch('utils.helpers.geocode_location')
+    def test_client_supplied_coordinates_skip_geocoding(self, mock_geocode):
+        mock_geocode.return_value = (None, None)
+        self.client.force_authenticate(user=self.rider_user)
+        payload = {
+            "pickup_location": "A",
+            "pickup_latitude": 12.97,
+            "pickup_longitude": 77.59,
+        }
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_geocode.assert_not_called()
+        self.assertEqual(Rides.objects.get().pickup_latitude, 12.97)
+
+    def test_rejects_half_coordinate_pair(self):
+        self.client.force_authenticate(user=self.rider_user)
+
+        response = self.client.post(self.url, {"pickup_location": "A", "pickup_latitude": 12.97}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('utils.helpers.geocode_location')
+    def test_backfill_command_fills_missing_coordinates(self, mock_geocode):
+        mock_geocode.side_effect = lambda address: {"A": (12.97, 77.59), "B": (12.93, 77.62)}.get(address, (None, None))
+        ride = Rides.objects.create(rider=self.rider_profile, pickup_location="A", dropoff_location="B")
+        done = Rides.objects.create(rider=self.rider_profile, pickup_location="A", pickup_latitude=1.0, pickup_longitude=2.0)
+
+        call_command('backfill_ride_coordinates', '--delay', '0', '--batch-size', '1', stdout=StringIO())
+
+        ride.refresh_from_db()
+        done.refresh_from_db()
+        self.assertEqual((ride.pickup_latitude, ride.dropoff_longitude), (12.97, 77.62))
+        self.assertEqual(done.pickup_latitude, 1.0)
+
+
+class OutboundClientTest(TestCase):
+    def test_breaker_opens_after_threshold_and_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        # With a zero reset timeout the next call is the half-open trial.
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    @patch('utils.http.requests.Session.get')
+    def test_open_circuit_fails_fast(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=503)
+        client = OutboundClient(retries=0, failure_threshold=2, reset_timeout=60)
+
+        client.get("https://geo.example.com/search")
+        client.get("https://geo.example.com/search")
+
+        with self.assertRaises(CircuitOpenError):
+            client.get("https://geo.example.com/search")
+        self.assertEqual(mock_get.call_count, 2)
+        # Other hosts have their own breaker.
+        client.get("https://other.example.com/search")
+        self.assertEqual(mock_get.call_count, 3)
+
+    @patch('utils.http.httpx.AsyncClient.get')
+    def test_async_entry_point_runs_on_the_event_loop(self, mock_get):
+        threads = []
+
+        async def respond(url, **kwargs):
+            threads.append(threading.get_ident())
+            return httpx.Response(200, json=[])
+        mock_get.side_effect = respond
+        client = OutboundClient(timeout=3)
+
+        response = asyncio.run(client.aget("https://geo.example.com/search", params={"q": "x"}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(threads, [threading.get_ident()])
+        self.assertLessEqual(mock_get.call_args.kwargs["timeout"], 3)
+        self.assertEqual(mock_get.call_args.kwargs["params"], {"q": "x"})
+
+    @patch('utils.http.httpx.AsyncClient.get')
+    def test_async_deadline_cuts_slow_responses(self, mock_get):
+        async def trickle(url, **kwargs):
+            await asyncio.sleep(5)
+        mock_get.side_effect = trickle
+        client = OutboundClient(retries=0, failure_threshold=1)
+
+        started = time.monotonic()
+        with self.assertRaises(requests.Timeout):
+            asyncio.run(client.aget("https://geo.example.com/search", timeout=0.2))
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(client.breaker("https://geo.example.com/search").state, CircuitBreaker.OPEN)
+
+    @patch('utils.http.httpx.AsyncClient.get')
+    def test_async_retries_unavailable_responses(self, mock_get):
+        mock_get.side_effect = [httpx.Response(503), httpx.Response(200)]
+        client = OutboundClient(retries=2, backoff=0)
+
+        response = asyncio.run(client.aget("https://geo.example.com/search"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('utils.http.httpx', None)
+    @patch('utils.http.requests.Session.get')
+    def test_async_entry_point_without_httpx(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=200)
+
+        response = asyncio.run(OutboundClient().aget("https://geo.example.com/search"))
+
+        self.assertEqual(response.status_code, 200)
+
+    @patch('utils.http.requests.Session.get')
+    def test_aborted_trial_reopens_breaker(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=200)
+        client = OutboundClient(max_concurrency=1, retries=0, failure_threshold=1, reset_timeout=0)
+        breaker = client.breaker("https://geo.example.com/search")
+        breaker.record_failure()
+
+        # The half-open trial cannot get a slot...
+        client._slots.acquire()
+        with self.assertRaises(ConcurrencyLimitError):
+            client.get("https://geo.example.com/search", timeout=0.01)
+        client._slots.release()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        # ...so the next call gets to be the trial instead of being rejected.
+        self.assertEqual(client.get("https://geo.example.com/search").status_code, 200)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    @patch('utils.http.requests.Session.get')
+    def test_retries_stay_within_deadline(self, mock_get):
+        def slow_failure(*args, **kwargs):
+            time.sleep(0.2)
+            raise requests.ConnectionError("refused")
+        mock_get.side_effect = slow_failure
+        client = OutboundClient(retries=10, backoff=0.05, failure_threshold=100)
+
+        started = time.monotonic()
+        with self.assertRaises(requests.ConnectionError):
+            client.get("https://geo.example.com/search", timeout=0.5)
+
+        self.assertLess(time.monotonic() - started, 0.75)
+        self.assertLess(mock_get.call_count, 4)
+        for call in mock_get.call_args_list:
+            self.assertLessEqual(call.kwargs["timeout"], 0.5)
+
+    @patch('utils.http.requests.Session.get')
+    def test_retries_unavailable_responses(self, mock_get):
+        mock_get.side_effect = [MagicMock(status_code=503), MagicMock(status_code=200)]
+        client = OutboundClient(retries=2, backoff=0)
+
+        self.assertEqual(client.get("https://geo.example.com/search").status_code, 200)
+        self.assertEqual(mock_get.call_count, 2)
+
+
+class BulkLocationUpdateViewTest(APITestCase):
+    def setUp(self):
+        self.driver_user = User.objects.create_user(username="driveruser", password="Passw0rd!")
+        self.driver_profile = Profile.objects.create(user=self.driver_user, user_type="Driver", full_name="Driver")
+        self.rides = [
+            Rides.objects.create(driver=self.driver_profile, pickup_location="A", status="Started")
+            for _ in range(3)
+        ]
+        self.other_ride = Rides.objects.create(pickup_location="B", status="Started")
+        Rides.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.url = reverse('update-locations')
+
+    def at(self, minutes_ago):
+        return (timezone.now() - timedelta(minutes=minutes_ago)).isoformat()
+
+    def test_keeps_latest_point_per_ride_in_one_query(self):
+        self.client.force_authenticate(self.driver_user)
+        points = [
+            {"ride_id": self.rides[0].id, "latitude": 12.2, "longitude": 77.2, "timestamp": self.at(1)},
+            {"ride_id": self.rides[0].id, "latitude": 12.1, "longitude": 77.1, "timestamp": self.at(2)},
+            {"ride_id": self.rides[1].id, "latitude": 13.0, "longitude": 78.0},
+            {"ride_id": self.other_ride.id, "latitude": 14.0, "longitude": 79.0},
+        ]
+
+        response = self.client.post(self.url, {"points": points}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)["results"]["data"]
+        self.assertEqual(data["updated_ride_ids"], [self.rides[0].id, self.rides[1].id])
+        self.assertEqual(data["rejected_ride_ids"], [self.other_ride.id])
+        self.rides[0].refresh_from_db()
+        self.assertEqual((self.rides[0].current_latitude, self.rides[0].current_longitude), (12.2, 77.2))
+        self.other_ride.refresh_from_db()
+        self.assertIsNone(self.other_ride.current_latitude)
+
+    def test_delayed_batch_does_not_overwrite_newer_position(self):
+        self.client.force_authenticate(self.driver_user)
+        ride = self.rides[0]
+        self.client.post(self.url, {"points": [
+            {"ride_id": ride.id, "latitude": 12.5, "longitude": 77.5, "timestamp": self.at(1)},
+        ]}, format='json')
+
+        response = self.client.post(self.url, {"points": [
+            {"ride_id": ride.id, "latitude": 12.4, "longitude": 77.4, "timestamp": self.at(3)},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ride.refresh_from_db()
+        self.assertEqual((ride.current_latitude, ride.current_longitude), (12.5, 77.5))
+        # the delayed ping still belongs to the trail
+        self.assertEqual(sorted(lat for lat, _, _ in iter_trail(ride.id)), [12.4, 12.5])
+
+    @override_settings(LOCATION_BUFFER_ENABLED=True)
+    def test_delayed_batch_does_not_overwrite_buffered_position(self):
+        buffer = LocationBuffer(flush_interval=60)
+        self.addCleanup(buffer.flush)
+        ride = self.rides[0]
+        with patch('utils.helpers.location_buffer', buffer):
+            bulk_update_locations([{"ride_id": ride.id, "latitude": 12.5, "longitude": 77.5,
+                                    "timestamp": timezone.now() - timedelta(minutes=1)}])
+            bulk_update_locations([{"ride_id": ride.id, "latitude": 12.4, "longitude": 77.4,
+                                    "timestamp": timezone.now() - timedelta(minutes=3)}])
+            bulk_update_locations([{"ride_id": ride.id, "latitude": 12.3, "longitude": 77.3,
+                                    "timestamp": timezone.now() - timedelta(hours=2)}])
+
+        self.assertEqual(buffer.position(ride.id), (12.5, 77.5))
+        buffer.flush()
+        ride.refresh_from_db()
+        self.assertEqual(ride.current_latitude, 12.5)
+        self.assertEqual(len(list(iter_trail(ride.id))), 3)
+
+    def test_write_cost_does_not_grow_with_batch_size(self):
+        self.client.force_authenticate(self.driver_user)
+        points = [
+            {"ride_id": ride.id, "latitude": 12.0 + n * 0.001, "longitude": 77.0}
+            for n in range(20) for ride in self.rides
+        ]
+
+        # One ride fetch, then inside a savepoint one bulk UPDATE, a lock on
+        # the rides, one read and one insert of trail chunks.
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, {"points": points}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rejects_invalid_points(self):
+        self.client.force_authenticate(self.driver_user)
+        points = [{"ride_id": self.rides[0].id, "latitude": 123.0, "longitude": 77.0}]
+
+        response = self.client.post(self.url, {"points": points}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(LOCATION_BUFFER_ENABLED=True)
+class LocationBufferTest(APITestCase):
+    def setUp(self):
+        self.buffer = LocationBuffer(flush_interval=60, max_pending=3)
+        self.addCleanup(self.buffer.flush)
+        self.user = User.objects.create_user(username="rideruser", password="Passw0rd!")
+        self.profile = Profile.objects.create(user=self.user, user_type="Rider", full_name="Rider")
+        self.rides = [Rides.objects.create(rider=self.profile, status="Accepted") for _ in range(3)]
+
+    def test_pings_are_written_in_one_batch_on_flush(self):
+        for n in range(5):
+            self.buffer.put(self.rides[0].id, 12.0 + n, 77.0)
+        self.buffer.put(self.rides[1].id, 13.0, 78.0)
+
+        self.rides[0].refresh_from_db()
+        self.assertIsNone(self.rides[0].current_latitude)
+        self.assertEqual(self.buffer.position(self.rides[0].id), (16.0, 77.0))
+
+        # Inside a savepoint, one bulk UPDATE, a lock on the rides, one read
+        # and one insert of trail chunks.
+        with self.assertNumQueries(6):
+            self.assertEqual(len(self.buffer.flush()), 2)
+        self.rides[0].refresh_from_db()
+        self.assertEqual(self.rides[0].current_latitude, 16.0)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_flushes_when_max_pending_is_reached(self):
+        for n, ride in enumerate(self.rides):
+            self.buffer.put(ride.id, 12.0 + n, 77.0)
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.rows_written, 3)
+
+    def test_failed_flush_does_not_fail_the_ping(self):
+        buffer = LocationBuffer(flush_interval=60, max_pending=1)
+        with patch('rides.models.Rides.objects.bulk_update', side_effect=IntegrityError("down")):
+            with self.assertLogs('rides.location_buffer', level='ERROR'):
+                buffer.put(self.rides[0].id, 12.0, 77.0)
+
+        # Kept for the retry the timer now has scheduled.
+        self.assertEqual(buffer.position(self.rides[0].id), (12.0, 77.0))
+        self.assertIsNotNone(buffer._timer)
+        self.assertEqual(buffer.flush(), [self.rides[0].id])
+
+    def test_update_location_and_reads_go_through_buffer(self):
+        ride = self.rides[2]
+        with patch('utils.helpers.location_buffer', self.buffer), patch('rides.views.location_buffer', self.buffer):
+            self.client.force_authenticate(user=self.user)
+            response = self.client.post(
+                reverse('update-location'),
+                {"ride_id": ride.id, "latitude": "12.5", "longitude": "77.5"},
+                format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            ride.refresh_from_db()
+            self.assertIsNone(ride.current_latitude)
+            detail = self.client.get(reverse('ride-details', kwargs={'pk': ride.pk}), format='json')
+            self.assertEqual(detail.data['current_latitude'], 12.5)
+
+
+class RideTrailTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rideruser", password="Passw0rd!")
+        self.profile = Profile.objects.create(user=self.user, user_type="Rider", full_name="Rider")
+        self.ride = Rides.objects.create(rider=self.profile, status="Accepted")
+        self.start = datetime(2025, 5, 17, 10, 0, tzinfo=dt_timezone.utc)
+
+    def points(self, count, offset=0):
+        return [
+            (12.9716 + (offset + n) * 0.0001, 77.5946 - (offset + n) * 0.0002,
+             self.start + timedelta(seconds=offset + n))
+            for n in range(count)
+        ]
+
+    def test_points_of_missing_rides_are_dropped(self):
+        append_trails({self.ride.id: self.points(2), self.ride.id + 1000: self.points(2)})
+        self.assertEqual(list(RideTrailChunk.objects.values_list('ride_id', flat=True)), [self.ride.id])
+
+    def test_position_is_not_saved_without_its_trail_point(self):
+        with patch('utils.helpers.append_trail_points', side_effect=IntegrityError("duplicate chunk")):
+            with self.assertRaises(IntegrityError):
+                update_location(self.ride.id, 12.5, 77.5)
+        self.ride.refresh_from_db()
+        self.assertIsNone(self.ride.current_latitude)
+
+    def test_stationary_ping_is_recorded_now(self):
+        update_location(self.ride.id, 12.5, 77.5)
+        earlier = timezone.now() - timedelta(hours=3)
+        Rides.objects.filter(id=self.ride.id).update(updated_at=earlier)
+
+        update_location(self.ride.id, 12.5, 77.5)
+
+        self.ride.refresh_from_db()
+        self.assertGreater(self.ride.updated_at, earlier + timedelta(hours=1))
+        last_at = list(iter_trail(self.ride.id))[-1][2]
+        self.assertGreater(last_at, earlier + timedelta(hours=1))
+
+    def test_polyline_round_trip_and_append(self):
+        points = [(12.97161, 77.59461, 1747476000), (12.97001, 77.6, 1747476005), (-33.86882, 151.20929, 1747476010)]
+        head, last = polyline.encode(points[:2])
+        tail, _ = polyline.encode(points[2:], last)
+        self.assertEqual(list(polyline.decode(head + tail)), points)
+
+    @override_settings(RIDE_TRAIL_CHUNK_POINTS=4)
+    def test_points_are_packed_into_chunks(self):
+        points = self.points(10)
+        append_trail_points(self.ride.id, points[:3])
+        with CaptureQueriesContext(connection) as queries:
+            append_trail_points(self.ride.id, points[3:])
+        # appending never rewrites stored chunks
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith(('UPDATE', 'DELETE'))])
+        chunks = RideTrailChunk.objects.filter(ride=self.ride).order_by('sequence')
+        self.assertEqual([c.point_count for c in chunks], [3, 4, 3])
+
+        self.assertEqual(compact_trail(self.ride.id), (3, 3))
+
+        chunks = list(RideTrailChunk.objects.filter(ride=self.ride).order_by('sequence'))
+        self.assertEqual([c.point_count for c in chunks], [4, 4, 2])
+        self.assertEqual(chunks[-1].ended_at, points[-1][2])
+        self.assertEqual([(round(lat, 5), round(lon, 5), t) for lat, lon, t in iter_trail(self.ride.id)],
+                         [(round(lat, 5), round(lon, 5), t) for lat, lon, t in points])
+        # full chunks are left alone from then on
+        append_trail_points(self.ride.id, self.points(1, offset=10))
+        self.assertEqual(compact_trail(self.ride.id), (2, 1))
+        self.assertEqual(list(RideTrailChunk.objects.filter(ride=self.ride).order_by('sequence')
+                              .values_list('sequence', 'point_count')), [(0, 4), (1, 4), (2, 3)])
+
+    @override_settings(RIDE_TRAIL_COMPACT_ROWS=3)
+    def test_small_chunks_queue_a_compaction(self):
+        with patch('rides.tasks.compact_ride_trail.delay') as delay, self.captureOnCommitCallbacks(execute=True):
+            for n in range(4):
+                append_trail_points(self.ride.id, self.points(1, offset=n))
+        delay.assert_called_once_with(self.ride.id)
+
+    def test_location_updates_are_recorded(self):
+        self.client.force_authenticate(user=self.user)
+        for lat in ("12.5", "12.6"):
+            self.client.post(reverse('update-location'),
+                             {"ride_id": self.ride.id, "latitude": lat, "longitude": "77.5"}, format='json')
+        self.client.post(reverse('update-locations'), {"points": [
+            {"ride_id": self.ride.id, "latitude": 12.8, "longitude": 77.5, "timestamp": "2099-01-01T00:00:02Z"},
+            {"ride_id": self.ride.id, "latitude": 12.7, "longitude": 77.5, "timestamp": "2099-01-01T00:00:01Z"},
+        ]}, format='json')
+
+        self.assertEqual([lat for lat, _, _ in iter_trail(self.ride.id)], [12.5, 12.6, 12.7, 12.8])
+
+    def test_trail_endpoint_streams_points(self):
+        append_trail_points(self.ride.id, self.points(3))
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(reverse('ride-trail', kwargs={'pk': self.ride.pk}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["ride_id"], self.ride.id)
+        self.assertEqual(len(data["points"]), 3)
+        self.assertEqual(data["points"][0], {
+            "latitude": 12.9716, "longitude": 77.5946, "timestamp": "2025-05-17T10:00:00+00:00",
+        })
+
+    def test_trail_endpoint_is_limited_to_participants(self):
+        other = User.objects.create_user(username="otheruser", password="Passw0rd!")
+        Profile.objects.create(user=other, user_type="Rider", full_name="Other")
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(reverse('ride-trail', kwargs={'pk': self.ride.pk}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TrailSimplificationTest(TestCase):
+    def setUp(self):
+        self.ride = Rides.objects.create(pickup_location="A", status="Started")
+        # An L-shaped drive with a few metres of zig-zag on each leg.
+        self.points = [(12.97 + n * 0.0001, 77.59 + (n % 2) * 0.00002, 1747476000 + n) for n in range(50)]
+        self.points += [(12.97 + 49 * 0.0001, 77.59 + n * 0.0001, 1747476050 + n) for n in range(1, 50)]
+
+    def test_douglas_peucker_stays_within_tolerance(self):
+        kept = douglas_peucker(self.points, 5.0)
+
+        self.assertEqual(len(kept), 3)
+        self.assertEqual((kept[0], kept[-1]), (self.points[0], self.points[-1]))
+        # Below the zig-zag amplitude the first leg is kept point for point.
+        self.assertEqual(len(douglas_peucker(self.points, 1.0)), 51)
+
+    def test_thin_drops_close_points(self):
+        kept = thin(self.points, min_distance_m=50)
+
+        self.assertTrue(10 < len(kept) < 25)
+        self.assertEqual(kept[-1], self.points[-1])
+
+    def test_simplify_trail_rewrites_chunks(self):
+        start = datetime(2025, 5, 17, 10, 0, tzinfo=dt_timezone.utc)
+        append_trail_points(self.ride.id, [
+            (lat, lon, start + timedelta(seconds=n)) for n, (lat, lon, _) in enumerate(self.points)
+        ])
+
+        self.assertEqual(simplify_trail(self.ride.id, tolerance_m=5.0), (99, 3))
+        self.assertEqual(len(list(iter_trail(self.ride.id))), 3)
+        self.assertTrue(RideTrailChunk.objects.get(ride=self.ride).simplified)
+        self.assertEqual(simplify_trail(self.ride.id), (3, 3))
+
+    def test_completing_a_ride_queues_simplification(self):
+        cache.clear()
+        with patch('rides.tasks.simplify_ride_trail.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ride.status = "Completed"
+                self.ride.save()
+                self.ride.save()
+
+        delay.assert_called_once_with(self.ride.id)
+
+
+class DirtyFieldSaveTest(TestCase):
+    def setUp(self):
+        self.ride = Rides.objects.create(pickup_location="A", dropoff_location="B", status="Requested")
+
+    def test_save_writes_only_changed_columns(self):
+        ride = Rides.objects.get(id=self.ride.id)
+        ride.current_latitude = 12.5
+
+        with CaptureQueriesContext(connection) as queries:
+            ride.save()
+
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"current_latitude"', sql)
+        self.assertIn('"updated_at"', sql)
+        self.assertNotIn('"pickup_location"', sql)
+        self.assertEqual(ride.get_dirty_fields(), [])
+
+    def test_clean_save_is_skipped(self):
+        ride = Rides.objects.get(id=self.ride.id)
+        ride.status = "Requested"
+
+        with self.assertNumQueries(0):
+            ride.save()
+            ride.save()
+        with self.assertNumQueries(1):
+            ride.delete()
+
+    def test_save_does_not_clobber_concurrent_writes(self):
+        first = Rides.objects.get(id=self.ride.id)
+        second = Rides.objects.get(id=self.ride.id)
+        first.status = "Accepted"
+        first.save()
+        second.current_latitude = 12.5
+        second.save()
+
+        self.ride.refresh_from_db()
+        self.assertEqual((self.ride.status, self.ride.current_latitude), ("Accepted", 12.5))
+
+    def test_deferred_fields_are_tracked_once_loaded(self):
+        ride = Rides.objects.only('id').get(id=self.ride.id)
+        self.assertEqual(ride.status, "Requested")
+        ride.save()
+        ride.pickup_location = "C"
+
+        with CaptureQueriesContext(connection) as queries:
+            ride.save()
+
+        self.assertNotIn('"status"', queries[0]['sql'])
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.pickup_location, "C")
+
+
+class RideSimulationTest(TestCase):
+    def setUp(self):
+        self.ride = Rides.objects.create(
+            pickup_location="A", status="Started", current_latitude=12.0, current_longitude=77.0,
+        )
+        self.start = datetime(2025, 5, 17, 10, 0, tzinfo=dt_timezone.utc)
+
+    def test_simulation_task_returns_without_moving_the_ride(self):
+        simulation_id = simulate_ride_movement(self.ride.id, steps=3)
+
+        simulation = RideSimulation.objects.get(id=simulation_id)
+        self.assertEqual((simulation.steps_total, simulation.steps_done), (3, 0))
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.current_latitude, 12.0)
+
+    def test_ticks_move_rides_along_their_routes(self):
+        other = Rides.objects.create(pickup_location="B", status="Started")
+        route = [[12.0, 77.0], [12.001, 77.0], [12.001, 77.001]]
+        with patch('rides.simulation.timezone.now', return_value=self.start):
+            start_simulation(self.ride, route=route, speed_mps=100, steps=10, step_seconds=1)
+            start_simulation(other, route=[[13.0, 78.0], [13.01, 78.0]], speed_mps=10, steps=2, step_seconds=1)
+
+        self.assertEqual(advance_simulations(self.start), 0)
+        moved = []
+        for tick in range(1, 5):
+            advanced = advance_simulations(self.start + timedelta(seconds=tick))
+            self.ride.refresh_from_db()
+            moved.append((advanced, round(self.ride.current_latitude, 5), round(self.ride.current_longitude, 5)))
+
+        # 100 m per step along a ~111 m north leg, then east to the end.
+        self.assertEqual(moved, [(2, 12.0009, 77.0), (2, 12.001, 77.00082), (1, 12.001, 77.001), (0, 12.001, 77.001)])
+        self.assertIsNotNone(RideSimulation.objects.get(ride=self.ride).finished_at)
+        other.refresh_from_db()
+        self.assertEqual(RideSimulation.objects.get(ride=other).steps_done, 2)
+        self.assertEqual(len(list(iter_trail(self.ride.id))), 3)
+
+    def test_bulk_update_rows_writes_given_fields(self):
+        rides = [Rides.objects.create(pickup_location=str(n), status="Started") for n in range(3)]
+        for n, ride in enumerate(rides):
+            ride.current_latitude = 10.0 + n
+            ride.pickup_location = "changed"
+
+        with self.assertNumQueries(1):
+            self.assertEqual(bulk_update_rows(rides, ['current_latitude']), 3)
+
+        self.assertEqual(
+            list(Rides.objects.filter(id__in=[r.id for r in rides]).order_by('id').values_list('current_latitude', 'pickup_location')),
+            [(10.0, "0"), (11.0, "1"), (12.0, "2")],
+        )
+
+
+class SimulationDispatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ride = Rides.objects.create(
+            pickup_location="A", status="Started", current_latitude=12.0, current_longitude=77.0,
+        )
+        stats = patch('rides.tasks.simulation_dispatch_stats', DispatchStats())
+        self.stats = stats.start()
+        self.addCleanup(stats.stop)
+
+    def test_repeated_dispatches_are_dropped_before_the_broker(self):
+        with patch('rides.tasks.simulate_ride_movement.delay') as delay:
+            results = [dispatch_ride_simulation(self.ride.id) for _ in range(4)]
+
+        self.assertEqual(results, [True, False, False, False])
+        delay.assert_called_once_with(self.ride.id)
+        self.assertEqual(self.stats.stats(), {"dispatched": 1, "deduplicated": 3, "dedup_rate": 0.75})
+
+    def test_counts_are_published_for_every_process(self):
+        other = DispatchStats()
+        with patch('rides.tasks.simulate_ride_movement.delay'):
+            for _ in range(4):
+                dispatch_ride_simulation(self.ride.id)
+        other.record(False)
+        self.assertEqual(self.stats.shared_stats()["deduplicated"], 0)
+
+        with self.assertLogs('utils.metrics', level='INFO'):
+            self.stats.counters.publish()
+        other.counters.publish()
+
+        self.assertEqual(self.stats.shared_stats(), {"dispatched": 1, "deduplicated": 4, "dedup_rate": 0.8})
+        out = StringIO()
+        call_command('show_stats', stdout=out)
+        self.assertIn("80.0% dedup rate", out.getvalue())
+
+    def test_lease_is_released_when_the_simulation_finishes(self):
+        with patch('rides.tasks.simulate_ride_movement.delay') as delay:
+            dispatch_ride_simulation(self.ride.id)
+            simulate_ride_movement(self.ride.id, steps=1, step_seconds=1)
+            self.assertFalse(dispatch_ride_simulation(self.ride.id))
+            advance_simulations(timezone.now() + timedelta(seconds=2))
+            self.assertTrue(dispatch_ride_simulation(self.ride.id))
+
+        self.assertEqual(delay.call_count, 2)
+
+    def test_duplicate_tasks_do_not_restart_a_running_simulation(self):
+        first = simulate_ride_movement(self.ride.id, steps=5)
+        RideSimulation.objects.filter(id=first).update(steps_done=2)
+
+        self.assertEqual(simulate_ride_movement(self.ride.id, steps=5), first)
+        self.assertEqual(RideSimulation.objects.get(id=first).steps_done, 2)
+
+
+class FakePubSub:
+    """Stands in for a redis-py PubSub: confirms subscriptions and hands out
+    what ``publish`` sends to subscribed channels."""
+
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.channels = set()
+        self.fail = False
+
+    def subscribe(self, *channels):
+        for channel in channels:
+            self.channels.add(channel)
+            self.messages.put({"type": "subscribe", "channel": channel.encode(), "data": len(self.channels)})
+
+    def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    def publish(self, channel, event):
+        if channel in self.channels:
+            self.messages.put({"type": "message", "channel": channel.encode(), "data": json.dumps(event)})
+
+    def get_message(self, timeout):
+        if self.fail:
+            raise ConnectionError("connection lost")
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        pass
+
+
+@override_settings(RIDE_EVENTS={"BACKEND": "rides.events.LocalBroker", "OPTIONS": {"max_queue": 2}})
+class RideEventsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rideruser", password="Passw0rd!")
+        self.profile = Profile.objects.create(user=self.user, user_type="Rider", full_name="Rider")
+        self.ride = Rides.objects.create(rider=self.profile, status="Started", current_latitude=12.0, current_longitude=77.0)
+        self.url = reverse('ride-events', kwargs={'pk': self.ride.pk})
+        self.token = str(AccessToken.for_user(self.user))
+
+    async def test_stream_sends_snapshot_then_updates(self):
+        from rides.events import get_broker
+
+        response = await AsyncClient().get(self.url, headers={"Authorization": f"Bearer {self.token}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+
+        first = (await anext(stream)).decode()
+        self.assertTrue(first.startswith("event: ride.snapshot\n"))
+        self.assertEqual(json.loads(first.split("data: ")[1])["current_latitude"], 12.0)
+
+        get_broker().publish_many([
+            (self.ride.id, {"type": "ride.updated", "data": {"current_latitude": 12.5}}),
+            (self.ride.id, {"type": "ride.updated", "data": {"status": "Completed"}}),
+        ])
+        self.assertEqual(
+            (await anext(stream)).decode(), 'event: ride.updated\ndata: {"current_latitude": 12.5}\n\n'
+        )
+        self.assertIn('"Completed"', (await anext(stream)).decode())
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    async def test_stream_requires_a_participant_token(self):
+        response = await AsyncClient().get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        other = await User.objects.acreate(username="otheruser")
+        response = await AsyncClient().get(self.url, {"token": str(AccessToken.for_user(other))})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_slow_subscribers_drop_oldest_events(self):
+        broker = LocalBroker(max_queue=2)
+        subscription = broker.subscribe(self.ride.id)
+        broker.publish_many([(self.ride.id, {"n": n}) for n in range(5)])
+        await asyncio.sleep(0)
+
+        self.assertEqual(subscription.dropped, 3)
+        self.assertEqual([await subscription.get(0), await subscription.get(0)], [{"n": 3}, {"n": 4}])
+        subscription.close()
+        self.assertFalse(broker.wants(self.ride.id))
+
+    def redis_broker(self):
+        broker = RedisBroker()
+        broker.client = MagicMock()
+        broker.client.pubsub.return_value = pubsub = FakePubSub()
+        return broker, pubsub
+
+    async def test_redis_listener_follows_subscribers(self):
+        broker, pubsub = self.redis_broker()
+
+        first = broker.subscribe(self.ride.id)
+        listener = broker._listener
+        self.assertTrue(listener.is_alive())
+        self.assertTrue(await first.wait_ready(2))
+        # only this process's rides are subscribed to
+        self.assertEqual(pubsub.channels, {f"ride-events:{self.ride.id}"})
+        # a stream opened as the last one closes keeps the same listener
+        first.close()
+        second = broker.subscribe(self.ride.id)
+        self.assertIs(broker._listener, listener)
+        self.assertTrue(await second.wait_ready(2))
+        self.assertTrue(listener.is_alive())
+
+        pubsub.publish(f"ride-events:{self.ride.id}", {"type": "ride.updated", "data": {"status": "Accepted"}})
+        self.assertEqual((await second.get(2))["data"], {"status": "Accepted"})
+
+        second.close()
+        await asyncio.to_thread(listener.join, 2)
+        self.assertFalse(listener.is_alive())
+        self.assertIsNone(broker._listener)
+
+        third = broker.subscribe(self.ride.id)
+        listener = broker._listener
+        self.assertTrue(listener.is_alive())
+        third.close()
+        await asyncio.to_thread(listener.join, 2)
+
+    async def test_redis_listener_failure_closes_streams(self):
+        broker, pubsub = self.redis_broker()
+        subscription = broker.subscribe(self.ride.id)
+        self.assertTrue(await subscription.wait_ready(2))
+        listener = broker._listener
+
+        pubsub.fail = True
+        with self.assertLogs('rides.events', level='ERROR'):
+            self.assertIs(await subscription.get(2), CLOSED)
+            await asyncio.to_thread(listener.join, 2)
+        self.assertIsNone(broker._listener)
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    def test_saves_and_bulk_writes_publish_changed_fields(self):
+        broker = MagicMock()
+        with patch('rides.events.get_broker', return_value=broker), \
+                patch('rides.tasks.refresh_ride_address.apply_async'), \
+                self.captureOnCommitCallbacks(execute=True):
+            ride = Rides.objects.get(id=self.ride.id)
+            ride.status = "Accepted"
+            ride.save()
+            client = APIClient()
+            client.force_authenticate(self.user)
+            client.post(reverse('update-locations'), {"points": [
+                {"ride_id": self.ride.id, "latitude": 13.0, "longitude": 78.0},
+            ]}, format='json')
+
+        (saved,), (bulk,) = [c.args[0] for c in broker.publish_many.call_args_list]
+        self.assertEqual(set(saved[1]["data"]), {"status", "updated_at"})
+        self.assertEqual(bulk[1]["data"]["current_latitude"], 13.0)
+
+
+@override_settings(GEOCODER={"BACKEND": "utils.geocoders.StubGeocoder", "OPTIONS": {"latitude": 12.97, "longitude": 77.59}})
+class AsyncRideViewsTest(TestCase):
+    def setUp(self):
+        geocode_cache.local.clear()
+        driver_index.reset()
+        self.rider = User.objects.create_user(username="rideruser", password="Passw0rd!")
+        self.rider_profile = Profile.objects.create(user=self.rider, user_type="Rider", full_name="Rider")
+        self.driver = User.objects.create_user(username="driveruser", password="Passw0rd!")
+        self.driver_profile = Profile.objects.create(
+            user=self.driver, user_type="Driver", full_name="Driver", latitude=12.971, longitude=77.591,
+        )
+        self.ride = Rides.objects.create(rider=self.rider_profile, pickup_location="Unknown Road", status="Requested")
+
+    def auth(self, user):
+        return {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+    async def test_find_driver_geocodes_and_assigns(self):
+        response = await AsyncClient().post(
+            reverse('async-find-driver'), {"ride_id": self.ride.id},
+            content_type='application/json', headers=self.auth(self.rider),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ride = await Rides.objects.aget(id=self.ride.id)
+        self.assertEqual((ride.driver_id, ride.pickup_latitude), (self.driver_profile.id, 12.97))
+
+    async def test_accept_ride(self):
+        url = reverse('async-accept-ride', kwargs={'pk': self.ride.id})
+        response = await AsyncClient().post(url, headers=self.auth(self.rider))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = await AsyncClient().post(url, headers=self.auth(self.driver))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)["results"]["data"]["status"], "Accepted")
+
+        response = await AsyncClient().post(url, headers=self.auth(self.driver))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_update_location(self):
+        url = reverse('async-update-location')
+        payload = {"ride_id": self.ride.id, "latitude": "12.5", "longitude": "77.5"}
+        response = await AsyncClient().post(url, payload, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        # the driver is not on this ride
+        response = await AsyncClient().post(url, payload, content_type='application/json', headers=self.auth(self.driver))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await AsyncClient().post(url, payload, content_type='application/json', headers=self.auth(self.rider))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ride = await Rides.objects.aget(id=self.ride.id)
+        self.assertEqual((ride.current_latitude, ride.current_longitude), (12.5, 77.5))
+        trail = await sync_to_async(lambda: list(iter_trail(self.ride.id)))()
+        self.assertEqual([lat for lat, _, _ in trail], [12.5])
+
+    async def test_malformed_bodies_are_rejected(self):
+        for name in ('async-update-location', 'async-find-driver'):
+            for body in ('{"ride_id":', '[1, 2]', '7'):
+                response = await AsyncClient().post(
+                    reverse(name), body, content_type='application/json', headers=self.auth(self.rider),
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (name, body))
+
+
+class JSONRenderingTest(TestCase):
+    value = {
+        "at": datetime(2025, 5, 17, 10, 0, 0, 250000, tzinfo=dt_timezone.utc),
+        "day": datetime(2025, 5, 17).date(),
+        "fare": Decimal("12.50"),
+        "id": UUID("12345678-1234-5678-1234-567812345678"),
+        "distance": np.float64(1.5),
+        7: "int key",
+    }
+
+    def test_backends_encode_the_same_types(self):
+        for backend in ('orjson', 'json'):
+            with self.subTest(backend=backend), override_settings(JSON_BACKEND=backend):
+                decoded = json.loads(renderers.dumps(self.value))
+                self.assertEqual(decoded["at"][:23], "2025-05-17T10:00:00.250")
+                self.assertTrue(decoded["at"].endswith("Z"))
+                self.assertEqual(decoded["day"], "2025-05-17")
+                self.assertEqual(decoded["fare"], "12.50")
+                self.assertEqual(decoded["id"], "12345678-1234-5678-1234-567812345678")
+                self.assertEqual(decoded["distance"], 1.5)
+                self.assertEqual(decoded["7"], "int key")
+
+    def test_success_response_uses_renderer(self):
+        with patch('utils.helpers.JSONResponse', wraps=renderers.JSONResponse) as response_class:
+            response = success_response({"fare": Decimal("3.10")})
+        response_class.assert_called_once()
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(response.content), {"message": "Success", "results": {"data": {"fare": "3.10"}}})
+
+    def test_iter_json_list_streams_in_batches(self):
+        pieces = list(renderers.iter_json_list(({"n": i} for i in range(5)), prefix=b'{"items":', suffix=b'}', batch_size=2))
+        self.assertEqual(len(pieces), 5)  # opening, three batches, closing
+        self.assertEqual(json.loads(b"".join(pieces)), {"items": [{"n": i} for i in range(5)]})
+        self.assertEqual(b"".join(renderers.iter_json_list([])), b"[]")
+
+    def test_drf_views_render_with_fast_renderer(self):
+        user = User.objects.create_user(username="rider", password="Passw0rd!")
+        Profile.objects.create(user=user, user_type="Rider", full_name="Rider")
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(reverse('list-rides'))
+        self.assertIsInstance(response.accepted_renderer, renderers.FastJSONRenderer)
+        self.assertEqual(response.json(), [])
+
+
+class RideDetailCacheTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="rider", password="Passw0rd!")
+        self.profile = Profile.objects.create(user=user, user_type="Rider", full_name="Rider")
+        self.ride = Rides.objects.create(rider=self.profile, status="Requested", pickup_location="A")
+        self.url = reverse('ride-details', kwargs={'pk': self.ride.pk})
+        self.client.force_authenticate(user)
+
+    def test_only_participants_can_read_details(self):
+        etag = self.client.get(self.url)['ETag']
+        stranger = User.objects.create_user(username="stranger", password="Passw0rd!")
+        Profile.objects.create(user=stranger, user_type="Rider", full_name="Stranger", phone_number="5550001111")
+
+        self.client.force_authenticate(stranger)
+        # the rider's cached payload must not be served to anyone else
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unchanged_polls_are_served_without_queries(self):
+        with self.assertNumQueries(1):
+            first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first.headers)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+            cached = self.client.get(self.url)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(cached.json(), first.json())
+
+        sparse = self.client.get(self.url, {'fields': 'status'})
+        self.assertEqual(sparse.json(), {'status': "Requested"})
+        self.assertNotEqual(sparse['ETag'], first['ETag'])
+
+    def test_save_moves_the_version(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            ride = Rides.objects.get(pk=self.ride.pk)
+            ride.status = "Accepted"
+            ride.save()
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()['status'], "Accepted")
+        self.assertNotEqual(resp['ETag'], etag)
+
+    @override_settings(RIDE_TRAIL_ENABLED=False)
+    @patch('rides.tasks.refresh_ride_address.apply_async')
+    @patch('rides.tasks.refresh_ride_address.delay')
+    def test_bulk_writes_move_the_version(self, *mocks):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_update_locations([{'ride_id': self.ride.pk, 'latitude': 12.97, 'longitude': 77.59}])
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()['current_latitude'], 12.97)
+
+    def test_read_racing_a_writer_is_not_cached(self):
+        ride = Rides.objects.get(pk=self.ride.pk)
+        # a writer bumps the version between this read and minting its own
+        with patch('rides.detail_cache.get_version', return_value=None):
+            with self.captureOnCommitCallbacks(execute=True):
+                ride.status = "Accepted"
+                ride.save(update_fields=['status'])
+            resp = self.client.get(self.url)
+        self.assertNotIn('ETag', resp.headers)
+        self.assertEqual(self.client.get(self.url).json()['status'], "Accepted")
+
+    def test_profile_changes_move_the_version(self):
+        etag = self.client.get(self.url)['ETag']
+
+        # a position-only save leaves the embedded summary alone
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = Profile.objects.get(pk=self.profile.pk)
+            profile.latitude = 12.9
+            profile.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.full_name = "Renamed"
+            profile.save()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()['rider_summary']['full_name'], "Renamed")
+
+    @patch('rides.management.commands.backfill_ride_coordinates.geocode_ride_points',
+           return_value={'pickup_latitude': 12.97, 'pickup_longitude': 77.59})
+    def test_backfill_moves_the_version(self, mock_geocode):
+        etag = self.client.get(self.url)['ETag']
+        call_command('backfill_ride_coordinates', delay=0, stdout=StringIO())
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()['pickup_latitude'], 12.97)
+
+    def test_hard_delete_forgets_the_version(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Rides.objects.get(pk=self.ride.pk).hard_delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(RIDE_DETAIL_CACHE_ENABLED=False)
+    def test_disabled(self):
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+            resp = self.client.get(self.url)
+        self.assertNotIn('ETag', resp.headers)
+
@@ -0,0 +1,197 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from utils import polyline
+from utils.renderers import iter_json_list
+from utils.simplify import simplify
+from .models import RideTrailChunk, Rides
+
+
+def trail_enabled():
+    return getattr(settings, 'RIDE_TRAIL_ENABLED', True)
+
+
+def append_trail_points(ride_id, points):
+    """Appends ``(lat, lon, recorded_at)`` points, in time order, to a ride's trail."""
+    append_trails({ride_id: points})
+
+
+def append_trails(trails):
+    """Appends location points to the trails of many rides at once.
+
+    Appending only inserts rows: each ride's points become new chunks after
+    its newest one, so a ping never rewrites the chunks already stored. The
+    small chunks this leaves behind are merged into chunks of
+    ``RIDE_TRAIL_CHUNK_POINTS`` points later, by ``compact_trail``, once a
+    ride has ``RIDE_TRAIL_COMPACT_ROWS`` of them. The rides are locked while
+    appending, so concurrent writers cannot both take a ride's next sequence
+    number. Points of rides that no longer exist are dropped. A batch costs
+    one lock, one read and one insert however many rides and points it
+    covers.
+
+    Args:
+        trails (dict): Maps ride ids to lists of ``(lat, lon, recorded_at)``
+            tuples in time order.
+    """
+    from .tasks import schedule_trail_compaction
+
+    trails = {ride_id: list(points) for ride_id, points in trails.items() if points}
+    if not trails:
+        return
+    chunk_size = getattr(settings, 'RIDE_TRAIL_CHUNK_POINTS', 500)
+    compact_rows = getattr(settings, 'RIDE_TRAIL_COMPACT_ROWS', 32)
+
+    # Callers writing positions wrap this in their own transaction; a failure
+    # here rolls the whole batch back rather than a savepoint.
+    with transaction.atomic(savepoint=False):
+        # Lock the rides rather than their newest chunks: a ride without a
+        # chunk yet has no chunk row to lock. Ids are locked in order so
+        # overlapping batches cannot deadlock.
+        locked = set(
+            Rides.objects.select_for_update().filter(id__in=trails.keys()).order_by('id').values_list('id', flat=True)
+        )
+        trails = {ride_id: points for ride_id, points in trails.items() if ride_id in locked}
+        stored = {
+            row['ride_id']: row
+            for row in RideTrailChunk.objects.filter(ride_id__in=trails.keys())
+            .values('ride_id')
+            .annotate(last=Max('sequence'), partial=Count('id', filter=Q(point_count__lt=chunk_size)))
+        }
+
+        created = []
+        for ride_id, points in trails.items():
+            row = stored.get(ride_id, {'last': -1, 'partial': 0})
+            chunks = _build_chunks(
+                ride_id,
+                [(lat, lon, recorded_at.timestamp()) for lat, lon, recorded_at in points],
+                chunk_size,
+                first_sequence=row['last'] + 1,
+            )
+            created.extend(chunks)
+            partial = row['partial'] + sum(1 for chunk in chunks if chunk.point_count < chunk_size)
+            if partial >= compact_rows:
+                schedule_trail_compaction(ride_id)
+        RideTrailChunk.objects.bulk_create(created)
+
+
+def compact_trail(ride_id):
+    """Merges a ride's small trail chunks into chunks of ``RIDE_TRAIL_CHUNK_POINTS``.
+
+    Chunks from the first one holding fewer points onwards are decoded and
+    rewritten; the full chunks before it are left alone.
+
+    Returns:
+        tuple: The number of chunks rewritten and written.
+    """
+    chunk_size = getattr(settings, 'RIDE_TRAIL_CHUNK_POINTS', 500)
+
+    with transaction.atomic():
+        # the same lock append_trails takes
+        if not Rides.objects.select_for_update().filter(id=ride_id).exists():
+            return 0, 0
+        first = (
+            RideTrailChunk.objects.filter(ride_id=ride_id, point_count__lt=chunk_size)
+            .order_by('sequence')
+            .values_list('sequence', flat=True)
+            .first()
+        )
+        if first is None:
+            return 0, 0
+        chunks = list(
+            RideTrailChunk.objects.filter(ride_id=ride_id, sequence__gte=first)
+            .order_by('sequence')
+            .only('id', 'encoded', 'simplified')
+        )
+        points = [point for chunk in chunks for point in polyline.decode(chunk.encoded)]
+        merged = _build_chunks(
+            ride_id, points, chunk_size,
+            simplified=all(chunk.simplified for chunk in chunks),
+            first_sequence=first,
+        )
+        RideTrailChunk.objects.filter(id__in=[chunk.id for chunk in chunks]).delete()
+        RideTrailChunk.objects.bulk_create(merged)
+    return len(chunks), len(merged)
+
+
+def _build_chunks(ride_id, points, chunk_size, simplified=False, first_sequence=0):
+    """Encodes ``(lat, lon, t)`` points, ``t`` in epoch seconds, into new chunks."""
+    chunks = []
+    for sequence, start in enumerate(range(0, len(points), chunk_size), start=first_sequence):
+        taken = points[start:start + chunk_size]
+        encoded, (lat, lon, _) = polyline.encode(taken)
+        chunks.append(RideTrailChunk(
+            ride_id=ride_id,
+            sequence=sequence,
+            point_count=len(taken),
+            started_at=datetime.fromtimestamp(taken[0][2], tz=dt_timezone.utc),
+            ended_at=datetime.fromtimestamp(taken[-1][2], tz=dt_timezone.utc),
+            last_latitude=lat / polyline.COORDINATE_FACTOR,
+            last_longitude=lon / polyline.COORDINATE_FACTOR,
+            encoded=encoded,
+            simplified=simplified,
+        ))
+    return chunks
+
+
+def simplify_trail(ride_id, method=None, tolerance_m=None, min_interval_s=None):
+    """Replaces a ride's trail with a simplified copy.
+
+    The method and tolerances default to the ``RIDE_TRAIL_SIMPLIFY_*``
+    settings. Simplifying an already simplified trail is a no-op.
+
+    Args:
+        ride_id (int): The ride whose trail to simplify.
+        method (str, optional): ``douglas_peucker`` or ``thin``.
+        tolerance_m (float, optional): Allowed error in metres.
+        min_interval_s (int, optional): Smallest gap in seconds kept by ``thin``.
+
+    Returns:
+        tuple: The number of points before and after.
+    """
+    method = method or getattr(settings, 'RIDE_TRAIL_SIMPLIFY_METHOD', 'douglas_peucker')
+    if tolerance_m is None:
+        tolerance_m = getattr(settings, 'RIDE_TRAIL_SIMPLIFY_TOLERANCE_METERS', 5.0)
+    if min_interval_s is None:
+        min_interval_s = getattr(settings, 'RIDE_TRAIL_SIMPLIFY_MIN_INTERVAL_SECONDS', 0)
+    chunk_size = getattr(settings, 'RIDE_TRAIL_CHUNK_POINTS', 500)
+
+    with transaction.atomic():
+        chunks = list(
+            RideTrailChunk.objects.select_for_update()
+            .filter(ride_id=ride_id)
+            .order_by('sequence')
+            .only('id', 'encoded', 'simplified')
+        )
+        points = [point for chunk in chunks for point in polyline.decode(chunk.encoded)]
+        if all(chunk.simplified for chunk in chunks):
+            return len(points), len(points)
+
+        kept = simplify(points, method, tolerance_m, min_interval_s)
+        RideTrailChunk.objects.filter(id__in=[chunk.id for chunk in chunks]).delete()
+        RideTrailChunk.objects.bulk_create(_build_chunks(ride_id, kept, chunk_size, simplified=True))
+    return len(points), len(kept)
+
+
+def iter_trail(ride_id):
+    """Yields ``(lat, lon, recorded_at)`` for a ride, one chunk in memory at a time."""
+    chunks = (
+        RideTrailChunk.objects.filter(ride_id=ride_id)
+        .order_by('sequence')
+        .values_list('encoded', flat=True)
+        .iterator(chunk_size=20)
+    )
+    for encoded in chunks:
+        for lat, lon, t in polyline.decode(encoded):
+            yield lat, lon, datetime.fromtimestamp(t, tz=dt_timezone.utc)
+
+
+def stream_trail_json(ride_id):
+    """Yields a ride's trail as JSON in pieces, one chunk of points at a time."""
+    points = (
+        {"latitude": lat, "longitude": lon, "timestamp": recorded_at.isoformat()}
+        for lat, lon, recorded_at in iter_trail(ride_id)
+    )
+    return iter_json_list(points, prefix=b'{"ride_id":%d,"points":' % ride_id, suffix=b'}')
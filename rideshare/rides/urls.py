@@ -1,11 +1,15 @@
 from django.urls import path
+from . import async_views
 from .views import (
     RidesViewSet,
     RidesListViewSet,
     RidesDetailsViewSet,
     UpdateRidesStatusViewSet,
     RideLocationUpdateView,
+    BulkLocationUpdateView,
+    RideTrailView,
     FindNearestDriverView,
+    NearbyDriversView,
     AcceptRideViewSet,
 )
 
@@ -16,6 +20,13 @@ urlpatterns = [
     path('ride-details/<int:pk>', RidesDetailsViewSet.as_view({'get': 'retrieve'}), name="ride-details"),
     path('update-ride-status/<int:pk>', UpdateRidesStatusViewSet.as_view({'put': 'update', 'patch': 'partial_update'}), name="update-ride-status"),
     path('update-location', RideLocationUpdateView.as_view(), name="update-location"),
+    path('update-locations', BulkLocationUpdateView.as_view(), name="update-locations"),
+    path('ride-events/<int:pk>', async_views.ride_events, name="ride-events"),
+    path('async/update-location', async_views.update_location, name="async-update-location"),
+    path('async/find-driver', async_views.find_driver, name="async-find-driver"),
+    path('async/accept-ride/<int:pk>', async_views.accept_ride, name="async-accept-ride"),
+    path('ride-trail/<int:pk>', RideTrailView.as_view(), name="ride-trail"),
     path('find-driver', FindNearestDriverView.as_view(), name="find-driver"),
+    path('nearby-drivers', NearbyDriversView.as_view(), name="nearby-drivers"),
     path('accept-ride/<int:pk>', AcceptRideViewSet.as_view({'post': 'accept'}), name="accept-ride"),
 ]
\ No newline at end of file
@@ -1,20 +1,42 @@
 from django.shortcuts import render
 from rest_framework.viewsets import ModelViewSet
+from authentication.models import Profile
 from .models import Rides
-from .serializers import RideSerializer
+from . import detail_cache
+from .detail_cache import detail_cache_enabled
+from .location_buffer import location_buffer
+from .trail import stream_trail_json
+from .filters import RideFilterBackend
+from .serializers import RideSerializer, ExpandedRideSerializer, NearbyDriverSerializer, BulkLocationUpdateSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied, APIException
 from utils.constants import REQUESTED
-from utils.helpers import success_response, error_response, update_location, find_nearest_driver
+from utils.fieldsets import SparseFieldsetMixin
+from utils.pagination import KeysetPagination
+from utils.helpers import (
+    success_response,
+    error_response,
+    update_location,
+    bulk_update_locations,
+    geocode_ride_points,
+    pickup_coordinates,
+    nearest_drivers_to,
+)
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from math import isfinite
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
 # Create your views here.
 
 
 class RidesViewSet(ModelViewSet): # create ride request
-    queryset = Rides.objects.all()
+    queryset = Rides.objects.select_related('rider', 'driver')
     serializer_class = RideSerializer
     permission_classes = [IsAuthenticated]
 
@@ -24,33 +46,87 @@ class RidesViewSet(ModelViewSet): # create ride request
         if profile.user_type != 'Rider':
             raise PermissionDenied("Only rider users may request rides.")
 
+        # Geocode once here so matching can use the stored coordinates
+        # instead of resolving the address again on every lookup.
         serializer.save(
             rider=profile,
-            status=REQUESTED
+            status=REQUESTED,
+            **geocode_ride_points(serializer.validated_data)
         )
         
 
-class RidesListViewSet(ModelViewSet): # list all rides
-    queryset = Rides.objects.all()
-    serializer_class = RideSerializer
+class RidesListViewSet(SparseFieldsetMixin, ModelViewSet): # list the requesting profile's rides, newest first
+    queryset = Rides.objects.select_related('rider', 'driver')
+    serializer_class = ExpandedRideSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [RideFilterBackend]
+    pagination_class = KeysetPagination
+    always_fetch = ('id', 'created_at')  # the page cursor is built from them
 
-    def list_rides(self, request):
-        rides = self.get_queryset()
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        serializer = self.get_serializer(location_buffer.overlay(page), many=True)
+        return self.get_paginated_response(serializer.data)
 
-        serializer = self.get_serializer(rides, many=True)
-        return success_response(
-            serializer.data
-        )
-    
 
-class RidesDetailsViewSet(ModelViewSet): # ride details
-    queryset = Rides.objects.all()
-    serializer_class = RideSerializer
+class RidesDetailsViewSet(SparseFieldsetMixin, ModelViewSet): # ride details, for its rider, driver or staff
+    queryset = Rides.objects.select_related('rider', 'driver')
+    serializer_class = ExpandedRideSerializer
+    permission_classes = [IsAuthenticated]
+    always_fetch = ('id', 'updated_at')  # the cache version is minted from them
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_staff:
+            return queryset
+        # a subquery rather than joins, so ?fields= can still skip the profiles
+        profile = Profile.objects.filter(user=user).values('id')
+        return queryset.filter(Q(rider_id__in=profile) | Q(driver_id__in=profile))
+
+    def get_object(self):
+        ride = super().get_object()
+        location_buffer.overlay([ride])
+        return ride
+
+    def retrieve(self, request, *args, **kwargs):
+        # Polls are answered from the ride-detail cache: a 304 while the
+        # client's ETag is current, else the payload cached for the version.
+        # Payloads are cached per user, only once get_object let them in.
+        if not detail_cache_enabled():
+            return super().retrieve(request, *args, **kwargs)
+
+        fields = self.get_sparse_fields()
+        version = detail_cache.get_version(kwargs['pk'])
+        data = None
+        if version is not None:
+            data = detail_cache.get_payload(kwargs['pk'], version, fields, request.user.id)
+        if data is not None:
+            not_modified = get_conditional_response(
+                request, etag=detail_cache.etag(version, fields), last_modified=int(version[1])
+            )
+            if not_modified is not None:
+                return self.with_version(not_modified, version, fields)
+            return self.with_version(Response(data), version, fields)
+
+        ride = self.get_object()
+        data = self.get_serializer(ride).data
+        if version is None:
+            version = detail_cache.add_version(ride.id, ride.updated_at)
+        if version is None:
+            return Response(data)
+        detail_cache.set_payload(ride.id, version, fields, request.user.id, data)
+        return self.with_version(Response(data), version, fields)
+
+    def with_version(self, response, version, fields):
+        response['ETag'] = detail_cache.etag(version, fields)
+        response['Last-Modified'] = http_date(version[1])
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 class UpdateRidesStatusViewSet(ModelViewSet):
-    queryset = Rides.objects.all()
+    queryset = Rides.objects.select_related('rider', 'driver')
     serializer_class = RideSerializer
     permission_classes = [IsAuthenticated]
 
@@ -87,6 +163,56 @@ class RideLocationUpdateView(APIView):
         return success_response(success_message='Location updated')
 
 
+class BulkLocationUpdateView(APIView): # batched location pings for many rides
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            serializer = BulkLocationUpdateSerializer(data=request.data)
+            if not serializer.is_valid():
+                return error_response(
+                    serializer.errors,
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            profile = request.user.profile
+            points = serializer.validated_data['points']
+            updated = bulk_update_locations(
+                points,
+                rides=Rides.objects.filter(Q(driver=profile) | Q(rider=profile))
+            )
+
+            updated_ids = {ride.id for ride in updated}
+            return success_response(
+                {
+                    "updated_ride_ids": sorted(updated_ids),
+                    "rejected_ride_ids": sorted({p['ride_id'] for p in points} - updated_ids),
+                },
+                success_message='Locations updated'
+            )
+        except Exception as e:
+            return error_response("Something went wrong.")
+
+
+class RideTrailView(APIView): # stream the location history of a ride
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            profile = request.user.profile
+            ride = Rides.objects.filter(Q(driver=profile) | Q(rider=profile)).only('id').get(id=pk)
+        except Rides.DoesNotExist:
+            return error_response(
+                error_message="Ride not found.",
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return error_response("Something went wrong.")
+
+        # the trail is read and sent one chunk at a time
+        return StreamingHttpResponse(stream_trail_json(ride.id), content_type="application/json")
+
+
 class FindNearestDriverView(APIView): # find the nearest driver
     permission_classes = [IsAuthenticated]
 
@@ -101,13 +227,17 @@ class FindNearestDriverView(APIView): # find the nearest driver
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            driver = find_nearest_driver(ride.pickup_location)
-            if not driver:
+            lat, lon = pickup_coordinates(ride)
+            nearest = []
+            if lat is not None:
+                nearest = nearest_drivers_to(lat, lon, k=1, radius_km=5, max_radius_km=5)
+            if not nearest:
                 return error_response(
                     error_message="No available drivers within radius.",
                     status=status.HTTP_404_NOT_FOUND
                 )
 
+            driver = nearest[0][1]
             ride.driver = driver
             ride.save()
             driver.save()
@@ -120,8 +250,61 @@ class FindNearestDriverView(APIView): # find the nearest driver
             return error_response("Something went wrong.")
         
 
+class NearbyDriversView(APIView): # k nearest drivers to a ride's pickup
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            ride_id = request.query_params.get("ride_id")
+            max_radius_km = getattr(settings, 'NEARBY_DRIVERS_MAX_RADIUS_KM', 20)
+            try:
+                k = int(request.query_params.get("k", 5))
+                radius_km = float(request.query_params.get("radius_km", 5))
+            except ValueError:
+                return error_response(
+                    error_message="k and radius_km must be numbers.",
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if k < 1 or not isfinite(radius_km) or radius_km <= 0:
+                return error_response(
+                    error_message="k and radius_km must be positive, finite numbers.",
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Driver positions and phone numbers are only shown to the ride's rider.
+            rides = Rides.objects.active()
+            if not request.user.is_staff:
+                rides = rides.filter(rider__user=request.user)
+            ride = rides.get(id=ride_id)
+            lat, lon = pickup_coordinates(ride)
+            nearest = []
+            if lat is not None:
+                nearest = nearest_drivers_to(
+                    lat, lon,
+                    k=min(k, getattr(settings, 'NEARBY_DRIVERS_MAX_K', 50)),
+                    radius_km=radius_km,
+                    max_radius_km=max_radius_km,
+                )
+
+            drivers = []
+            for distance, driver in nearest:
+                driver.distance_km = round(distance, 3)
+                drivers.append(driver)
+            return success_response(
+                NearbyDriverSerializer(drivers, many=True).data,
+                status=status.HTTP_200_OK
+            )
+        except Rides.DoesNotExist:
+            return error_response(
+                error_message="Ride not found.",
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return error_response("Something went wrong.")
+
+
 class AcceptRideViewSet(ModelViewSet):
-    queryset = Rides.objects.all()
+    queryset = Rides.objects.select_related('rider', 'driver')
     serializer_class = RideSerializer
     permission_classes = [IsAuthenticated]
 
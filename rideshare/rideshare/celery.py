@@ -1,7 +1,19 @@
 import os
 from celery import Celery
+from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rideshare.settings')
 app = Celery('rideshare')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+
+app.conf.beat_schedule = {
+    'assign-requested-rides': {
+        'task': 'rides.tasks.assign_requested_rides',
+        'schedule': settings.MATCHING_INTERVAL_SECONDS,
+    },
+    'advance-ride-simulations': {
+        'task': 'rides.tasks.advance_ride_simulations',
+        'schedule': settings.SIMULATION_TICK_SECONDS,
+    },
+}
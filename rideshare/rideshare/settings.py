@@ -144,9 +144,127 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'utils.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 REDIS_URL = os.getenv("REDIS_URL", "localhost")
 REDIS_PORT = os.getenv("REDIS_PORT", "6379")
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', "redis://"+REDIS_URL+":6379")
-CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', "redis://"+REDIS_URL+":6379")
\ No newline at end of file
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', "redis://"+REDIS_URL+":6379")
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.redis.RedisCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "redis://"+REDIS_URL+":"+REDIS_PORT),
+    }
+}
+
+# Spatial index used for nearest-driver lookups
+DRIVER_INDEX_CELL_KM = float(os.getenv("DRIVER_INDEX_CELL_KM", "1.0"))
+DRIVER_INDEX_REFRESH_SECONDS = int(os.getenv("DRIVER_INDEX_REFRESH_SECONDS", "60"))
+
+# Batch ride-to-driver matching
+MATCHING_INTERVAL_SECONDS = float(os.getenv("MATCHING_INTERVAL_SECONDS", "5"))
+MATCHING_RADIUS_KM = float(os.getenv("MATCHING_RADIUS_KM", "5"))
+MATCHING_OPTIMAL_MAX_SIZE = int(os.getenv("MATCHING_OPTIMAL_MAX_SIZE", "200"))
+MATCHING_BATCH_LIMIT = int(os.getenv("MATCHING_BATCH_LIMIT", "1000"))
+
+# k-nearest driver search
+NEARBY_DRIVERS_MAX_K = int(os.getenv("NEARBY_DRIVERS_MAX_K", "50"))
+NEARBY_DRIVERS_MAX_RADIUS_KM = float(os.getenv("NEARBY_DRIVERS_MAX_RADIUS_KM", "20"))
+
+# Geocoding
+GEOCODER_TIMEOUT_SECONDS = float(os.getenv("GEOCODER_TIMEOUT_SECONDS", "5"))
+OUTBOUND_HTTP = {
+    "pool_size": int(os.getenv("OUTBOUND_HTTP_POOL_SIZE", "10")),
+    "max_concurrency": int(os.getenv("OUTBOUND_HTTP_MAX_CONCURRENCY", "10")),
+    "timeout": GEOCODER_TIMEOUT_SECONDS,
+    "retries": int(os.getenv("OUTBOUND_HTTP_RETRIES", "2")),
+    "failure_threshold": int(os.getenv("OUTBOUND_HTTP_FAILURE_THRESHOLD", "5")),
+    "reset_timeout": float(os.getenv("OUTBOUND_HTTP_RESET_TIMEOUT", "30")),
+}
+GEOCODER = {
+    # Set GEOCODER_BACKEND=utils.geocoders.OfflineGeocoder and
+    # GEOCODER_GAZETTEER_PATH to geocode from a local file without network.
+    "BACKEND": os.getenv("GEOCODER_BACKEND", "utils.geocoders.NominatimGeocoder"),
+    "OPTIONS": {
+        "timeout": GEOCODER_TIMEOUT_SECONDS,
+        "path": os.getenv("GEOCODER_GAZETTEER_PATH"),
+    },
+}
+ADDRESS_REFRESH_DELAY_SECONDS = float(os.getenv("ADDRESS_REFRESH_DELAY_SECONDS", "2"))
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(60 * 60 * 24)))
+GEOCODE_NEGATIVE_CACHE_TTL = int(os.getenv("GEOCODE_NEGATIVE_CACHE_TTL", str(60 * 60)))
+REVERSE_GEOCODE_CELL_PRECISION = int(os.getenv("REVERSE_GEOCODE_CELL_PRECISION", "4"))
+REVERSE_GEOCODE_CACHE_SIZE = int(os.getenv("REVERSE_GEOCODE_CACHE_SIZE", "50000"))
+REVERSE_GEOCODE_CACHE_TTL = int(os.getenv("REVERSE_GEOCODE_CACHE_TTL", str(60 * 60 * 24)))
+
+# Bulk GPS ingestion
+BULK_LOCATION_MAX_POINTS = int(os.getenv("BULK_LOCATION_MAX_POINTS", "5000"))
+
+# Write-behind buffer for ride positions. When enabled, pings are kept in
+# memory and written in batches; a crash loses at most the pings received in
+# the last LOCATION_BUFFER_FLUSH_SECONDS (and at most
+# LOCATION_BUFFER_MAX_PENDING rides).
+LOCATION_BUFFER_ENABLED = os.getenv("LOCATION_BUFFER_ENABLED", "False") == "True"
+LOCATION_BUFFER_FLUSH_SECONDS = float(os.getenv("LOCATION_BUFFER_FLUSH_SECONDS", "5"))
+LOCATION_BUFFER_MAX_PENDING = int(os.getenv("LOCATION_BUFFER_MAX_PENDING", "1000"))
+
+
+# Ride trails. Every location ping is appended to the ride's history as a
+# new delta-encoded chunk; once a ride has RIDE_TRAIL_COMPACT_ROWS chunks of
+# fewer than RIDE_TRAIL_CHUNK_POINTS points, a task merges them.
+RIDE_TRAIL_ENABLED = os.getenv("RIDE_TRAIL_ENABLED", "True") == "True"
+RIDE_TRAIL_CHUNK_POINTS = int(os.getenv("RIDE_TRAIL_CHUNK_POINTS", "500"))
+RIDE_TRAIL_COMPACT_ROWS = int(os.getenv("RIDE_TRAIL_COMPACT_ROWS", "32"))
+
+# Trails of completed rides are simplified to within
+# RIDE_TRAIL_SIMPLIFY_TOLERANCE_METERS of the raw track. METHOD is
+# "douglas_peucker" or "thin"; thinning also drops points less than
+# RIDE_TRAIL_SIMPLIFY_MIN_INTERVAL_SECONDS apart.
+RIDE_TRAIL_SIMPLIFY_ON_COMPLETE = os.getenv("RIDE_TRAIL_SIMPLIFY_ON_COMPLETE", "True") == "True"
+RIDE_TRAIL_SIMPLIFY_METHOD = os.getenv("RIDE_TRAIL_SIMPLIFY_METHOD", "douglas_peucker")
+RIDE_TRAIL_SIMPLIFY_TOLERANCE_METERS = float(os.getenv("RIDE_TRAIL_SIMPLIFY_TOLERANCE_METERS", "5"))
+RIDE_TRAIL_SIMPLIFY_MIN_INTERVAL_SECONDS = int(os.getenv("RIDE_TRAIL_SIMPLIFY_MIN_INTERVAL_SECONDS", "0"))
+
+# Ride movement simulator. Due simulations are advanced every
+# SIMULATION_TICK_SECONDS, SIMULATION_BATCH_SIZE rides per bulk write.
+SIMULATION_TICK_SECONDS = float(os.getenv("SIMULATION_TICK_SECONDS", "1"))
+SIMULATION_BATCH_SIZE = int(os.getenv("SIMULATION_BATCH_SIZE", "2000"))
+SIMULATION_STEPS = int(os.getenv("SIMULATION_STEPS", "5"))
+SIMULATION_STEP_SECONDS = float(os.getenv("SIMULATION_STEP_SECONDS", "5"))
+SIMULATION_SPEED_MPS = float(os.getenv("SIMULATION_SPEED_MPS", "3"))
+# A ride's simulation lease outlives its expected run time by this much.
+SIMULATION_LEASE_MARGIN_SECONDS = float(os.getenv("SIMULATION_LEASE_MARGIN_SECONDS", "30"))
+
+# Live ride tracking. RIDE_EVENTS_BACKEND=rides.events.RedisBroker fans events
+# out across processes; the default LocalBroker only reaches streams served
+# by the process that made the write. Each stream buffers at most
+# RIDE_EVENTS_MAX_QUEUE events and drops the oldest when a client lags.
+RIDE_EVENTS = {
+    "BACKEND": os.getenv("RIDE_EVENTS_BACKEND", "rides.events.LocalBroker"),
+    "OPTIONS": {
+        "max_queue": int(os.getenv("RIDE_EVENTS_MAX_QUEUE", "100")),
+    },
+}
+RIDE_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("RIDE_EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Ride listing pages (keyset pagination)
+RIDES_PAGE_SIZE = int(os.getenv("RIDES_PAGE_SIZE", "50"))
+RIDES_MAX_PAGE_SIZE = int(os.getenv("RIDES_MAX_PAGE_SIZE", "200"))
+
+# JSON encoder for API responses: "orjson" (falls back to "json" when orjson is not installed)
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson")
+
+# Ride-detail payload cache and ETag versions (see rides.detail_cache)
+RIDE_DETAIL_CACHE_ENABLED = os.getenv("RIDE_DETAIL_CACHE_ENABLED", "True") == "True"
+RIDE_DETAIL_CACHE_ALIAS = os.getenv("RIDE_DETAIL_CACHE_ALIAS", "default")
+RIDE_DETAIL_CACHE_TTL = int(os.getenv("RIDE_DETAIL_CACHE_TTL", "300"))
+
+# Process counters (simulation dispatch dedup, geocode cache hits) are added
+# to the shared cache this often; `manage.py show_stats` reads the totals.
+METRICS_PUBLISH_SECONDS = float(os.getenv("METRICS_PUBLISH_SECONDS", "10"))
@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+from utils.metrics import SharedCounters, rate
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+        }
+
+
+class TwoLevelCache:
+    """In-process ``TTLCache`` in front of a shared Django cache.
+
+    Lookups try the local LRU first, then the shared store, and promote shared
+    hits into the local level. The shared store is treated as best-effort: if
+    it is unreachable the cache keeps working from the local level alone.
+
+    ``None`` is a valid cached value, so callers can store negative results;
+    misses are reported with the ``MISSING`` sentinel. ``aget``/``aset`` are
+    the same operations for async callers.
+
+    ``stats`` covers this process; hits and misses are also published to the
+    shared cache (see ``utils.metrics.SharedCounters``) and ``shared_stats``
+    sums them over every process.
+    """
+
+    def __init__(self, prefix, maxsize=1024, ttl=300, negative_ttl=None, alias="default"):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.alias = alias
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.counters = SharedCounters(f"{prefix}-cache", ("local_hits", "shared_hits", "misses"), alias=alias)
+
+    def _shared_key(self, key):
+        digest = hashlib.sha1(str(key).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def get(self, key):
+        value = self.local.get(key, MISSING)
+        if value is not MISSING:
+            self.counters.incr("local_hits")
+            return value
+        try:
+            value = caches[self.alias].get(self._shared_key(key), MISSING)
+        except Exception:
+            self.shared_errors += 1
+            logger.warning("Shared cache lookup failed for %s", self.prefix, exc_info=True)
+            value = MISSING
+        return self._shared_result(key, value)
+
+    def set(self, key, value):
+        ttl = self._ttl_for(value)
+        self.local.set(key, value, ttl=ttl)
+        try:
+            caches[self.alias].set(self._shared_key(key), value, timeout=ttl)
+        except Exception:
+            self.shared_errors += 1
+            logger.warning("Shared cache write failed for %s", self.prefix, exc_info=True)
+
+    async def aget(self, key):
+        value = self.local.get(key, MISSING)
+        if value is not MISSING:
+            self.counters.incr("local_hits")
+            return value
+        try:
+            value = await caches[self.alias].aget(self._shared_key(key), MISSING)
+        except Exception:
+            self.shared_errors += 1
+            logger.warning("Shared cache lookup failed for %s", self.prefix, exc_info=True)
+            value = MISSING
+        return self._shared_result(key, value)
+
+    def _shared_result(self, key, value):
+        if value is MISSING:
+            self.counters.incr("misses")
+        else:
+            self.shared_hits += 1
+            self.counters.incr("shared_hits")
+            self.local.set(key, value, ttl=self._ttl_for(value))
+        return value
+
+    async def aset(self, key, value):
+        ttl = self._ttl_for(value)
+        self.local.set(key, value, ttl=ttl)
+        try:
+            await caches[self.alias].aset(self._shared_key(key), value, timeout=ttl)
+        except Exception:
+            self.shared_errors += 1
+            logger.warning("Shared cache write failed for %s", self.prefix, exc_info=True)
+
+    def delete(self, key):
+        self.local.delete(key)
+        try:
+            caches[self.alias].delete(self._shared_key(key))
+        except Exception:
+            self.shared_errors += 1
+
+    def _ttl_for(self, value):
+        return self.negative_ttl if value is None else self.ttl
+
+    def stats(self):
+        local = self.local.stats()
+        return {
+            "hits": local["hits"] + self.shared_hits,
+            "local_hits": local["hits"],
+            "shared_hits": self.shared_hits,
+            "misses": local["misses"] - self.shared_hits,
+            "shared_errors": self.shared_errors,
+            "evictions": local["evictions"],
+            "local_size": local["size"],
+        }
+
+    def shared_stats(self):
+        """Returns the hits and misses of every process, published so far."""
+        counts = self.counters.totals()
+        hits = counts["local_hits"] + counts["shared_hits"]
+        return {**counts, "hits": hits, "hit_rate": rate(hits, counts["misses"])}
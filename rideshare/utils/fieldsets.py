@@ -0,0 +1,112 @@
+"""Sparse fieldsets: ``?fields=status,current_latitude`` on an endpoint.
+
+``SparseFieldsMixin`` trims a serializer's output to the requested fields.
+``SparseFieldsetMixin`` parses the parameter in a view, hands it to the
+serializer and narrows the queryset with ``.only()`` so the columns left out
+are never read. Relations are joined with ``select_related`` only when a
+nested serializer of the requested fields needs them, since Django refuses to
+defer a relation it is also asked to follow.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import BaseSerializer
+
+
+def parse_fields(value):
+    """Returns the field names of a comma separated ``fields`` value, or None."""
+    if not value:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    return list(dict.fromkeys(names)) or None
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def projection(model, serializer, fields):
+    """Works out what to load to serialize ``fields``.
+
+    Args:
+        model: The model of the serialized instances.
+        serializer (Serializer): An instance of the serializer.
+        fields (list): Names of serializer fields.
+
+    Returns:
+        tuple: ``(only, related)``, the ``.only()`` paths and the relations to
+        ``select_related``, or None when a field is not backed by a plain
+        column (a method, a property, ``source='*'``) and the whole row must
+        be loaded.
+    """
+    only, related = [], []
+    for name in fields:
+        field = serializer.fields[name]
+        source = field.source.split('.')[0]
+        model_field = _model_field(model, source)
+        if model_field is None or (model_field.is_relation and not model_field.concrete):
+            return None
+        if not isinstance(field, BaseSerializer):
+            only.append(source)
+            continue
+        nested = projection(model_field.related_model, field, list(field.fields))
+        if nested is None:
+            only.append(source)
+        else:
+            only.extend(f"{source}__{path}" for path in nested[0])
+        related.append(source)
+    return only, related
+
+
+class SparseFieldsMixin:
+    """Serializer mixin keeping only the fields listed in ``context['fields']``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """View mixin adding the ``fields`` query parameter.
+
+    Unknown field names are rejected with a 400. ``always_fetch`` lists
+    model fields that are loaded even when not requested, e.g. the ones
+    pagination reads.
+    """
+
+    fields_query_param = 'fields'
+    always_fetch = ('id',)
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            fields = parse_fields(self.request.query_params.get(self.fields_query_param))
+            if fields:
+                unknown = [name for name in fields if name not in self.get_serializer_class()().fields]
+                if unknown:
+                    raise ValidationError({self.fields_query_param: f"Unknown fields: {', '.join(unknown)}."})
+            self._sparse_fields = fields
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if not fields:
+            return queryset
+        plan = projection(queryset.model, self.get_serializer_class()(), fields)
+        if plan is None:
+            return queryset
+        only, related = plan
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*self.always_fetch, *only)
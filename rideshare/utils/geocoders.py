@@ -0,0 +1,233 @@
+import asyncio
+import mmap
+import os
+import time
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from utils.http import get_http_client
+from utils.spatial import GridIndex
+
+
+class GeocoderError(Exception):
+    """Raised when a geocoder backend cannot answer, as opposed to finding nothing."""
+
+
+def normalize_address(address):
+    return " ".join((address or "").lower().split())
+
+
+class BaseGeocoder:
+    """Interface every geocoder backend implements.
+
+    ``geocode`` returns a ``(lat, lon)`` tuple and ``reverse`` returns an
+    address string; both return None when the place is unknown and raise
+    ``GeocoderError`` when the backend itself fails. ``ageocode`` and
+    ``areverse`` are the asyncio entry points; by default they run the
+    blocking methods in a worker thread.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    def geocode(self, address):
+        raise NotImplementedError
+
+    def reverse(self, lat, lon):
+        raise NotImplementedError
+
+    async def ageocode(self, address):
+        return await asyncio.to_thread(self.geocode, address)
+
+    async def areverse(self, lat, lon):
+        return await asyncio.to_thread(self.reverse, lat, lon)
+
+
+class NominatimGeocoder(BaseGeocoder):
+    def __init__(self, base_url="https://nominatim.openstreetmap.org",
+                 user_agent="RideShare/1.0 (pranavsuresh114@gmail.com)", timeout=5, **options):
+        super().__init__(**options)
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"User-Agent": user_agent}  # REQUIRED by the Nominatim usage policy
+        self.timeout = timeout
+
+    @property
+    def client(self):
+        return get_http_client()
+
+    def _request(self, path, params):
+        return (
+            f"{self.base_url}/{path}",
+            {"params": {**params, "format": "json"}, "headers": self.headers, "timeout": self.timeout},
+        )
+
+    def _parse(self, response):
+        if response.status_code != 200:
+            raise GeocoderError(f"Nominatim returned {response.status_code}")
+        return response.json()
+
+    def _get(self, path, params):
+        url, kwargs = self._request(path, params)
+        try:
+            return self._parse(self.client.get(url, **kwargs))
+        except requests.RequestException as e:
+            raise GeocoderError(str(e)) from e
+
+    async def _aget(self, path, params):
+        url, kwargs = self._request(path, params)
+        try:
+            return self._parse(await self.client.aget(url, **kwargs))
+        except requests.RequestException as e:
+            raise GeocoderError(str(e)) from e
+
+    @staticmethod
+    def _first_point(data):
+        if data:
+            return float(data[0]["lat"]), float(data[0]["lon"])
+        return None
+
+    def geocode(self, address):
+        return self._first_point(self._get("search", {"q": address, "limit": 1}))
+
+    def reverse(self, lat, lon):
+        return self._get("reverse", {"lat": lat, "lon": lon}).get("display_name")
+
+    async def ageocode(self, address):
+        return self._first_point(await self._aget("search", {"q": address, "limit": 1}))
+
+    async def areverse(self, lat, lon):
+        return (await self._aget("reverse", {"lat": lat, "lon": lon})).get("display_name")
+
+
+class OfflineGeocoder(BaseGeocoder):
+    """Answers geocoding queries from a local gazetteer file.
+
+    The gazetteer is a UTF-8 text file with one ``lat<TAB>lon<TAB>name`` entry
+    per line; blank lines and lines starting with ``#`` are ignored. The file
+    is memory-mapped and only byte offsets and coordinates are held in the
+    in-memory indexes, so names are paged in from the file on demand.
+
+    Forward lookups match the normalized name exactly. Reverse lookups return
+    the nearest entry within ``max_distance_km``.
+    """
+
+    def __init__(self, path=None, max_distance_km=1.0, cell_size_km=0.5, **options):
+        super().__init__(**options)
+        if not path:
+            raise ImproperlyConfigured("OfflineGeocoder requires a gazetteer path.")
+        self.max_distance_km = max_distance_km
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = b""
+        self._names = {}
+        self._points = GridIndex(cell_size_km=cell_size_km)
+        self._load()
+
+    def __len__(self):
+        return len(self._points)
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def _load(self):
+        offset = 0
+        size = len(self._map)
+        while offset < size:
+            end = self._map.find(b"\n", offset)
+            if end == -1:
+                end = size
+            line = self._map[offset:end].strip()
+            if line and not line.startswith(b"#"):
+                lat, lon, name = line.decode("utf-8").split("\t", 2)
+                self._names.setdefault(normalize_address(name), offset)
+                self._points.update(offset, float(lat), float(lon))
+            offset = end + 1
+
+    def _entry(self, offset):
+        end = self._map.find(b"\n", offset)
+        line = self._map[offset:end if end != -1 else len(self._map)].strip()
+        lat, lon, name = line.decode("utf-8").split("\t", 2)
+        return float(lat), float(lon), name
+
+    def geocode(self, address):
+        offset = self._names.get(normalize_address(address))
+        if offset is None:
+            return None
+        lat, lon, _ = self._entry(offset)
+        return lat, lon
+
+    def reverse(self, lat, lon):
+        from utils.helpers import haversine_many
+
+        candidates = self._points.query(lat, lon, self.max_distance_km)
+        if not candidates:
+            return None
+        distances = haversine_many(
+            lat, lon,
+            [c_lat for _, c_lat, _ in candidates],
+            [c_lon for _, _, c_lon in candidates],
+        )
+        nearest = int(distances.argmin())
+        if distances[nearest] > self.max_distance_km:
+            return None
+        return self._entry(candidates[nearest][0])[2]
+
+
+class StubGeocoder(BaseGeocoder):
+    """Answers every lookup with fixed values after ``latency`` seconds.
+
+    For benchmarks and local development: it stands in for a remote geocoder
+    without network access. ``ageocode``/``areverse`` wait with
+    ``asyncio.sleep`` rather than holding a thread.
+    """
+
+    def __init__(self, latitude=12.9716, longitude=77.5946, address="Stub Street", latency=0.0, **options):
+        super().__init__(**options)
+        self.result = (latitude, longitude)
+        self.address = address
+        self.latency = latency
+
+    def geocode(self, address):
+        time.sleep(self.latency)
+        return self.result
+
+    def reverse(self, lat, lon):
+        time.sleep(self.latency)
+        return self.address
+
+    async def ageocode(self, address):
+        await asyncio.sleep(self.latency)
+        return self.result
+
+    async def areverse(self, lat, lon):
+        await asyncio.sleep(self.latency)
+        return self.address
+
+
+_geocoder = None
+
+
+def get_geocoder():
+    """Returns the geocoder configured by the ``GEOCODER`` setting."""
+    global _geocoder
+    if _geocoder is None:
+        config = getattr(settings, "GEOCODER", {})
+        backend = import_string(config.get("BACKEND", "utils.geocoders.NominatimGeocoder"))
+        _geocoder = backend(**config.get("OPTIONS", {}))
+    return _geocoder
+
+
+@receiver(setting_changed)
+def reset_geocoder(setting, **kwargs):
+    global _geocoder
+    if setting == "GEOCODER":
+        _geocoder = None
@@ -1,11 +1,21 @@
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import status
-import requests
+from rides.events import publish_rides
 from rides.models import Rides
-from rides.tasks import simulate_ride_movement
+from rides.tasks import dispatch_ride_simulation, schedule_address_refresh
+from rides.location_buffer import buffering_enabled, location_buffer
+from rides.trail import append_trail_points, append_trails, trail_enabled
 from authentication.models import Profile
 from utils.constants import DRIVER
-from math import radians, cos, sin, sqrt, atan2
+from utils.spatial import bounding_box, driver_index
+from utils.cache import MISSING, TwoLevelCache
+from utils.geocoders import GeocoderError, get_geocoder, normalize_address
+from utils.renderers import JSONResponse
+from math import radians, cos, sin, sqrt, atan2, isfinite
+import numpy as np
 
 
 def success_response(data=None, success_message="Success", status=status.HTTP_200_OK):
@@ -17,12 +27,12 @@ def success_response(data=None, success_message="Success", status=status.HTTP_20
         status (int, optional): The HTTP status code. Defaults to status.HTTP_200_OK.
 
     Returns:
-        JsonResponse: A JSON response with a success message and optional data.
+        JSONResponse: A JSON response with a success message and optional data.
     """
     response_data = {"message": success_message, "results": {}}
     if data is not None:
         response_data["results"]["data"] = data
-    return JsonResponse(response_data, status=status)
+    return JSONResponse(response_data, status=status)
 
 
 def error_response(
@@ -40,77 +50,357 @@ def error_response(
         exception_info (str, optional): Additional exception information. Defaults to None.
 
     Returns:
-        JsonResponse: A JSON response with the error message, errors, and optional exception info.
+        JSONResponse: A JSON response with the error message, errors, and optional exception info.
     """
     response_data = {
         "message": error_message,
         "errors": errors,
         "exception_info": exception_info,
     }
-    return JsonResponse(response_data, status=status)
+    return JSONResponse(response_data, status=status)
 
 def update_location(ride_id, lat, lon):
-    ride = Rides.objects.get(id=ride_id)
-    ride.current_latitude = lat
-    ride.current_longitude = lon
-
-    # Get address from Nominatim
-    url = 'https://nominatim.openstreetmap.org/reverse'
-    params = {
-        'lat': lat,
-        'lon': lon,
-        'format': 'json'
-    }
-    headers = {
-        'User-Agent': 'RideShare/1.0 (pranavsuresh114@gmail.com)'  # REQUIRED
-    }
-    response = requests.get(url, params=params, headers=headers)
-    
-    if response.status_code == 200:
-        data = response.json()
-        ride.current_location_address = data.get('display_name')
-
-    ride.save()
+    if buffering_enabled():
+        # Positions are written in batches by the location buffer, which
+        # also queues the address refresh once they reach the database.
+        ride = Rides.objects.only('id', 'status').get(id=ride_id)
+        location_buffer.put(ride.id, lat, lon)
+    else:
+        ride = _save_location(ride_id, lat, lon)
 
     # If status is 'started', simulate movement using Celery
     if ride.status == 'Started':
-        simulate_ride_movement.delay(ride_id)
+        dispatch_ride_simulation(ride_id)
+
+
+async def aupdate_location(ride_id, lat, lon):
+    """Async version of ``update_location``."""
+    if buffering_enabled():
+        ride = await Rides.objects.only('id', 'status').aget(id=ride_id)
+        location_buffer.put(ride.id, lat, lon)
+    else:
+        # one thread, so the position and trail writes share a transaction
+        ride = await sync_to_async(_save_location)(ride_id, lat, lon)
+
+    if ride.status == 'Started':
+        await sync_to_async(dispatch_ride_simulation)(ride_id)
+
+
+def _save_location(ride_id, lat, lon):
+    with transaction.atomic():
+        ride = Rides.objects.get(id=ride_id)
+        ride.current_latitude = lat
+        ride.current_longitude = lon
+        # A ping repeating the stored position is still a ping: name the
+        # fields so the dirty-field check cannot skip the write, and
+        # updated_at, post_save and the ride event all move with it.
+        ride.save(update_fields=['current_latitude', 'current_longitude', 'updated_at'])
+
+        # The trail point is recorded and the street address is resolved by a
+        # background task so the request does not wait on Nominatim.
+        _after_location_saved(ride)
+    return ride
+
+
+def _after_location_saved(ride):
+    if trail_enabled():
+        append_trail_points(ride.id, [(ride.current_latitude, ride.current_longitude, timezone.now())])
+    schedule_address_refresh(ride.id)
+
+
+def bulk_update_locations(points, rides=None):
+    """Applies a batch of location pings with a single ``bulk_update``.
+
+    Only the latest ping per ride becomes its current position: the one with
+    the newest ``timestamp``, or the last one in the batch when timestamps are
+    missing. It is skipped when it is older than the ride's ``updated_at``,
+    so a delayed batch cannot overwrite a newer position; the ride's
+    ``updated_at`` becomes the ping's timestamp (pings without one, and ones
+    from the future, count as received now). Every ping is added to the
+    ride's trail.
+
+    Args:
+        points (list): Dicts with ``ride_id``, ``latitude``, ``longitude`` and
+            an optional ``timestamp``.
+        rides (QuerySet, optional): Rides the pings may update. Defaults to
+            all rides.
+
+    Returns:
+        list: The rides the pings were accepted for.
+    """
+    now = timezone.now()
+    latest = {}
+    trails = {}
+    for index, point in enumerate(points):
+        order = (point.get('timestamp') is not None, point.get('timestamp') or index, index)
+        current = latest.get(point['ride_id'])
+        if current is None or order >= current[0]:
+            latest[point['ride_id']] = (order, point)
+        recorded_at = point.get('timestamp') or now
+        trails.setdefault(point['ride_id'], []).append(
+            ((recorded_at, index), (point['latitude'], point['longitude'], recorded_at))
+        )
+
+    def position(ride):
+        point = latest[ride.id][1]
+        return point['latitude'], point['longitude'], min(point.get('timestamp') or now, now)
+
+    if rides is None:
+        rides = Rides.objects.all()
+    rides = rides.filter(id__in=latest.keys()).only('id', 'updated_at').order_by('id')
+    if buffering_enabled():
+        for ride in rides:
+            lat, lon, at = position(ride)
+            stale = ride.updated_at is not None and at < ride.updated_at
+            location_buffer.put(ride.id, None if stale else lat, lon,
+                                trail=[entry for _, entry in sorted(trails[ride.id])], recorded_at=at)
+        return list(rides)
+
+    with transaction.atomic():
+        # Locked so that no newer position lands between the check and the write.
+        accepted = list(rides.select_for_update())
+        moved = []
+        for ride in accepted:
+            lat, lon, at = position(ride)
+            if ride.updated_at is not None and at < ride.updated_at:
+                continue
+            ride.current_latitude, ride.current_longitude, ride.updated_at = lat, lon, at
+            moved.append(ride)
+        Rides.objects.bulk_update(moved, ['current_latitude', 'current_longitude', 'updated_at'])
+        publish_rides(moved, ['current_latitude', 'current_longitude', 'updated_at'])
+
+        if trail_enabled():
+            append_trails({ride.id: [entry for _, entry in sorted(trails[ride.id])] for ride in accepted})
+
+        for ride in moved:
+            schedule_address_refresh(ride.id)
+    return accepted
+
+
+reverse_geocode_cache = TwoLevelCache(
+    "reverse-geocode",
+    maxsize=getattr(settings, 'REVERSE_GEOCODE_CACHE_SIZE', 50000),
+    ttl=getattr(settings, 'REVERSE_GEOCODE_CACHE_TTL', 60 * 60 * 24),
+    negative_ttl=getattr(settings, 'GEOCODE_NEGATIVE_CACHE_TTL', 60 * 60),
+)
+
+
+def quantize_coordinates(lat, lon, precision=None):
+    """Snaps a coordinate to the nearest point of a fixed decimal grid.
+
+    With the default precision of 4 decimal places a cell is about 11 m
+    across, so consecutive GPS pings on the same street share a cell.
+    """
+    if precision is None:
+        precision = getattr(settings, 'REVERSE_GEOCODE_CELL_PRECISION', 4)
+    return round(lat, precision), round(lon, precision)
+
+
+def reverse_geocode(lat, lon):
+    """Returns the street address for a coordinate, or None if unknown.
+
+    Results are cached per quantized cell, so any point inside a cell that was
+    already resolved reuses its address without calling Nominatim.
+    """
+    cell = quantize_coordinates(lat, lon)
+    cached = reverse_geocode_cache.get(cell)
+    if cached is not MISSING:
+        return cached
+
+    try:
+        address = get_geocoder().reverse(lat, lon)
+    except GeocoderError:
+        return None
+    reverse_geocode_cache.set(cell, address)
+    return address
+
+
+geocode_cache = TwoLevelCache(
+    "geocode",
+    maxsize=getattr(settings, 'GEOCODE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'GEOCODE_CACHE_TTL', 60 * 60 * 24),
+    negative_ttl=getattr(settings, 'GEOCODE_NEGATIVE_CACHE_TTL', 60 * 60),
+)
 
 
 def geocode_location(address):
-    url = 'https://nominatim.openstreetmap.org/search'
-    params = {
-        'q': address,
-        'format': 'json',
-        'limit': 1
-    }
-    response = requests.get(url, params=params, headers={'User-Agent': 'rideshare-app'})
-    data = response.json()
-    if data:
-        return float(data[0]['lat']), float(data[0]['lon'])
-    return None, None
+    key = normalize_address(address)
+    if not key:
+        return None, None
+
+    cached = geocode_cache.get(key)
+    if cached is not MISSING:
+        return cached if cached is not None else (None, None)
+
+    try:
+        result = get_geocoder().geocode(address)
+    except GeocoderError:
+        return None, None
+    geocode_cache.set(key, result)
+    if result is None:
+        return None, None
+    return result
+
+
+async def ageocode_location(address):
+    """Async version of ``geocode_location``."""
+    key = normalize_address(address)
+    if not key:
+        return None, None
+
+    cached = await geocode_cache.aget(key)
+    if cached is not MISSING:
+        return cached if cached is not None else (None, None)
+
+    try:
+        result = await get_geocoder().ageocode(address)
+    except GeocoderError:
+        return None, None
+    await geocode_cache.aset(key, result)
+    if result is None:
+        return None, None
+    return result
+
+
+RIDE_POINTS = ('pickup', 'dropoff')
+
+
+def geocode_ride_points(values):
+    """Geocodes the pickup and dropoff addresses that have no coordinates yet.
+
+    Args:
+        values (dict): Ride field values, e.g. serializer ``validated_data``.
+
+    Returns:
+        dict: ``<point>_latitude``/``<point>_longitude`` values for every point
+        that was missing coordinates and could be geocoded.
+    """
+    coordinates = {}
+    for point in RIDE_POINTS:
+        lat_field, lon_field = f'{point}_latitude', f'{point}_longitude'
+        address = values.get(f'{point}_location')
+        if not address or (values.get(lat_field) is not None and values.get(lon_field) is not None):
+            continue
+        lat, lon = geocode_location(address)
+        if lat is not None:
+            coordinates[lat_field] = lat
+            coordinates[lon_field] = lon
+    return coordinates
+
+
+def pickup_coordinates(ride):
+    """Returns the ride's stored pickup coordinates, geocoding and storing them if missing."""
+    if ride.pickup_latitude is None or ride.pickup_longitude is None:
+        lat, lon = geocode_location(ride.pickup_location)
+        if lat is None:
+            return None, None
+        ride.pickup_latitude, ride.pickup_longitude = lat, lon
+        ride.save(update_fields=['pickup_latitude', 'pickup_longitude', 'updated_at'])
+    return ride.pickup_latitude, ride.pickup_longitude
+
+
+async def apickup_coordinates(ride):
+    """Async version of ``pickup_coordinates``."""
+    if ride.pickup_latitude is None or ride.pickup_longitude is None:
+        lat, lon = await ageocode_location(ride.pickup_location)
+        if lat is None:
+            return None, None
+        ride.pickup_latitude, ride.pickup_longitude = lat, lon
+        await ride.asave(update_fields=['pickup_latitude', 'pickup_longitude', 'updated_at'])
+    return ride.pickup_latitude, ride.pickup_longitude
 
 
 def find_nearest_driver(pickup_location, radius_km=5):
+    nearest = find_nearest_drivers(pickup_location, k=1, radius_km=radius_km, max_radius_km=radius_km)
+    if not nearest:
+        return None
+    return nearest[0][1]
+
+
+def find_nearest_drivers(pickup_location, k=5, radius_km=5, step_km=None, max_radius_km=20):
+    """Returns up to ``k`` drivers closest to a pickup location.
+
+    Args:
+        pickup_location (str): Address to geocode as the search origin.
+        k (int, optional): Number of drivers wanted. Defaults to 5.
+        radius_km (float, optional): Initial search radius. Defaults to 5.
+        step_km (float, optional): Radius increment when fewer than ``k``
+            drivers are found. Defaults to ``radius_km``.
+        max_radius_km (float, optional): Radius the search never goes past.
+            Defaults to 20.
+
+    Returns:
+        list: ``(distance_km, Profile)`` tuples ordered by distance.
+    """
     lat, lon = geocode_location(pickup_location)
     if lat is None:
-        return None
+        return []
+    return nearest_drivers_to(lat, lon, k, radius_km, step_km, max_radius_km)
+
 
-    candidates = Profile.objects.filter(
+def nearest_drivers_to(lat, lon, k=5, radius_km=5, step_km=None, max_radius_km=20):
+    """Returns up to ``k`` drivers closest to a coordinate, see ``find_nearest_drivers``.
+
+    Raises:
+        ValueError: If ``radius_km`` or ``max_radius_km`` is not a positive,
+            finite number.
+    """
+    # NaN slips past every comparison below and would keep widening forever
+    if not (isfinite(radius_km) and isfinite(max_radius_km) and radius_km > 0 and max_radius_km > 0):
+        raise ValueError("radius_km and max_radius_km must be positive, finite numbers.")
+    if not (step_km and isfinite(step_km) and step_km > 0):
+        step_km = radius_km
+    radius_km = min(radius_km, max_radius_km)
+
+    # Walk the index ring by ring. Cells already scanned at a smaller radius
+    # are kept, so widening the radius only pays for the newly added cells.
+    rings = driver_index.rings(lat, lon, max_radius_km)
+    ids, distances = [], np.empty(0)
+    covered_km = -1
+    while True:
+        while covered_km < radius_km:
+            try:
+                covered_km, points = next(rings)
+            except StopIteration:
+                covered_km = max_radius_km
+                break
+            if points:
+                ids.extend(key for key, _, _ in points)
+                distances = np.concatenate([distances, haversine_many(
+                    lat, lon,
+                    [p_lat for _, p_lat, _ in points],
+                    [p_lon for _, _, p_lon in points],
+                )])
+        if radius_km >= max_radius_km or np.count_nonzero(distances <= radius_km) >= k:
+            break
+        radius_km = min(radius_km + step_km, max_radius_km)
+
+    in_radius = [driver_id for driver_id, dist in zip(ids, distances) if dist <= radius_km]
+    if not in_radius:
+        return []
+
+    # The index only narrows the search down to nearby cells; distances are
+    # checked against the database rows in case the index is stale.
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    candidates = list(Profile.objects.filter(
+        id__in=in_radius,
         user_type=DRIVER,
-        latitude__isnull=False,
-        longitude__isnull=False
-    )
-    nearby = []
-    for d in candidates:
-        dist = haversine(lat, lon, d.latitude, d.longitude)
-        if dist <= radius_km:
-            nearby.append((dist, d))
-    if not nearby:
-        return None
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lon, max_lon)
+    ))
+    if not candidates:
+        return []
 
-    nearby.sort(key=lambda x: x[0])
-    return nearby[0][1]
+    distances = haversine_many(
+        lat, lon,
+        [d.latitude for d in candidates],
+        [d.longitude for d in candidates],
+    )
+    order = np.argsort(distances, kind='stable')
+    return [
+        (float(distances[i]), candidates[i])
+        for i in order[:k] if distances[i] <= radius_km
+    ]
 
 
 def haversine(lat1, lon1, lat2, lon2):
@@ -120,4 +410,49 @@ def haversine(lat1, lon1, lat2, lon2):
     dlon = radians(lon2 - lon1)
     a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
\ No newline at end of file
+    return R * c
+
+
+def haversine_many(lat, lon, lats, lons):
+    """Returns distances in kilometers from one point to many points.
+
+    Vectorized counterpart of ``haversine`` for scoring large candidate sets
+    in a single call.
+
+    Args:
+        lat (float): Latitude of the origin.
+        lon (float): Longitude of the origin.
+        lats (array-like): Latitudes of the destinations.
+        lons (array-like): Longitudes of the destinations.
+
+    Returns:
+        numpy.ndarray: Distances with the same shape as ``lats``.
+    """
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_matrix(lats1, lons1, lats2, lons2):
+    """Returns the pairwise distance matrix in kilometers between two point sets.
+
+    Args:
+        lats1 (array-like): Latitudes of the row points.
+        lons1 (array-like): Longitudes of the row points.
+        lats2 (array-like): Latitudes of the column points.
+        lons2 (array-like): Longitudes of the column points.
+
+    Returns:
+        numpy.ndarray: Matrix of shape ``(len(lats1), len(lats2))``.
+    """
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    lon1 = np.asarray(lons1, dtype=np.float64)[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    lon2 = np.asarray(lons2, dtype=np.float64)[None, :]
+    dlat = lat2 - lat1
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
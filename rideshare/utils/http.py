@@ -0,0 +1,305 @@
+import asyncio
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network while a host's circuit is open."""
+
+
+class ConcurrencyLimitError(requests.Timeout):
+    """Raised when no request slot frees up before the call's deadline."""
+
+
+class CircuitBreaker:
+    """Fails fast once an upstream keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    every call is rejected for ``reset_timeout`` seconds. Then a single trial
+    call is let through: success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_aborted(self):
+        """Records a call that was let through but never reached the host.
+
+        A half-open breaker goes back to open without restarting the reset
+        timeout, so the next call becomes the trial.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+
+class OutboundClient:
+    """Pooled HTTP client for calls to third-party services.
+
+    Connections are kept alive in a per-host pool, requests are retried on
+    connection errors, timeouts and 502/503/504 responses, at most
+    ``max_concurrency`` requests are in flight at once, and each host has its
+    own ``CircuitBreaker``. Every call gets a deadline covering the wait for a
+    slot, every attempt and the backoff between them.
+
+    ``get`` is the blocking entry point. ``aget`` sends the request with an
+    ``httpx.AsyncClient`` on the running event loop, so an awaiting call holds
+    no thread and one process can have many requests in flight. Each event
+    loop gets its own async client and ``max_concurrency`` slots; breakers are
+    shared with ``get``. Without httpx installed, ``aget`` runs ``get`` on a
+    worker thread instead.
+    """
+
+    retry_statuses = (502, 503, 504)
+
+    def __init__(self, pool_size=10, max_concurrency=10, timeout=5, retries=2, backoff=0.2,
+                 failure_threshold=5, reset_timeout=30):
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.session = requests.Session()
+        # Retries happen in get() so that they stay within the call's deadline.
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._breakers = {}
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def breaker(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def _allow(self, url):
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+        return breaker
+
+    @staticmethod
+    def _settle(breaker, response):
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def _backoff_delay(self, attempt, deadline):
+        """Returns the wait before the next attempt, or None when none is left or time is up."""
+        delay = self.backoff * (2 ** attempt)
+        if attempt >= self.retries or time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def get(self, url, timeout=None, **kwargs):
+        """Sends a GET request with a deadline of ``timeout`` seconds.
+
+        No attempt or backoff starts after the deadline, and each attempt's
+        connect and read timeouts are capped at the time left. requests
+        applies the read timeout per socket read, so a server that keeps
+        trickling bytes can still hold one attempt past the deadline.
+
+        Raises:
+            CircuitOpenError: The host's circuit is open.
+            ConcurrencyLimitError: No slot was free before the deadline.
+            requests.RequestException: The request itself failed.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        breaker = self._allow(url)
+
+        # Every exit from here must settle the breaker, or a half-open one
+        # would never let another call through.
+        try:
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise ConcurrencyLimitError("Timed out waiting for an outbound request slot")
+            try:
+                response = self._send(url, deadline, **kwargs)
+            finally:
+                self._slots.release()
+        except ConcurrencyLimitError:
+            breaker.record_aborted()
+            raise
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.record_aborted()
+            raise
+        return self._settle(breaker, response)
+
+    def _send(self, url, deadline, **kwargs):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ConcurrencyLimitError("Deadline expired before the request was sent")
+            try:
+                response = self.session.get(url, timeout=remaining, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._backoff_delay(attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                delay = None
+                if response.status_code in self.retry_statuses:
+                    delay = self._backoff_delay(attempt, deadline)
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def aget(self, url, timeout=None, **kwargs):
+        """Async version of ``get``.
+
+        The deadline is enforced around each whole attempt, so unlike ``get``
+        a trickling server cannot hold the call past it. Responses are
+        ``httpx.Response`` objects and transport errors are raised as the
+        matching ``requests`` exceptions.
+        """
+        if httpx is None:
+            return await asyncio.to_thread(self.get, url, timeout=timeout, **kwargs)
+
+        # Set up before the clock starts: the first call on a loop builds the
+        # client and its SSL context, which is not time spent waiting on the host.
+        client, slots = self._async_client()
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        breaker = self._allow(url)
+
+        try:
+            try:
+                async with asyncio.timeout(max(0.0, deadline - time.monotonic())):
+                    await slots.acquire()
+            except TimeoutError:
+                raise ConcurrencyLimitError("Timed out waiting for an outbound request slot") from None
+            try:
+                response = await self._asend(client, url, deadline, **kwargs)
+            finally:
+                slots.release()
+        except ConcurrencyLimitError:
+            breaker.record_aborted()
+            raise
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.record_aborted()
+            raise
+        return self._settle(breaker, response)
+
+    def _async_client(self):
+        # httpx connections belong to the loop that opened them.
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_clients:
+                self._async_clients[loop] = (
+                    httpx.AsyncClient(
+                        limits=httpx.Limits(max_connections=None, max_keepalive_connections=self.pool_size),
+                        follow_redirects=True,
+                    ),
+                    asyncio.Semaphore(self.max_concurrency),
+                )
+            return self._async_clients[loop]
+
+    async def _asend(self, client, url, deadline, **kwargs):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ConcurrencyLimitError("Deadline expired before the request was sent")
+            try:
+                async with asyncio.timeout(remaining):
+                    response = await client.get(url, timeout=remaining, **kwargs)
+            except (TimeoutError, httpx.TransportError) as e:
+                delay = self._backoff_delay(attempt, deadline)
+                if delay is None:
+                    if isinstance(e, (TimeoutError, httpx.TimeoutException)):
+                        raise requests.Timeout(str(e) or "Deadline expired") from e
+                    raise requests.ConnectionError(str(e)) from e
+            except httpx.HTTPError as e:
+                raise requests.RequestException(str(e)) from e
+            else:
+                delay = None
+                if response.status_code in self.retry_statuses:
+                    delay = self._backoff_delay(attempt, deadline)
+                if delay is None:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        """Closes the async client of the running event loop."""
+        with self._lock:
+            entry = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].aclose()
+
+
+_client = None
+
+
+def get_http_client():
+    """Returns the process-wide client configured by the ``OUTBOUND_HTTP`` setting."""
+    global _client
+    if _client is None:
+        _client = OutboundClient(**getattr(settings, "OUTBOUND_HTTP", {}))
+    return _client
+
+
+@receiver(setting_changed)
+def reset_http_client(setting, **kwargs):
+    global _client
+    if setting == "OUTBOUND_HTTP":
+        _client = None
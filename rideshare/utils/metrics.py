@@ -0,0 +1,79 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCounters:
+    """Counters summed over every process in a shared Django cache.
+
+    Increments are kept in memory and added to the shared cache with
+    ``cache.incr`` at most every ``publish_interval`` seconds, so hot paths
+    never wait on a round trip. Each publish also logs this process's totals.
+    Counts not yet published are lost if the process dies without exiting.
+
+    Args:
+        prefix (str): Namespace of the counters in the shared cache.
+        names (tuple): The counter names.
+        alias (str, optional): The Django cache to publish to.
+        publish_interval (float, optional): Seconds between publishes.
+            Defaults to the ``METRICS_PUBLISH_SECONDS`` setting.
+    """
+
+    def __init__(self, prefix, names, alias="default", publish_interval=None):
+        self.prefix = prefix
+        self.names = tuple(names)
+        self.alias = alias
+        if publish_interval is None:
+            publish_interval = getattr(settings, "METRICS_PUBLISH_SECONDS", 10)
+        self.publish_interval = publish_interval
+        self.local = dict.fromkeys(self.names, 0)
+        self._unpublished = dict.fromkeys(self.names, 0)
+        self._published_at = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.publish)
+
+    def _key(self, name):
+        return f"metrics:{self.prefix}:{name}"
+
+    def incr(self, name, delta=1):
+        with self._lock:
+            self.local[name] += delta
+            self._unpublished[name] += delta
+            due = time.monotonic() - self._published_at >= self.publish_interval
+        if due:
+            self.publish()
+
+    def publish(self):
+        """Adds the increments since the last publish to the shared counters."""
+        with self._lock:
+            deltas = {name: value for name, value in self._unpublished.items() if value}
+            self._unpublished = dict.fromkeys(self.names, 0)
+            self._published_at = time.monotonic()
+            local = dict(self.local)
+        if not deltas:
+            return
+        logger.info("%s: %s", self.prefix, " ".join(f"{name}={value}" for name, value in local.items()))
+        cache = caches[self.alias]
+        try:
+            for name, delta in deltas.items():
+                cache.add(self._key(name), 0, timeout=None)
+                cache.incr(self._key(name), delta)
+        except Exception:
+            logger.warning("Could not publish %s counters", self.prefix, exc_info=True)
+
+    def totals(self):
+        """Returns the shared counters of every process, published so far."""
+        values = caches[self.alias].get_many([self._key(name) for name in self.names])
+        return {name: values.get(self._key(name), 0) for name in self.names}
+
+
+def rate(part, *rest):
+    """Returns ``part`` as a fraction of ``part + sum(rest)``, 0.0 when both are zero."""
+    total = part + sum(rest)
+    return part / total if total else 0.0
@@ -26,6 +26,65 @@ class Model(models.Model):
     class Meta:
         abstract = True
 
+    # Saves of instances loaded from the database (or saved before) only
+    # write the columns that changed since, and skip the query entirely when
+    # nothing did. Values are compared with ==, so in-place changes to
+    # mutable values are not seen; pass update_fields for those.
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, fields=None):
+        if fields is None or not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (fields is None or field.attname in fields):
+                self._loaded_values[field.attname] = self.__dict__[field.attname]
+
+    def get_dirty_fields(self):
+        """Returns the attnames of loaded fields that changed since the last load or save."""
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            field.attname
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname])
+        ]
+
+    def save(self, *args, **kwargs):
+        tracked = (
+            hasattr(self, '_loaded_values')
+            and not self._state.adding
+            and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        )
+        if tracked:
+            dirty = [name for name in self.get_dirty_fields() if name != 'updated_at']
+            if not dirty:
+                return
+            kwargs['update_fields'] = dirty + ['updated_at']
+
+        super().save(*args, **kwargs)
+        self._snapshot(self._attnames(kwargs.get('update_fields')))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot(self._attnames(fields))
+
+    def _attnames(self, names):
+        if names is None:
+            return None
+        names = set(names)
+        return {
+            field.attname for field in self._meta.concrete_fields
+            if field.name in names or field.attname in names
+        }
+
     def set_inactive(self):
         self.is_active = False
         self.deleted = True
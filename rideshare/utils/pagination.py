@@ -0,0 +1,80 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over ``(created_at, id)``, newest first.
+
+    Each page is read with ``WHERE (created_at, id) < cursor ... LIMIT n``, so
+    it costs the same however deep the client pages, and rows inserted while
+    paging neither shift nor repeat entries. The response body stays a plain
+    list; the next page is advertised in a ``Link: <url>; rel="next"`` header
+    and the ``X-Next-Cursor`` header. Clients pass it back as ``?cursor=``
+    and may set ``?page_size=`` up to ``max_page_size``.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'RIDES_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'RIDES_MAX_PAGE_SIZE', 200)
+
+    def encode_cursor(self, instance):
+        raw = f"{instance.created_at.isoformat()}|{instance.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            created_at, pk = raw.rsplit("|", 1)
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            created_at = None
+        if created_at is None:
+            raise NotFound("Invalid cursor.")
+        return created_at, pk
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        # one extra row tells whether there is a next page
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = self.encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+        return page[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        headers = {}
+        if self.next_cursor is not None:
+            headers['Link'] = f'<{self.get_next_link()}>; rel="next"'
+            headers['X-Next-Cursor'] = self.next_cursor
+        return Response(data, headers=headers)
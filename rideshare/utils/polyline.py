@@ -0,0 +1,66 @@
+"""Delta/varint encoding of location tracks.
+
+Points are ``(lat, lon, t)`` triples, with ``t`` in whole seconds. Latitude and
+longitude are stored to 5 decimal places (about 1 m). Each value is written
+as the difference from the previous point using the Google encoded polyline
+scheme, so a typical ping costs only a few ASCII characters.
+"""
+
+COORDINATE_FACTOR = 10 ** 5
+
+
+def _encode_value(value, out):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def quantize(lat, lon, t):
+    return round(lat * COORDINATE_FACTOR), round(lon * COORDINATE_FACTOR), int(t)
+
+
+def encode(points, previous=(0, 0, 0)):
+    """Encodes points as deltas from ``previous``.
+
+    Args:
+        points (iterable): ``(lat, lon, t)`` triples.
+        previous (tuple, optional): Quantized ``(lat, lon, t)`` the first
+            point is relative to. Pass the last point of an existing encoding
+            to append to it.
+
+    Returns:
+        tuple: The encoded string and the quantized last point.
+    """
+    out = []
+    prev_lat, prev_lon, prev_t = previous
+    for point in points:
+        lat, lon, t = quantize(*point)
+        _encode_value(lat - prev_lat, out)
+        _encode_value(lon - prev_lon, out)
+        _encode_value(t - prev_t, out)
+        prev_lat, prev_lon, prev_t = lat, lon, t
+    return "".join(out), (prev_lat, prev_lon, prev_t)
+
+
+def decode(encoded):
+    """Yields the ``(lat, lon, t)`` triples of an encoded string."""
+    values = [0, 0, 0]
+    field = 0
+    index = 0
+    length = len(encoded)
+    while index < length:
+        result = shift = 0
+        while True:
+            byte = ord(encoded[index]) - 63
+            index += 1
+            result |= (byte & 0x1f) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        values[field] += ~(result >> 1) if result & 1 else result >> 1
+        field += 1
+        if field == 3:
+            field = 0
+            yield values[0] / COORDINATE_FACTOR, values[1] / COORDINATE_FACTOR, values[2]
@@ -0,0 +1,135 @@
+"""JSON encoding for API responses.
+
+``dumps`` encodes with orjson when it is installed and the ``JSON_BACKEND``
+setting does not ask for ``"json"``; otherwise it falls back to the standard
+library with ``DjangoJSONEncoder``. Both encode datetimes, dates, times and
+UUIDs, decimals (as strings, like DRF) and anything else ``DjangoJSONEncoder``
+knows, such as lazy translation strings and durations. orjson writes
+datetimes with microseconds and ``Z`` for UTC; the fallback trims them to
+milliseconds.
+
+``JSONResponse`` (used by ``success_response`` / ``error_response``) and
+``FastJSONRenderer`` (the DRF default renderer) both go through ``dumps``.
+``iter_json_list`` and ``StreamingJSONResponse`` emit large lists in pieces
+instead of building the whole document in memory.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = DjangoJSONEncoder()
+_dumps = None
+
+
+def _default(value):
+    # numpy scalars and arrays, e.g. distances from utils.spatial
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return _encoder.default(value)
+
+
+def _orjson_dumps(data):
+    return orjson.dumps(
+        data,
+        default=_default,
+        option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+
+def _stdlib_dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, default=_default, separators=(',', ':')).encode()
+
+
+def json_backend():
+    """Returns the name of the encoder in use, ``"orjson"`` or ``"json"``."""
+    backend = getattr(settings, 'JSON_BACKEND', 'orjson')
+    return 'orjson' if backend == 'orjson' and orjson is not None else 'json'
+
+
+def dumps(data):
+    """Encodes ``data`` as JSON.
+
+    Args:
+        data: Any JSON-compatible value, which may contain datetimes, decimals
+            and UUIDs.
+
+    Returns:
+        bytes: The UTF-8 encoded document.
+    """
+    global _dumps
+    if _dumps is None:
+        _dumps = _orjson_dumps if json_backend() == 'orjson' else _stdlib_dumps
+    return _dumps(data)
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _dumps
+    if setting == 'JSON_BACKEND':
+        _dumps = None
+
+
+class JSONResponse(HttpResponse):
+    """A ``JsonResponse`` encoded with ``dumps``."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class FastJSONRenderer(BaseRenderer):
+    """DRF renderer encoding with ``dumps``."""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+def iter_json_list(items, prefix=b'', suffix=b'', batch_size=500):
+    """Yields a JSON array of ``items`` in pieces.
+
+    Items are encoded ``batch_size`` at a time, so only one batch is held in
+    memory however long ``items`` is.
+
+    Args:
+        items (iterable): The values of the array.
+        prefix (bytes, optional): Written before the array, e.g. the opening
+            of an enclosing object.
+        suffix (bytes, optional): Written after the array.
+        batch_size (int, optional): Items per yielded piece. Defaults to 500.
+    """
+    yield prefix + b'['
+    first = True
+    batch = []
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= batch_size:
+            yield (b'' if first else b',') + b','.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield (b'' if first else b',') + b','.join(batch)
+    yield b']' + suffix
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """Streams a JSON array of ``items``; see ``iter_json_list``."""
+
+    def __init__(self, items, prefix=b'', suffix=b'', batch_size=500, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(iter_json_list(items, prefix, suffix, batch_size), **kwargs)
@@ -0,0 +1,108 @@
+"""Trajectory simplification for location tracks.
+
+Points are ``(lat, lon, t)`` triples. Distances are measured on a local
+equirectangular projection, which is accurate to well under a metre over the
+extent of a city ride.
+"""
+from math import cos, radians
+
+import numpy as np
+
+from utils.spatial import KM_PER_DEGREE
+
+METRES_PER_DEGREE = KM_PER_DEGREE * 1000
+
+
+def _project(points):
+    coords = np.asarray([(lat, lon) for lat, lon, _ in points], dtype=float)
+    scale = cos(radians(coords[:, 0].mean()))
+    return np.column_stack((coords[:, 1] * scale, coords[:, 0])) * METRES_PER_DEGREE
+
+
+def _segment_distances(xy, start, end):
+    """Returns the distance in metres of points ``start+1 .. end-1`` to the segment start-end."""
+    a, b = xy[start], xy[end]
+    inner = xy[start + 1:end]
+    ab = b - a
+    length_sq = ab @ ab
+    if length_sq == 0:
+        return np.hypot(*(inner - a).T)
+    t = np.clip((inner - a) @ ab / length_sq, 0, 1)
+    return np.hypot(*(inner - (a + t[:, None] * ab)).T)
+
+
+def douglas_peucker(points, tolerance_m):
+    """Simplifies a track with the Douglas–Peucker algorithm.
+
+    Every dropped point lies within ``tolerance_m`` metres of the simplified
+    track. The first and last points are always kept.
+
+    Args:
+        points (list): ``(lat, lon, t)`` triples in time order.
+        tolerance_m (float): Largest allowed deviation in metres.
+
+    Returns:
+        list: The kept points, in order.
+    """
+    if len(points) < 3:
+        return list(points)
+
+    xy = _project(points)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(xy, start, end)
+        index = int(distances.argmax())
+        if distances[index] > tolerance_m:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def thin(points, min_distance_m=0.0, min_interval_s=0):
+    """Drops points closer than ``min_distance_m`` metres or ``min_interval_s``
+    seconds to the last kept point. The first and last points are always kept.
+
+    Args:
+        points (list): ``(lat, lon, t)`` triples in time order.
+        min_distance_m (float, optional): Smallest gap in metres to keep.
+        min_interval_s (int, optional): Smallest gap in seconds to keep.
+
+    Returns:
+        list: The kept points, in order.
+    """
+    if len(points) < 3:
+        return list(points)
+
+    xy = _project(points)
+    kept = [0]
+    for index in range(1, len(points) - 1):
+        last = kept[-1]
+        if (np.hypot(*(xy[index] - xy[last])) >= min_distance_m
+                and points[index][2] - points[last][2] >= min_interval_s):
+            kept.append(index)
+    kept.append(len(points) - 1)
+    return [points[index] for index in kept]
+
+
+def simplify(points, method="douglas_peucker", tolerance_m=5.0, min_interval_s=0):
+    """Simplifies a track with the named method.
+
+    ``douglas_peucker`` keeps every dropped point within ``tolerance_m`` of
+    the result; ``thin`` drops points within ``tolerance_m`` metres or
+    ``min_interval_s`` seconds of the previous kept point.
+
+    Raises:
+        ValueError: The method is unknown.
+    """
+    if method == "douglas_peucker":
+        return douglas_peucker(points, tolerance_m)
+    if method == "thin":
+        return thin(points, tolerance_m, min_interval_s)
+    raise ValueError(f"Unknown simplification method: {method}")
@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import defaultdict
+from math import ceil, cos, floor, radians
+
+from django.conf import settings
+
+from authentication.models import Profile
+from utils.constants import DRIVER
+
+KM_PER_DEGREE = 111.195
+
+
+def bounding_box(lat, lon, radius_km):
+    """Returns ``(min_lat, max_lat, min_lon, max_lon)`` enclosing a radius.
+
+    The box is a superset of the circle, so it can be pushed into a database
+    query as a cheap range prefilter before the exact distance check. Boxes
+    that reach a pole or cross the antimeridian span every longitude.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    edge_lat = max(abs(min_lat), abs(max_lat))
+    if edge_lat >= 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = radius_km / (KM_PER_DEGREE * cos(radians(edge_lat)))
+    if lon - dlon < -180.0 or lon + dlon > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lon - dlon, lon + dlon
+
+
+class GridIndex:
+    """In-memory spatial index bucketing points into fixed-size lat/lon cells.
+
+    Lookups walk outwards from the query cell one ring at a time, so a search
+    only touches the handful of cells that can hold points within the radius.
+    """
+
+    def __init__(self, cell_size_km=1.0):
+        self.cell_size_km = cell_size_km
+        self.cell_deg = cell_size_km / KM_PER_DEGREE
+        self._cells = defaultdict(set)
+        self._points = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _cell(self, lat, lon):
+        return floor(lat / self.cell_deg), floor(lon / self.cell_deg)
+
+    def update(self, key, lat, lon):
+        """Inserts or moves the point stored under ``key``."""
+        with self._lock:
+            self._discard(key)
+            self._points[key] = (lat, lon)
+            self._cells[self._cell(lat, lon)].add(key)
+
+    def remove(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+
+    def _discard(self, key):
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+
+    def _lon_span(self, lat, ring):
+        # Longitude cells shrink towards the poles, so widen the ring using the
+        # cosine of the most poleward latitude the ring can reach.
+        edge_lat = min(90.0, abs(lat) + (ring + 1) * self.cell_deg)
+        scale = cos(radians(edge_lat))
+        max_span = ceil(180.0 / self.cell_deg)
+        if scale <= ring / max_span:
+            return max_span
+        return min(max_span, ceil(ring / scale))
+
+    def rings(self, lat, lon, max_radius_km):
+        """Yields ``(covered_km, points)`` for each ring around ``(lat, lon)``.
+
+        ``points`` is a list of ``(key, lat, lon)`` tuples found in the cells
+        added by that ring, and ``covered_km`` is the radius within which every
+        indexed point has now been yielded.
+
+        Args:
+            lat (float): Latitude of the search origin.
+            lon (float): Longitude of the search origin.
+            max_radius_km (float): Stop once this radius is fully covered.
+        """
+        ci, cj = self._cell(lat, lon)
+        max_ring = ceil(max_radius_km / self.cell_size_km)
+        prev_lat_span, prev_lon_span = -1, -1
+        for ring in range(max_ring + 1):
+            lon_span = self._lon_span(lat, ring)
+            points = []
+            with self._lock:
+                for i in range(ci - ring, ci + ring + 1):
+                    for j in range(cj - lon_span, cj + lon_span + 1):
+                        if abs(i - ci) <= prev_lat_span and abs(j - cj) <= prev_lon_span:
+                            continue
+                        for key in self._cells.get((i, j), ()):
+                            points.append((key, *self._points[key]))
+            prev_lat_span, prev_lon_span = ring, lon_span
+            yield ring * self.cell_size_km, points
+
+    def query(self, lat, lon, radius_km):
+        """Returns candidate ``(key, lat, lon)`` tuples within ``radius_km``.
+
+        The result is a superset of the points inside the radius; callers
+        should still check the exact distance.
+        """
+        candidates = []
+        for _, points in self.rings(lat, lon, radius_km):
+            candidates.extend(points)
+        return candidates
+
+
+class DriverIndex(GridIndex):
+    """Grid index of driver profile coordinates keyed by profile id.
+
+    The index is loaded from the database on first use and rebuilt every
+    ``DRIVER_INDEX_REFRESH_SECONDS`` to pick up changes made by other
+    processes. Within a process it is kept current by the ``Profile`` signals.
+
+    The index lives in each process's memory, and the signals only fire in
+    the process that saved the profile. With several workers, a move saved by
+    one worker is not seen by the others until their next rebuild, up to
+    ``DRIVER_INDEX_REFRESH_SECONDS`` later. Searches check candidates against
+    the database, so a stale index can hide a driver who moved into range
+    but never returns one who moved out of it. Lower the refresh interval if
+    that delay matters more than the cost of rescanning every driver.
+    """
+
+    def __init__(self, cell_size_km=1.0, refresh_seconds=60):
+        super().__init__(cell_size_km)
+        self.refresh_seconds = refresh_seconds
+        self._loaded_at = None
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def load(self):
+        drivers = Profile.objects.filter(
+            user_type=DRIVER,
+            latitude__isnull=False,
+            longitude__isnull=False
+        ).values_list('id', 'latitude', 'longitude')
+        with self._lock:
+            self.clear()
+            for driver_id, lat, lon in drivers:
+                self.update(driver_id, lat, lon)
+            self._loaded_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self.clear()
+            self._loaded_at = None
+
+    def ensure_loaded(self):
+        if not self.loaded or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.load()
+
+    def sync(self, profile):
+        """Applies a saved ``Profile`` to the index."""
+        if not self.loaded:
+            return
+        if profile.user_type == DRIVER and profile.latitude is not None and profile.longitude is not None:
+            self.update(profile.id, profile.latitude, profile.longitude)
+        else:
+            self.remove(profile.id)
+
+    def query(self, lat, lon, radius_km):
+        self.ensure_loaded()
+        return super().query(lat, lon, radius_km)
+
+    def rings(self, lat, lon, max_radius_km):
+        self.ensure_loaded()
+        return super().rings(lat, lon, max_radius_km)
+
+
+driver_index = DriverIndex(
+    cell_size_km=getattr(settings, 'DRIVER_INDEX_CELL_KM', 1.0),
+    refresh_seconds=getattr(settings, 'DRIVER_INDEX_REFRESH_SECONDS', 60),
+)